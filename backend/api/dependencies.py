@@ -7,12 +7,14 @@ from fastapi import HTTPException
 from typing import Optional
 from config.logging import setup_logging
 from api.services.llm_service import LLMService
+from api.services.job_queue import JobStore
 import logging
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 _llm_service: Optional[LLMService] = None
+_job_store: Optional[JobStore] = None
 
 
 def get_llm_service() -> LLMService:
@@ -23,4 +25,35 @@ def get_llm_service() -> LLMService:
         _llm_service = LLMService()
         logger.info("LLM service initialized")
     
-    return _llm_service
\ No newline at end of file
+    return _llm_service
+
+
+async def close_llm_service():
+    """Release the LLM service's pooled connections on shutdown"""
+    global _llm_service
+    
+    if _llm_service is not None:
+        await _llm_service.aclose()
+        _llm_service = None
+        logger.info("LLM service closed")
+
+
+def get_job_store() -> JobStore:
+    """Get the persistent job store"""
+    global _job_store
+    
+    if _job_store is None:
+        _job_store = JobStore()
+        logger.info(f"Job store opened at {_job_store.db_path}")
+    
+    return _job_store
+
+
+def close_job_store():
+    """Close the job store on shutdown"""
+    global _job_store
+    
+    if _job_store is not None:
+        _job_store.close()
+        _job_store = None
+        logger.info("Job store closed")
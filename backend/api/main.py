@@ -10,8 +10,11 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Import from relative modules
-from api.routes import health, inspector
-from config.logging import setup_logging
+from api.routes import cache, health, inspector, jobs, metrics
+from api.dependencies import close_job_store, close_llm_service, get_llm_service
+from api.services.metrics import MetricsMiddleware
+from api.services.workers import shutdown_process_pool
+from config.logging import RequestIdMiddleware, setup_logging
 
 # Setup logging and load environment
 setup_logging()
@@ -23,13 +26,18 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("Starting Spec Inspector API...")
     try:
-        logger.info("Add Spec Inspector API Logic here...")
+        jobs.start_job_workers()
+        get_llm_service().health.start()
         yield
     except Exception as e:
         logger.error(f"Startup error: {e}")
         yield
     finally:
         logger.info("Shutting down API...")
+        await jobs.stop_job_workers()
+        close_job_store()
+        await close_llm_service()
+        shutdown_process_pool()
         logger.info("API shutdown complete!")
 
 # Create FastAPI app
@@ -48,10 +56,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route request counts and latency for /api/v1/metrics
+app.add_middleware(MetricsMiddleware)
+# X-Request-ID on every response and on the request's log records
+app.add_middleware(RequestIdMiddleware)
 
 # Include routers
 app.include_router(health.router, prefix="/api/v1", tags=["health"])
 app.include_router(inspector.router, prefix="/api/v1", tags=["inspector"])
+app.include_router(cache.router, prefix="/api/v1", tags=["cache"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["jobs"])
+app.include_router(metrics.router, prefix="/api/v1", tags=["metrics"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from api.dependencies import get_llm_service
+from api.services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+async def cache_stats(llm_service: LLMService = Depends(get_llm_service)):
+    """
+    Correction cache hit/miss counters and sizes
+    """
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "cache": llm_service.cache.get_stats()
+    }
+
+@router.delete("/cache")
+async def clear_cache(llm_service: LLMService = Depends(get_llm_service)):
+    """
+    Invalidate every cached correction
+    """
+    # SQLite DELETE and commit - keep it off the event loop
+    removed = await asyncio.to_thread(llm_service.cache.invalidate)
+    logger.info(f"Correction cache cleared ({removed} entries)")
+    return {"status": "success", "removed": removed}
+
+@router.delete("/cache/{key}")
+async def invalidate_cache_entry(key: str, llm_service: LLMService = Depends(get_llm_service)):
+    """
+    Invalidate a single cached correction by key
+    """
+    removed = await asyncio.to_thread(llm_service.cache.invalidate, key)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Cache entry not found")
+    return {"status": "success", "removed": removed}
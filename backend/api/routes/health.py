@@ -32,14 +32,15 @@ async def health_check():
 @router.get("/health/detailed")
 async def detailed_health_check(llm_service: LLMService = Depends(get_llm_service)):
     """
-    Detailed Health Endpoint for displaying LLM service data
+    Detailed Health Endpoint for displaying LLM service data.
+    The Claude connection status comes from the background probe - polling this never calls Claude.
     """
     try:
         # Get service information
         service_info = llm_service.get_service_info()
         
-        # Test Claude connection
-        connection_test = llm_service.test_connection()
+        # Last background probe of the Claude connection
+        connection_test = llm_service.health.snapshot()
         
         # System information
         system_info = {
@@ -52,7 +53,8 @@ async def detailed_health_check(llm_service: LLMService = Depends(get_llm_servic
         overall_healthy = (
             service_info["claude_available"] and 
             service_info["api_key_configured"] and 
-            connection_test["success"]
+            connection_test["success"] and
+            connection_test["circuit_breaker"]["state"] == "closed"
         )
         
         return {
@@ -87,15 +89,15 @@ async def detailed_health_check(llm_service: LLMService = Depends(get_llm_servic
 @router.get("/health/quick-test")
 async def quick_test_endpoint(llm_service: LLMService = Depends(get_llm_service)):
     """
-    Quick test endpoint to verify Claude is responding
+    Quick test endpoint to verify Claude is responding (served from the background probe)
     """
     try:
-        test_result = llm_service.test_connection()
+        test_result = llm_service.health.snapshot()
         
         return {
             "timestamp": datetime.utcnow().isoformat(),
             "test_result": test_result,
-            "ready_for_requests": test_result["success"]
+            "ready_for_requests": test_result["success"] and test_result["circuit_breaker"]["state"] == "closed"
         }
         
     except Exception as e:
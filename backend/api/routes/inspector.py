@@ -1,15 +1,25 @@
 import os
 import json
-from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Response
+import asyncio
+from pydantic import BaseModel, ConfigDict
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request, Response
+from fastapi.responses import StreamingResponse
+from contextlib import aclosing
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import yaml
 from dotenv import load_dotenv
 import logging
-from utils.validators import validate_file, validate_postman_collection
+from utils.validators import ParsedSpec, apply_local_fixes, parse_and_validate, validate_file, validate_postman_collection
+from utils.archive import build_zip, extract_specs, is_archive, unique_name
+from utils.ref_resolver import parse_bundle_and_validate
+from utils.schema_validation import format_validation_errors, validate_document
+from utils.autofixer import looks_like_openapi
+from utils.postman_compiler import compile_postman, count_requests
 from api.dependencies import get_llm_service
 from api.services.llm_service import LLMService
+from api.services import metrics
+from api.services.workers import run_in_pool
 from config.logging import setup_logging
 
 # Setup logging
@@ -21,8 +31,33 @@ router = APIRouter()
 # Environment variables
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB default
 
+# Correction modes:
+#   auto - local fixes, Claude only when issues remain that local rules cannot fix
+#   full - local fixes, then always Claude for semantic enrichment
+#   fast - local fixes only, never Claude
+CORRECTION_MODES = ("auto", "full", "fast")
+
+# What Claude returns when it is called:
+#   spec  - the complete corrected spec
+#   patch - RFC 6902 JSON Patch operations, applied locally (output scales with the fixes, not the spec)
+LLM_OUTPUT_FORMATS = ("spec", "patch")
+
+# Multi-file specs: bundle external $refs into one document, or replace every $ref by its target
+REF_MODES = ("bundle", "dereference")
+
+# Batch inspection limits
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", "52428800"))  # 50MB total
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Specs with at least this many paths are corrected in parallel shards unless ?shard=false
+SHARD_MIN_PATHS = int(os.getenv("SHARD_MIN_PATHS", "50"))
+
 # Pydantic models
 class PostmanCollectionRequest(BaseModel):
+    # Keep collection-level 'variable', 'auth', etc. for the compiler
+    model_config = ConfigDict(extra="allow")
+
     info: Dict[Any, Any]
     item: List[Dict[Any, Any]]
 
@@ -30,9 +65,17 @@ class OpenAPIRequest(BaseModel):
     spec: Dict[Any, Any]
 
 @router.post("/inspect")
-async def inspect_file(file: UploadFile = File(...), llm_service: LLMService = Depends(get_llm_service)):
+async def inspect_file(
+    file: UploadFile = File(...),
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
+    shard: Optional[bool] = None,
+    llm_service: LLMService = Depends(get_llm_service)
+):
     """Upload and fix OpenAPI/YAML files"""
     logger.info(f"Received file: {file.filename}")
+    _check_mode(mode, llm_output)
     
     # Validate file
     if not file.filename or not file.filename.lower().endswith(('.yaml', '.yml', '.json')):
@@ -43,30 +86,199 @@ async def inspect_file(file: UploadFile = File(...), llm_service: LLMService = D
 
     # Read and process
     try:
-        file_content = await file.read()
+        file_content = await _read_upload(file)
         if not file_content:
             raise HTTPException(status_code=400, detail="File is empty")
         
-        validate_file(file_content)  # Basic validation (non-blocking)
-        corrections = llm_service.get_corrections(file_content)
+        # Decode, parse and schema-validate once, off the event loop
+        parsed, is_valid, report = await _parse_and_validate(file_content)
+        corrections = await _correct_spec(parsed, mode, not no_cache, llm_service, shard=shard, schema_report=report,
+                                          llm_output=llm_output)
+        if not corrections.get("corrected_spec"):
+            # No usable spec (unrecognised input, and Claude failed or was not asked) - never serve an empty body
+            status_code = 422 if corrections.get("source") == "local" else 502
+            raise HTTPException(status_code=status_code, detail=corrections.get("suggestions") or "No corrected spec produced")
         
         return Response(
             content=corrections["corrected_spec"],
             status_code=200,
             media_type="application/x-yaml",
-            headers={"Content-Disposition": f"attachment; filename=corrected-{file.filename}.yaml"}
+            headers={
+                "Content-Disposition": f"attachment; filename=corrected-{file.filename}.yaml",
+                "X-Cache": "HIT" if corrections.get("cached") else "MISS",
+                "X-Cache-Key": corrections.get("cache_key", ""),
+                "X-Correction-Source": corrections.get("source", "llm"),
+                "X-Model": (corrections.get("routing") or {}).get("model", ""),
+                "X-Validation-Passed": str(is_valid).lower(),
+                "X-Validation-Errors": str(len(report["errors"]))
+            }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Processing failed: {e}")
         raise HTTPException(status_code=400, detail=f"Processing failed: {str(e)}")
 
+@router.post("/inspect/stream")
+async def inspect_file_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """Upload and fix OpenAPI/YAML files, streaming progress as Server-Sent Events"""
+    logger.info(f"Received file for streaming: {file.filename}")
+    _check_mode(mode)
+    
+    if not file.filename or not file.filename.lower().endswith(('.yaml', '.yml', '.json')):
+        raise HTTPException(status_code=400, detail="File must be YAML (.yaml, .yml) or JSON (.json)")
+    
+    if file.size and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"File too large (max {MAX_FILE_SIZE/1024/1024:.1f}MB)")
+
+    file_content = await _read_upload(file)
+    if not file_content:
+        raise HTTPException(status_code=400, detail="File is empty")
+    
+    # Decode, parse and schema-validate once, off the event loop
+    parsed, _, report = await _parse_and_validate(file_content)
+    return _sse_response(_stream_corrections(request, parsed, mode, not no_cache, llm_service, report))
+
+@router.post("/inspect/batch")
+async def inspect_batch(
+    files: List[UploadFile] = File(...),
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
+    output: str = "ndjson",
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Inspect several spec files (or zip/tar archives of specs) in one request.
+    Results stream back as NDJSON as each file finishes, or as a zip of
+    corrected specs plus report.json when output=archive.
+    """
+    _check_mode(mode, llm_output)
+    if output not in ("ndjson", "archive"):
+        raise HTTPException(status_code=400, detail="output must be one of: ndjson, archive")
+
+    entries, errors = await _collect_batch_entries(files)
+    if not entries and not errors:
+        raise HTTPException(status_code=400, detail="No YAML or JSON files found in upload")
+    logger.info(f"Batch inspection of {len(entries)} file(s)")
+
+    # Parse and validate every file in parallel, off the event loop
+    parsed_results = await asyncio.gather(*(_parse_and_validate(content) for _, content in entries))
+
+    # Tokens are charged by llm_service.scheduler like every other request; this only caps the batch's share
+    limiter = llm_service.scheduler.batch_limit(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(_inspect_batch_item(name, parsed, is_valid, report, mode, not no_cache, llm_service, limiter,
+                                                llm_output))
+        for (name, _), (parsed, is_valid, report) in zip(entries, parsed_results)
+    ]
+
+    if output == "archive":
+        results = errors + list(await asyncio.gather(*tasks))
+        corrected = [(f"corrected/{r['filename']}", r["corrected_spec"]) for r in results if r.get("corrected_spec")]
+        report = [{k: v for k, v in r.items() if k != "corrected_spec"} for r in results]
+        return Response(
+            content=build_zip(corrected + [("report.json", json.dumps(report, indent=2, default=str))]),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=corrected-specs.zip"}
+        )
+
+    async def ndjson_results():
+        try:
+            for error in errors:
+                yield json.dumps(error) + "\n"
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, default=str) + "\n"
+        finally:
+            # Client went away - stop any corrections still running
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
+
+@router.post("/inspect/bundle")
+async def inspect_bundle(
+    files: List[UploadFile] = File(...),
+    root: Optional[str] = None,
+    refs: str = "bundle",
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
+    shard: Optional[bool] = None,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Inspect one spec split across several files (uploaded separately or as a
+    zip/tar archive). Relative $refs are resolved with each file parsed once,
+    and the bundled (or fully dereferenced) document is validated and
+    corrected like a single upload. root is the entry file's path; by default
+    the only OpenAPI/Swagger document no other file references.
+    """
+    _check_mode(mode, llm_output)
+    if refs not in REF_MODES:
+        raise HTTPException(status_code=400, detail=f"refs must be one of: {', '.join(REF_MODES)}")
+
+    entries, skipped = await _collect_batch_entries(files)
+    if not entries:
+        raise HTTPException(status_code=400, detail="No YAML or JSON files found in upload")
+    logger.info(f"Resolving a {len(entries)}-file spec bundle ({refs})")
+
+    try:
+        parsed, is_valid, report, bundle_report = await run_in_pool(
+            parse_bundle_and_validate, dict(entries), root, refs == "dereference"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    metrics.observe_stages(parsed.timings)
+
+    try:
+        corrections = await _correct_spec(parsed, mode, not no_cache, llm_service, shard=shard, schema_report=report,
+                                          llm_output=llm_output)
+        document = parsed.document if parsed.is_mapping else {}
+        return {
+            "status": "success",
+            "spec_title": (document.get("info") or {}).get("title", "Unknown"),
+            "spec_version": document.get("openapi", document.get("swagger", "Unknown")),
+            "timestamp": datetime.utcnow().isoformat(),
+            "bundle": {**bundle_report, "skipped": [error["filename"] for error in skipped]},
+            "validation_passed": is_valid,
+            "validation_errors": report["errors"],
+            "suggestions": corrections.get("suggestions", ""),
+            "corrected_spec": corrections.get("corrected_spec", ""),
+            "duplicate_keys": corrections.get("duplicate_keys", []),
+            "fixes": corrections.get("fixes", []),
+            "patch": corrections.get("patch", []),
+            "rejected_operations": corrections.get("rejected_operations", []),
+            "correction_source": corrections.get("source", "llm"),
+            "shards": corrections.get("shards", 1),
+            "shard_conflicts": corrections.get("shard_conflicts", []),
+            "compaction": corrections.get("compaction"),
+            "routing": corrections.get("routing"),
+            "verification": corrections.get("verification"),
+            "cached": corrections.get("cached", False),
+            "cache_key": corrections.get("cache_key", "")
+        }
+    except Exception as e:
+        logger.error(f"Bundle processing failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
 @router.post("/inspect/postman")
 async def inspect_postman_json(
     request: PostmanCollectionRequest, 
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
     llm_service: LLMService = Depends(get_llm_service)
 ):
     """Convert Postman collection to OpenAPI (returns JSON response)"""
     logger.info("Converting Postman collection to OpenAPI")
+    _check_mode(mode, llm_output)
     
     try:
         # Convert request to collection dict
@@ -76,18 +288,25 @@ async def inspect_postman_json(
         if not validate_postman_collection(collection):
             raise HTTPException(status_code=400, detail="Invalid Postman collection structure")
         
-        # Convert with LLM
-        collection_json = json.dumps(collection, indent=2)
-        enhanced_prompt = _create_postman_conversion_prompt(collection_json)
-        corrections = await _convert_postman_with_llm(llm_service, enhanced_prompt, collection_json)
+        # Compile locally, then optional LLM enrichment
+        corrections = await _compile_postman(collection, mode, not no_cache, llm_service, llm_output)
         
         return {
             "status": "success",
             "collection_name": collection.get("info", {}).get("name", "Unknown"),
-            "items_processed": len(collection.get("item", [])),
+            "items_processed": count_requests(collection),
             "timestamp": datetime.utcnow().isoformat(),
             "suggestions": corrections.get("suggestions", ""),      
             "corrected_spec": corrections.get("corrected_spec", ""),
+            "duplicate_keys": corrections.get("duplicate_keys", []),
+            "fixes": corrections.get("fixes", []),
+            "patch": corrections.get("patch", []),
+            "correction_source": corrections.get("source", "llm"),
+            "compaction": corrections.get("compaction"),
+            "routing": corrections.get("routing"),
+            "verification": corrections.get("verification"),
+            "cached": corrections.get("cached", False),
+            "cache_key": corrections.get("cache_key", ""),
             "usage_tip": "Copy 'corrected_spec' and paste into swagger editor"
         }
     except HTTPException:
@@ -99,10 +318,14 @@ async def inspect_postman_json(
 @router.post("/inspect/postman/yaml")
 async def inspect_postman_yaml(
     request: PostmanCollectionRequest, 
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
     llm_service: LLMService = Depends(get_llm_service)
 ):
     """Convert Postman collection to OpenAPI (returns downloadable YAML)"""
     logger.info("Converting Postman collection to OpenAPI YAML")
+    _check_mode(mode, llm_output)
     
     try:
         # Convert request to collection dict  
@@ -112,10 +335,8 @@ async def inspect_postman_yaml(
         if not validate_postman_collection(collection):
             raise HTTPException(status_code=400, detail="Invalid Postman collection structure")
         
-        # Convert with LLM
-        collection_json = json.dumps(collection, indent=2)
-        enhanced_prompt = _create_postman_conversion_prompt(collection_json)
-        corrections = await _convert_postman_with_llm(llm_service, enhanced_prompt, collection_json)
+        # Compile locally, then optional LLM enrichment
+        corrections = await _compile_postman(collection, mode, not no_cache, llm_service, llm_output)
         
         collection_name = collection.get("info", {}).get("name", "postman-collection")
         filename = f"{collection_name.lower().replace(' ', '-')}-openapi.yaml"
@@ -124,7 +345,12 @@ async def inspect_postman_yaml(
             content=corrections["corrected_spec"],
             status_code=200,
             media_type="application/x-yaml",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                "X-Cache": "HIT" if corrections.get("cached") else "MISS",
+                "X-Cache-Key": corrections.get("cache_key", ""),
+                "X-Correction-Source": corrections.get("source", "llm")
+            }
         )
     except HTTPException:
         raise
@@ -135,18 +361,24 @@ async def inspect_postman_yaml(
 @router.post("/inspect/openapi")
 async def inspect_openapi_json(
     request: OpenAPIRequest, 
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
+    shard: Optional[bool] = None,
     llm_service: LLMService = Depends(get_llm_service)
 ):
     """Fix OpenAPI spec from JSON body"""
     logger.info("Processing OpenAPI spec from JSON")
+    _check_mode(mode, llm_output)
     
     try:
-        # Convert and validate
-        spec_json = json.dumps(request.spec, indent=2)
-        file_content = spec_json.encode('utf-8')
+        # Body is already parsed - wrap it instead of re-serializing and re-parsing
+        parsed = ParsedSpec.from_document(request.spec)
         
-        is_valid = validate_file(file_content)  # Basic validation
-        corrections = llm_service.get_corrections(file_content)
+        report = await _validate_schema(parsed)
+        is_valid = validate_file(parsed) and report["valid"]
+        corrections = await _correct_spec(parsed, mode, not no_cache, llm_service, shard=shard, schema_report=report,
+                                          llm_output=llm_output)
 
         return {
             "status": "success",
@@ -154,65 +386,278 @@ async def inspect_openapi_json(
             "spec_version": request.spec.get("openapi", request.spec.get("swagger", "Unknown")),
             "timestamp": datetime.utcnow().isoformat(),
             "validation_passed": is_valid,
+            "validation_errors": report["errors"],
             "suggestions": corrections.get("suggestions", ""),      
-            "corrected_spec": corrections.get("corrected_spec", "")
+            "corrected_spec": corrections.get("corrected_spec", ""),
+            "duplicate_keys": corrections.get("duplicate_keys", []),
+            "fixes": corrections.get("fixes", []),
+            "patch": corrections.get("patch", []),
+            "rejected_operations": corrections.get("rejected_operations", []),
+            "correction_source": corrections.get("source", "llm"),
+            "shards": corrections.get("shards", 1),
+            "shard_conflicts": corrections.get("shard_conflicts", []),
+            "compaction": corrections.get("compaction"),
+            "routing": corrections.get("routing"),
+            "verification": corrections.get("verification"),
+            "cached": corrections.get("cached", False),
+            "cache_key": corrections.get("cache_key", "")
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"OpenAPI processing failed: {e}")
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
-# Helper functions
-def _create_postman_conversion_prompt(collection_json: str) -> str:
-    """Create Postman to OpenAPI conversion prompt"""
-    return f"""
-You are an expert at converting Postman collections to OpenAPI 3.1.0 specifications.
-
-Convert this Postman collection to a complete, valid OpenAPI 3.1.0 YAML specification:
-
-REQUIREMENTS:
-- Extract API info from collection.info
-- Convert collection.item[] to OpenAPI paths
-- Extract servers from request URLs
-- Add security schemes based on auth types
-- Include standard error responses (400, 401, 403, 404, 500)
-
-MUST INCLUDE:
-- openapi: 3.1.0
-- Complete info, servers, paths, components sections
-- Proper YAML structure (no duplicate keys)
-
-Format response as:
-## SUGGESTIONS:
-[List of conversion decisions made]
-
-## CORRECTED SPEC:
-```yaml
-[Complete OpenAPI 3.1.0 YAML]
-```
-
-Postman Collection:
-```json
-{collection_json}
-```
-"""
-
-async def _convert_postman_with_llm(llm_service: LLMService, prompt: str, collection_json: str) -> dict:
-    """Convert Postman collection using LLM"""
-    if not llm_service.anthropic_client:
-        return {"suggestions": "Error: No Claude API key configured", "corrected_spec": ""}
+@router.post("/inspect/openapi/stream")
+async def inspect_openapi_stream(
+    request: Request,
+    body: OpenAPIRequest,
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """Fix OpenAPI spec from JSON body, streaming progress as Server-Sent Events"""
+    logger.info("Streaming OpenAPI spec correction from JSON")
+    _check_mode(mode)
     
+    parsed = ParsedSpec.from_document(body.spec)
+    return _sse_response(_stream_corrections(request, parsed, mode, not no_cache, llm_service))
+
+# Helper functions
+def _check_mode(mode: str, llm_output: str = "spec"):
+    """Reject unknown correction modes and LLM output formats"""
+    if mode not in CORRECTION_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(CORRECTION_MODES)}")
+    if llm_output not in LLM_OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"llm_output must be one of: {', '.join(LLM_OUTPUT_FORMATS)}")
+
+async def _compile_postman(collection: dict, mode: str, use_cache: bool, llm_service: LLMService,
+                           llm_output: str = "spec") -> dict:
+    """Compile a Postman collection locally and hand the result to the correction pipeline"""
+    document, notes = compile_postman(collection)
+    parsed = ParsedSpec.from_document(document, file_type='yaml')
+    return await _correct_spec(parsed, mode, use_cache, llm_service, local_notes=notes, llm_output=llm_output)
+
+async def _llm_corrections(parsed: ParsedSpec, use_cache: bool, llm_service: LLMService,
+                           shard: Optional[bool] = None, limiter: Optional[asyncio.Semaphore] = None,
+                           llm_output: str = "spec", schema_report: Optional[dict] = None) -> dict:
+    """
+    Single-shot correction (full spec or JSON Patch), or sharded correction
+    for large specs and for specs whose expected output does not fit any
+    model's max_tokens. schema_report (the validation report of parsed, if
+    known) saves the model router from validating it again.
+    """
+    path_count = len(parsed.document.get('paths') or {}) if parsed.is_mapping else 0
+    # Patch output stays small however large the spec is, so it is not sharded unless asked
+    patch = llm_output == "patch" and parsed.is_mapping and not shard
+    plan = None
+    if patch or (shard is None and path_count < SHARD_MIN_PATHS):
+        plan = await llm_service.aplan_tokens("patch" if patch else "corrections", parsed)
+
+    if patch and plan.fits:
+        correction = llm_service.aget_patch_corrections(parsed, use_cache=use_cache, plan=plan,
+                                                        schema_report=schema_report)
+    elif shard or (shard is None and (path_count >= SHARD_MIN_PATHS or not plan.fits)):
+        correction = llm_service.aget_corrections_sharded(parsed, use_cache=use_cache)
+    else:
+        correction = llm_service.aget_corrections(parsed, use_cache=use_cache, plan=None if patch else plan,
+                                                  schema_report=schema_report)
+
+    if limiter is None:
+        return await correction
+    async with limiter:
+        return await correction
+
+async def _apply_local_fixes(parsed: ParsedSpec, local_notes: List[str] = None) -> Tuple[ParsedSpec, dict, bool]:
+    """utils.validators.apply_local_fixes in the process pool (conversion, autofix and the YAML dump are CPU-bound)"""
+    return await run_in_pool(apply_local_fixes, parsed, local_notes)
+
+def _merge_with_local(local_result: dict, corrections: dict) -> dict:
+    """Combine local fixes with Claude's corrections (or fall back to the local result)"""
+    if not corrections.get("corrected_spec"):
+        # Claude unavailable - the locally fixed spec is still a usable answer
+        return {**local_result, "suggestions": "\n".join([local_result["suggestions"], corrections.get("suggestions", "")])}
+    suggestions = "\n".join([local_result["suggestions"], corrections.get("suggestions", "")])
+    return {**corrections, "suggestions": suggestions, "fixes": local_result["fixes"], "source": "local+llm"}
+
+async def _correct_spec(parsed: ParsedSpec, mode: str, use_cache: bool, llm_service: LLMService,
+                        local_notes: List[str] = None, shard: Optional[bool] = None,
+                        limiter: Optional[asyncio.Semaphore] = None, schema_report: Optional[dict] = None,
+                        llm_output: str = "spec") -> dict:
+    """
+    Apply local deterministic fixes first (Swagger 2.0 conversion, rule-based
+    autofix), then Claude for whatever is left depending on the mode.
+    schema_report is the validation report of the input, reused when local
+    fixes leave the document unchanged.
+    """
+    if not looks_like_openapi(parsed.document):
+        # Unparseable or unrecognisable input - only the LLM can help
+        if mode == "fast":
+            return _UNRECOGNISED_RESULT
+        corrections = await _llm_corrections(parsed, use_cache, llm_service, False, limiter, llm_output, schema_report)
+        return {**corrections, "fixes": [], "source": "llm"}
+
+    fixed, local_result, unresolved = await _apply_local_fixes(parsed, local_notes)
+    local_result, needs_llm, report = await _local_verdict(parsed, fixed, local_result, unresolved, mode, schema_report)
+    if not needs_llm:
+        return local_result
+
+    corrections = await _llm_corrections(fixed, use_cache, llm_service, shard, limiter, llm_output, report)
+    return _merge_with_local(local_result, corrections)
+
+async def _local_verdict(parsed: ParsedSpec, fixed: ParsedSpec, local_result: dict, unresolved: bool, mode: str,
+                         schema_report: Optional[dict] = None) -> Tuple[dict, bool, Optional[dict]]:
+    """
+    Decide whether the locally fixed spec still needs Claude: always in full
+    mode, in auto mode when rules left issues or schema validation still fails.
+    Returns (local result, needs_llm, validation report of the fixed spec or
+    None if it was not validated); schema errors Claude will not see are
+    added to the local suggestions.
+    """
+    report = schema_report if fixed is parsed else None
+    if mode == "full":
+        return local_result, True, report
+
+    if report is None:
+        report = await _validate_schema(fixed)
+    if mode == "auto" and (unresolved or not report["valid"]):
+        return local_result, True, report
+    if not report["valid"]:
+        suggestions = "\n".join([local_result["suggestions"], *format_validation_errors(report)])
+        local_result = {**local_result, "suggestions": suggestions}
+    return local_result, False, report
+
+async def _validate_schema(parsed: ParsedSpec) -> dict:
+    """Schema-validate a parsed spec in the process pool"""
+    if not parsed.is_mapping:
+        return validate_document(parsed.document)
+    return await run_in_pool(validate_document, parsed.document)
+
+async def _parse_and_validate(content: bytes) -> Tuple[ParsedSpec, bool, dict]:
+    """utils.validators.parse_and_validate in the process pool, recording its stage timings here (worker metrics are not scraped)"""
+    parsed, is_valid, report = await run_in_pool(parse_and_validate, content)
+    metrics.observe_stages(parsed.timings)
+    return parsed, is_valid, report
+
+async def _read_upload(upload: UploadFile) -> bytes:
+    """Read an uploaded file, recording its size and read time"""
+    with metrics.stage("upload_read"):
+        content = await upload.read()
+    metrics.UPLOAD_SIZE.observe(len(content))
+    return content
+
+_UNRECOGNISED_RESULT = {
+    "suggestions": "- NEEDS REVIEW: input is not a recognisable OpenAPI/Swagger document",
+    "corrected_spec": "", "fixes": [], "source": "local"
+}
+
+async def _collect_batch_entries(files: List[UploadFile]) -> Tuple[List[Tuple[str, bytes]], List[dict]]:
+    """
+    Read uploads, expanding archives. Returns ((name, bytes) entries, per-file error results).
+    Names are made unique so results and the archive output can be told apart.
+    """
+    entries, errors = [], []
+    used_names = set()
+    total = 0
+    for upload in files:
+        name = upload.filename or "unnamed"
+        content = await _read_upload(upload)
+        try:
+            if is_archive(name):
+                # Inflating the archive is CPU and memory heavy - keep it off the event loop
+                found = await asyncio.to_thread(extract_specs, name, content, BATCH_MAX_BYTES - total,
+                                                BATCH_MAX_FILES - len(entries))
+            elif name.lower().endswith(('.yaml', '.yml', '.json')):
+                found = [(name, content)]
+            else:
+                errors.append({"filename": unique_name(name, used_names), "status": "error",
+                               "error": "Not a YAML, JSON or archive file"})
+                continue
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        total += sum(len(data) for _, data in found)
+        if total > BATCH_MAX_BYTES or len(entries) + len(found) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_FILES} files or {BATCH_MAX_BYTES} bytes")
+        entries.extend((unique_name(member, used_names), data) for member, data in found)
+    return entries, errors
+
+async def _inspect_batch_item(name: str, parsed: ParsedSpec, is_valid: bool, report: dict, mode: str,
+                              use_cache: bool, llm_service: LLMService, limiter: asyncio.Semaphore,
+                              llm_output: str = "spec") -> dict:
+    """Correct one file of a batch; failures are reported per file instead of failing the batch"""
     try:
-        max_tokens = llm_service.calculate_max_tokens(collection_json)
-        
-        response = llm_service.anthropic_client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=max_tokens,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        full_response = response.content[0].text
-        return llm_service._parse_claude_response(full_response)
-        
+        corrections = await _correct_spec(parsed, mode, use_cache, llm_service, limiter=limiter, schema_report=report,
+                                          llm_output=llm_output)
+        return {
+            "filename": name,
+            "status": "success",
+            "validation_passed": is_valid,
+            "validation_errors": report["errors"],
+            "suggestions": corrections.get("suggestions", ""),
+            "corrected_spec": corrections.get("corrected_spec", ""),
+            "fixes": corrections.get("fixes", []),
+            "patch": corrections.get("patch", []),
+            "correction_source": corrections.get("source", "llm"),
+            "compaction": corrections.get("compaction"),
+            "routing": corrections.get("routing"),
+            "verification": corrections.get("verification"),
+            "cached": corrections.get("cached", False)
+        }
     except Exception as e:
-        logger.error(f"LLM conversion failed: {e}")
-        return {"suggestions": f"AI conversion failed: {str(e)}", "corrected_spec": ""}
\ No newline at end of file
+        logger.error(f"Batch item {name} failed: {e}")
+        return {"filename": name, "status": "error", "validation_passed": is_valid, "error": str(e)}
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_corrections(request: Request, parsed: ParsedSpec, mode: str, use_cache: bool,
+                              llm_service: LLMService, schema_report: Optional[dict] = None):
+    """
+    SSE generator mirroring _correct_spec: local fixes are reported first, then
+    Claude's suggestions and spec chunks as they are generated. Stops (and closes
+    the upstream stream) as soon as the client disconnects. schema_report is
+    the validation report of parsed, if the caller already has one.
+    """
+    report = schema_report or await _validate_schema(parsed)
+    yield _sse("progress", {
+        "stage": "parsed",
+        "file_type": parsed.file_type,
+        "validation_passed": validate_file(parsed) and report["valid"],
+        "validation_errors": report["errors"]
+    })
+
+    local_result = None
+    if looks_like_openapi(parsed.document):
+        fixed, local_result, unresolved = await _apply_local_fixes(parsed)
+        local_result, needs_llm, _ = await _local_verdict(parsed, fixed, local_result, unresolved, mode, report)
+        parsed = fixed
+        yield _sse("progress", {"stage": "local_fixes", "fixes": len(local_result["fixes"])})
+        for line in local_result["suggestions"].split("\n"):
+            yield _sse("suggestion", {"text": line})
+        if not needs_llm:
+            yield _sse("summary", local_result)
+            return
+    elif mode == "fast":
+        yield _sse("summary", _UNRECOGNISED_RESULT)
+        return
+
+    async with aclosing(llm_service.astream_corrections(parsed, use_cache=use_cache)) as events:
+        async for event, payload in events:
+            if await request.is_disconnected():
+                logger.info("Client disconnected - cancelling streamed correction")
+                return
+            if event == "summary":
+                payload = _merge_with_local(local_result, payload) if local_result else {**payload, "fixes": [], "source": "llm"}
+            elif event == "error" and local_result:
+                yield _sse("error", payload)
+                payload, event = _merge_with_local(local_result, {"suggestions": f"Error: {payload['message']}"}), "summary"
+            yield _sse(event, payload)
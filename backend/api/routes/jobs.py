@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi.responses import JSONResponse
+from api.dependencies import get_job_store, get_llm_service
+from api.routes.inspector import MAX_FILE_SIZE, OpenAPIRequest, _check_mode, _correct_spec, _read_upload, _parse_and_validate
+from api.services.job_queue import JobStore, JobWorkerPool, RetryableJobError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_worker_pool: Optional[JobWorkerPool] = None
+
+
+def start_job_workers():
+    """Start the in-process job workers (called from the app lifespan)"""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = JobWorkerPool(get_job_store(), run_correction_job)
+        _worker_pool.start()
+
+
+async def stop_job_workers():
+    """Stop the job workers; unfinished jobs are requeued on next start"""
+    global _worker_pool
+    if _worker_pool is not None:
+        await _worker_pool.stop()
+        _worker_pool = None
+
+
+@router.post("/jobs", status_code=202)
+async def submit_file_job(
+    file: UploadFile = File(...),
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
+    shard: Optional[bool] = None,
+    store: JobStore = Depends(get_job_store)
+):
+    """Queue an uploaded OpenAPI/YAML file for correction and return a job ID immediately"""
+    _check_mode(mode, llm_output)
+    if not file.filename or not file.filename.lower().endswith(('.yaml', '.yml', '.json')):
+        raise HTTPException(status_code=400, detail="File must be YAML (.yaml, .yml) or JSON (.json)")
+    if file.size and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"File too large (max {MAX_FILE_SIZE/1024/1024:.1f}MB)")
+
+    content = await _read_upload(file)
+    if not content:
+        raise HTTPException(status_code=400, detail="File is empty")
+
+    # Inserting a payload of up to MAX_FILE_SIZE and committing is blocking I/O - keep it off the event loop
+    job_id = await asyncio.to_thread(store.submit, "file", content, {"mode": mode, "use_cache": not no_cache, "shard": shard, "llm_output": llm_output}, file.filename)
+    return _submitted(job_id)
+
+
+@router.post("/jobs/openapi", status_code=202)
+async def submit_openapi_job(
+    request: OpenAPIRequest,
+    no_cache: bool = False,
+    mode: str = "auto",
+    llm_output: str = "spec",
+    shard: Optional[bool] = None,
+    store: JobStore = Depends(get_job_store)
+):
+    """Queue an OpenAPI spec sent as a JSON body for correction"""
+    _check_mode(mode, llm_output)
+    content = json.dumps(request.spec).encode('utf-8')
+    job_id = await asyncio.to_thread(store.submit, "openapi", content, {"mode": mode, "use_cache": not no_cache, "shard": shard, "llm_output": llm_output})
+    return _submitted(job_id)
+
+
+@router.get("/jobs")
+async def job_counts(store: JobStore = Depends(get_job_store)):
+    """Number of jobs in each status"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "workers_running": _worker_pool is not None,
+        "jobs": await asyncio.to_thread(store.counts)
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str, store: JobStore = Depends(get_job_store)):
+    """Status, attempts, last error and per-stage timings for a job"""
+    job = await _get_job(store, job_id)
+    job.pop("result")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, store: JobStore = Depends(get_job_store)):
+    """
+    Result of a finished job.
+    202 while the job is still queued or running, 409 if it failed.
+    """
+    job = await _get_job(store, job_id)
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+    if job["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    return job["result"]
+
+
+@router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str, store: JobStore = Depends(get_job_store)):
+    """Remove a job and its result"""
+    if not await asyncio.to_thread(store.delete, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "success", "job_id": job_id}
+
+
+async def run_correction_job(job: dict, timings: Dict[str, float]) -> dict:
+    """Job handler: parse and validate, then correct one spec, timing each stage"""
+    params = job["params"]
+
+    start = time.perf_counter()
+    parsed, is_valid, report = await _parse_and_validate(job["payload"])
+    timings["parse_validate_ms"] = _elapsed_ms(start)
+
+    start = time.perf_counter()
+    corrections = await _correct_spec(parsed, params["mode"], params["use_cache"], get_llm_service(),
+                                      shard=params.get("shard"), schema_report=report,
+                                      llm_output=params.get("llm_output", "spec"))
+    timings["correct_ms"] = _elapsed_ms(start)
+
+    # Retry transient Claude failures only; a local correction is still a usable result
+    if corrections.get("retryable") and corrections.get("source") != "local":
+        raise RetryableJobError(corrections["suggestions"])
+
+    document = parsed.document if parsed.is_mapping else {}
+    return {
+        "status": "success",
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "spec_title": (document.get("info") or {}).get("title", "Unknown"),
+        "spec_version": document.get("openapi", document.get("swagger", "Unknown")),
+        "timestamp": datetime.utcnow().isoformat(),
+        "validation_passed": is_valid,
+        "validation_errors": report["errors"],
+        "suggestions": corrections.get("suggestions", ""),
+        "corrected_spec": corrections.get("corrected_spec", ""),
+        "duplicate_keys": corrections.get("duplicate_keys", []),
+        "fixes": corrections.get("fixes", []),
+        "patch": corrections.get("patch", []),
+        "rejected_operations": corrections.get("rejected_operations", []),
+        "correction_source": corrections.get("source", "llm"),
+        "shards": corrections.get("shards", 1),
+        "shard_conflicts": corrections.get("shard_conflicts", []),
+        "compaction": corrections.get("compaction"),
+        "routing": corrections.get("routing"),
+        "verification": corrections.get("verification"),
+        "cached": corrections.get("cached", False),
+        "cache_key": corrections.get("cache_key", "")
+    }
+
+
+def _submitted(job_id: str) -> dict:
+    if _worker_pool is not None:
+        _worker_pool.notify()
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/v1/jobs/{job_id}",
+        "result_url": f"/api/v1/jobs/{job_id}/result"
+    }
+
+
+async def _get_job(store: JobStore, job_id: str) -> dict:
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
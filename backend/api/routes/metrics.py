@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from api.services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Request, pipeline stage, token, cache and upstream error metrics in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,188 @@
+"""
+Content-addressed cache for LLM corrections.
+Two tiers: a bounded in-memory LRU in front of a persistent SQLite table.
+"""
+from config.logging import setup_logging
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Dict, Iterable, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "data/cache/corrections.sqlite3")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "0"))  # 0 = never expire
+
+
+def canonicalize(content: Any) -> str:
+    """
+    Produce a stable string form of a parsed spec so that formatting-only
+    differences (key order, whitespace, JSON vs YAML) hash identically.
+    Raw text or bytes (content that could not be parsed) is used as-is.
+    """
+    if isinstance(content, bytes):
+        return content.decode('utf-8', errors='replace')
+    if isinstance(content, str):
+        return content
+    # YAML mappings can mix integer and string keys (200 and 'default'), which sort_keys cannot order
+    normalized = json.loads(json.dumps(content, default=str))
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+
+class CorrectionCache:
+    def __init__(self, db_path: str = CACHE_DB_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = CACHE_TTL_SECONDS, enabled: bool = CACHE_ENABLED):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+        if self.enabled and self.db_path:
+            try:
+                os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS corrections ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+                logger.info(f"Correction cache persisted at {self.db_path}")
+            except Exception as e:
+                logger.error(f"Could not open correction cache database, using memory only: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(kind: str, content: Any, model: str, prompt_version: str) -> str:
+        """Hash of the canonical spec plus everything that changes the LLM output"""
+        return CorrectionCache.make_keys(kind, content, [model], prompt_version)[model]
+
+    @staticmethod
+    def make_keys(kind: str, content: Any, models: Iterable[str], prompt_version: str) -> Dict[str, str]:
+        """make_key for each model that could answer, canonicalizing the spec only once"""
+        canonical = canonicalize(content).encode('utf-8')
+        keys = {}
+        for model in models:
+            digest = hashlib.sha256()
+            for part in (kind.encode('utf-8'), prompt_version.encode('utf-8'), model.encode('utf-8'), canonical):
+                digest.update(part)
+                digest.update(b"\0")
+            keys[model] = digest.hexdigest()
+        return keys
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached result for key, or None on a miss"""
+        return self.get_first([key])[1]
+
+    def get_first(self, keys: Iterable[str]) -> Tuple[Optional[str], Optional[dict]]:
+        """(key, result) for the first of keys that is cached, or (None, None); counts as one lookup"""
+        if not self.enabled:
+            return None, None
+
+        with self._lock:
+            for key in keys:
+                value = self._find(key)
+                if value is not None:
+                    return key, value
+            self.stats["misses"] += 1
+            return None, None
+
+    def _find(self, key: str) -> Optional[dict]:
+        """Look a key up in the memory tier, then on disk; the caller holds the lock"""
+        entry = self._memory.get(key)
+        if entry is not None and not self._expired(entry["created_at"]):
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return entry["value"]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value, created_at FROM corrections WHERE key = ?", (key,)
+            ).fetchone()
+            if row and not self._expired(row[1]):
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self.stats["disk_hits"] += 1
+                return value
+        return None
+
+    def set(self, key: str, value: dict):
+        """Store a result in both tiers"""
+        if not self.enabled:
+            return
+
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO corrections (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), created_at)
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.error(f"Could not persist cache entry: {e}")
+            self.stats["stores"] += 1
+
+    def _remember(self, key: str, value: dict, created_at: float):
+        """Insert into the memory tier, evicting least recently used entries"""
+        self._memory[key] = {"value": value, "created_at": created_at}
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Remove one entry, or every entry when key is None. Returns entries removed."""
+        with self._lock:
+            if key is None:
+                removed = len(self._memory)
+                self._memory.clear()
+                if self._db is not None:
+                    removed = max(removed, self._db.execute("DELETE FROM corrections").rowcount)
+                    self._db.commit()
+            else:
+                removed = 1 if self._memory.pop(key, None) is not None else 0
+                if self._db is not None:
+                    removed = max(removed, self._db.execute(
+                        "DELETE FROM corrections WHERE key = ?", (key,)
+                    ).rowcount)
+                    self._db.commit()
+            self.stats["invalidations"] += removed
+            return removed
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                "enabled": self.enabled,
+                "persistent": self._db is not None,
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self.max_entries,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                **self.stats
+            }
+
+    def close(self):
+        """Close the SQLite connection"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,265 @@
+"""
+Persistent job queue for long-running corrections.
+Jobs are stored in SQLite so they survive restarts; a pool of in-process
+asyncio workers claims queued jobs, retries failures with exponential
+backoff and records per-stage timings. Finished jobs and their results are
+purged once they are older than JOB_RETENTION_SECONDS.
+"""
+from config.logging import setup_logging
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "0.5"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+JOB_PURGE_INTERVAL_SECONDS = float(os.getenv("JOB_PURGE_INTERVAL_SECONDS", "600"))
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler for transient failures that are worth retrying"""
+
+
+class JobStore:
+    """
+    SQLite-backed job table; safe to share between threads. Its methods block
+    on disk I/O, so async callers run them with asyncio.to_thread.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, filename TEXT, payload BLOB NOT NULL, "
+            "params TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_run_at REAL NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL, result TEXT, error TEXT, timings TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, next_run_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+        self._db.commit()
+
+    def recover(self) -> int:
+        """Requeue jobs left 'running' by a previous process. Returns jobs requeued."""
+        with self._lock:
+            count = self._db.execute(
+                "UPDATE jobs SET status = 'queued', next_run_at = ?, updated_at = ? WHERE status = 'running'",
+                (time.time(), time.time())
+            ).rowcount
+            self._db.commit()
+        if count:
+            logger.info(f"Requeued {count} interrupted job(s)")
+        return count
+
+    def submit(self, kind: str, payload: bytes, params: Dict[str, Any], filename: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, filename, payload, params, status, next_run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, filename, payload, json.dumps(params), now, now, now)
+            )
+            self._db.commit()
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """Atomically move the oldest due job to 'running' and return it"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND next_run_at <= ? "
+                "ORDER BY next_run_at, created_at LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                "started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                (now, now, row["id"])
+            )
+            self._db.commit()
+        job = self._to_dict(row, include_payload=True)
+        job["attempts"] += 1
+        job["status"] = "running"
+        return job
+
+    def complete(self, job_id: str, result: dict, timings: Dict[str, float]):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, timings = ?, "
+                "finished_at = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(result, default=str), json.dumps(timings), now, now, job_id)
+            )
+            self._db.commit()
+
+    def fail(self, job_id: str, error: str, timings: Dict[str, float], retry_at: Optional[float] = None):
+        """Record a failure; requeue for retry_at when given, otherwise mark failed"""
+        now = time.time()
+        with self._lock:
+            if retry_at is not None:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, timings = ?, next_run_at = ?, updated_at = ? "
+                    "WHERE id = ?", (error, json.dumps(timings), retry_at, now, job_id)
+                )
+            else:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, timings = ?, finished_at = ?, updated_at = ? "
+                    "WHERE id = ?", (error, json.dumps(timings), now, now, job_id)
+                )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            self._db.commit()
+        return bool(removed)
+
+    def purge_expired(self, retention_seconds: float = JOB_RETENTION_SECONDS) -> int:
+        """Delete succeeded and failed jobs finished more than retention_seconds ago. Returns jobs removed."""
+        cutoff = time.time() - retention_seconds
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (cutoff,)
+            ).rowcount
+            self._db.commit()
+        if removed:
+            logger.info(f"Purged {removed} expired job(s)")
+        return removed
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in JOB_STATUSES} | {row[0]: row[1] for row in rows}
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row, include_payload: bool = False) -> dict:
+        job = {key: row[key] for key in row.keys() if key != "payload"}
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+        if include_payload:
+            job["payload"] = row["payload"]
+        return job
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# A handler receives the claimed job and a timings dict to fill in (stage -> ms)
+JobHandler = Callable[[dict, Dict[str, float]], Awaitable[dict]]
+
+
+class JobWorkerPool:
+    """In-process asyncio workers that drain the job store"""
+
+    def __init__(self, store: JobStore, handler: JobHandler, workers: int = JOB_WORKERS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_base_seconds: float = JOB_RETRY_BASE_SECONDS,
+                 poll_interval: float = JOB_POLL_INTERVAL_SECONDS, retention_seconds: float = JOB_RETENTION_SECONDS,
+                 purge_interval: float = JOB_PURGE_INTERVAL_SECONDS):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        self.store.recover()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purger()))
+        logger.info(f"Job worker pool started with {self.workers} workers")
+
+    def notify(self):
+        """Wake idle workers after a submit instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Anything cancelled mid-run goes back to the queue on the next start
+        logger.info("Job worker pool stopped")
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter"""
+        delay = self.retry_base_seconds * (2 ** (attempts - 1))
+        return delay + random.uniform(0, delay / 2)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, index)
+
+    async def _purger(self):
+        """Periodically drop finished jobs past the retention period"""
+        while True:
+            try:
+                await asyncio.to_thread(self.store.purge_expired, self.retention_seconds)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not purge expired jobs: {e}")
+            await asyncio.sleep(self.purge_interval)
+
+    async def _run(self, job: dict, index: int):
+        timings: Dict[str, float] = {"queue_wait_ms": round((time.time() - job["created_at"]) * 1000, 1)}
+        logger.info(f"Worker {index} running job {job['id']} (attempt {job['attempts']})")
+        start = time.perf_counter()
+        try:
+            result = await self.handler(job, timings)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            retryable = isinstance(e, RetryableJobError) and job["attempts"] < self.max_attempts
+            retry_at = time.time() + self.retry_delay(job["attempts"]) if retryable else None
+            await asyncio.to_thread(self.store.fail, job["id"], str(e), timings, retry_at)
+            if retryable:
+                logger.warning(f"Job {job['id']} failed, retrying in {retry_at - time.time():.1f}s: {e}")
+            else:
+                logger.error(f"Job {job['id']} failed: {e}")
+            return
+
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        await asyncio.to_thread(self.store.complete, job["id"], result, timings)
+        logger.info(f"Job {job['id']} succeeded in {timings['total_ms']}ms")
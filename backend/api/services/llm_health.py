@@ -0,0 +1,176 @@
+"""
+Background health probe and circuit breaker for the Claude API.
+
+A single task probes Claude on an interval and keeps the last result and a
+rolling latency history in memory, so health endpoints never call upstream
+themselves. Probe results and real requests both feed a circuit breaker:
+after consecutive upstream failures it opens and LLM calls fail fast until
+a probe succeeds or, after a cool-down, a single trial request goes through.
+"""
+from collections import deque
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from anthropic import APIConnectionError, InternalServerError
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LLM_HEALTH_INTERVAL_SECONDS = float(os.getenv("LLM_HEALTH_INTERVAL_SECONDS", "60"))
+LLM_HEALTH_HISTORY_SIZE = int(os.getenv("LLM_HEALTH_HISTORY_SIZE", "20"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "3"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Errors that say Claude is unreachable or failing, as opposed to a bad request or rate limit"""
+    return isinstance(error, (APIConnectionError, InternalServerError))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures;
+    open -> half_open once reset_seconds have passed, letting one trial request through;
+    any success closes it again. Safe to call from the event loop and worker threads.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._trial_started: Optional[float] = None  # Half-open trial request, if one is in flight
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            # A trial that never reported back (cancelled, failed before the call) expires after reset_seconds
+            if self.state == "half_open" and (self._trial_started is None
+                                              or time.monotonic() - self._trial_started >= self.reset_seconds):
+                self._trial_started = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Claude circuit breaker closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            self._trial_started = None
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                logger.warning(f"Claude circuit breaker opened after {self.consecutive_failures} failure(s): {error}")
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial request through (0 when not open)"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": round(self.retry_in(), 1),
+            "last_error": self.last_error
+        }
+
+
+class LLMHealthMonitor:
+    """Runs probe() in the background and serves the results from memory"""
+
+    def __init__(self, probe: Callable[[], Awaitable[dict]], interval: float = LLM_HEALTH_INTERVAL_SECONDS,
+                 history_size: int = LLM_HEALTH_HISTORY_SIZE, breaker: Optional[CircuitBreaker] = None):
+        self.probe = probe
+        self.interval = interval
+        self.breaker = breaker or CircuitBreaker()
+        self.history = deque(maxlen=max(1, history_size))  # {checked_at, success, latency_ms}
+        self.last_result: Optional[dict] = None
+        self._last_checked: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the probe loop; interval <= 0 disables background probing"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"LLM health probe started (every {self.interval:g}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            logger.info("LLM health probe stopped")
+
+    async def _run(self):
+        while True:
+            await self.check()
+            # Probe sooner while the breaker is open so recovery is noticed quickly
+            delay = self.interval
+            if self.breaker.state != "closed":
+                delay = min(delay, max(self.breaker.retry_in(), 1.0))
+            await asyncio.sleep(delay)
+
+    async def check(self) -> dict:
+        """
+        Probe once, record the result and feed the breaker. A failed probe
+        only counts against the breaker when the probe flags it as an
+        upstream failure - a rate limit or auth error means Claude answered.
+        """
+        start = time.perf_counter()
+        try:
+            result = await self.probe()
+        except Exception as e:
+            result = {"success": False, "error": str(e), "upstream_failure": is_upstream_failure(e)}
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        self._last_checked = time.monotonic()
+        self.last_result = {**result, "checked_at": datetime.now(timezone.utc).isoformat(), "latency_ms": latency_ms}
+        self.history.append({"checked_at": self.last_result["checked_at"], "success": result["success"],
+                             "latency_ms": latency_ms})
+        if result.get("upstream_failure"):
+            self.breaker.record_failure(result.get("error", "Health probe failed"))
+        else:
+            self.breaker.record_success()
+        return self.last_result
+
+    def snapshot(self) -> dict:
+        """Last probe result, its age and the latency history - never calls upstream"""
+        latencies = sorted(entry["latency_ms"] for entry in self.history if entry["success"])
+        result = self.last_result or {"success": False, "error": "No health probe has completed yet"}
+        return {
+            **result,
+            "age_seconds": round(time.monotonic() - self._last_checked, 1) if self._last_checked is not None else None,
+            "interval_seconds": self.interval,
+            "latency": {
+                "samples": len(latencies),
+                "avg_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "p50_ms": latencies[len(latencies) // 2] if latencies else None,
+                "max_ms": latencies[-1] if latencies else None
+            },
+            "history": list(self.history),
+            "circuit_breaker": self.breaker.snapshot()
+        }
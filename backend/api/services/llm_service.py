@@ -3,131 +3,772 @@ LLM Service with Claude using Messages API
 """
 from config.logging import setup_logging
 from dotenv import load_dotenv
+import asyncio
+import dataclasses
+import json
 import logging
 import os
-from anthropic import Anthropic
+import time
+import httpx
+import yaml
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from anthropic import Anthropic, AsyncAnthropic, DefaultAsyncHttpxClient
+from api.services import metrics
+from api.services.cache_service import CorrectionCache
+from api.services.llm_health import LLMHealthMonitor, is_upstream_failure
+from api.services.model_router import CASCADE_KINDS, ModelRouter
+from api.services.rate_limit import LLMScheduler, is_retryable
+from api.services.prompts import SYSTEM_PROMPTS, system_blocks, user_message
+from api.services.workers import run_in_pool
+from api.services.token_planner import DEFAULT_MODEL, LARGE_OUTPUT_MODEL, MODEL_LIMITS, TokenPlan, UsageRecorder, count_tokens, plan_request
+from utils.validators import ParsedSpec, parse_spec
+from utils.spec_compactor import CompactSpec, expand_hoisted_text
+from utils.spec_verifier import Verification, repair_request, splice_fragments, verify_document, verify_spec
+from utils.yaml_loader import dump_yaml, format_duplicate_keys, load_yaml
+from utils.sharding import merge_shards, split_spec
+from utils.response_stream import CorrectionStreamParser
+from utils.json_patch import apply_patch
+from utils.schema_validation import format_validation_errors, validate_document
 
 load_dotenv()
 setup_logging()
 logger = logging.getLogger(__name__)
 
+CLAUDE_MODEL = DEFAULT_MODEL
+
+# Bump when a prompt template changes so cached corrections are not reused
+CORRECTIONS_PROMPT_VERSION = "corrections-v6"
+POSTMAN_PROMPT_VERSION = "postman-v5"
+PATCH_PROMPT_VERSION = "patch-v6"
+
+# Patch responses are prefilled so Claude continues a JSON object directly
+PATCH_PREFILL = '{"operations": ['
+
+# Verification of corrected specs: failing fragments are re-prompted, bounded in rounds and wall-clock time
+LLM_VERIFY_MAX_ROUNDS = int(os.getenv("LLM_VERIFY_MAX_ROUNDS", "2"))
+LLM_VERIFY_MAX_FRAGMENTS = int(os.getenv("LLM_VERIFY_MAX_FRAGMENTS", "10"))
+LLM_VERIFY_BUDGET_SECONDS = float(os.getenv("LLM_VERIFY_BUDGET_SECONDS", "60"))
+REPAIR_PREFILL = '{"fragments": {'
+# Result key carrying the patched document from the patch parser to _verification, which validates it
+PATCH_DOCUMENT_KEY = "_patched"
+
+# Connection test request; probes are scheduled but never retried - they report upstream as it is
+PROBE_MESSAGES = [{"role": "user", "content": "Hello, please respond with 'Claude is working!'"}]
+PROBE_MAX_TOKENS = 100
+PROBE_TOKENS = 20 + PROBE_MAX_TOKENS  # Estimated input plus max_tokens, for the token bucket
+
+# Connection pool for the async client (shared by every concurrent request)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "600"))
+# Messages API endpoint; point it at a local stand-in (benchmarks.fake_anthropic) for load tests.
+# An empty value means the default (the SDK would take an empty ANTHROPIC_BASE_URL literally)
+DEFAULT_ANTHROPIC_BASE_URL = "https://api.anthropic.com"
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or DEFAULT_ANTHROPIC_BASE_URL
+
+# Sharded correction of large specs
+SHARD_MAX_PATHS = int(os.getenv("SHARD_MAX_PATHS", "25"))
+SHARD_CONCURRENCY = int(os.getenv("SHARD_CONCURRENCY", "4"))
+
 class LLMService:
     def __init__(self):
         self.anthropic_client = None
+        self.async_anthropic_client = None
+        self.cache = CorrectionCache()
+        self.usage = UsageRecorder()
+        self._prompt_overhead = {}
+        self.health = LLMHealthMonitor(self.atest_connection)
+        self.scheduler = LLMScheduler()
+        self.router = ModelRouter()
+        self._register_metrics()
         
         # Initialize Claude if API key available
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if api_key:
             try:
-                self.anthropic_client = Anthropic(api_key=api_key)
+                # Retries are handled by the scheduler, not the SDK
+                self.anthropic_client = Anthropic(api_key=api_key, base_url=ANTHROPIC_BASE_URL,
+                                                  timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
+                self.async_anthropic_client = AsyncAnthropic(
+                    api_key=api_key,
+                    base_url=ANTHROPIC_BASE_URL,
+                    timeout=LLM_TIMEOUT_SECONDS,
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=LLM_MAX_CONNECTIONS,
+                            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                        )
+                    ),
+                )
                 logger.info("Claude client initialized successfully")
+                if ANTHROPIC_BASE_URL != DEFAULT_ANTHROPIC_BASE_URL:
+                    logger.warning(f"Claude requests go to {ANTHROPIC_BASE_URL}, not the Anthropic API")
                 logger.info(f"Client has messages: {hasattr(self.anthropic_client, 'messages')}")
                 
             except Exception as e:
                 logger.error(f"Failed to initialize Anthropic client: {e}")
                 self.anthropic_client = None
+                self.async_anthropic_client = None
         else:
             logger.warning("No ANTHROPIC_API_KEY found - LLM service may not work")
 
-    def calculate_max_tokens(self, input_content: str) -> int:
-        """Calculate appropriate max tokens based on input size"""
-        input_tokens = len(input_content) // 4  # Rough estimate: 4 chars = 1 token
+    def _register_metrics(self):
+        """Expose scheduler and cache state to the metrics endpoint, read only at scrape time"""
+        metrics.LLM_IN_FLIGHT.set_function(lambda: {(): self.scheduler.in_flight})
+        metrics.LLM_QUEUE_DEPTH.set_function(lambda: {(): self.scheduler.queued})
+        metrics.CACHE_LOOKUPS.set_function(lambda: {
+            ("memory_hit",): self.cache.stats["memory_hits"],
+            ("disk_hit",): self.cache.stats["disk_hits"],
+            ("miss",): self.cache.stats["misses"]
+        })
+
+    async def aclose(self):
+        """Stop the health probe, close the pooled async HTTP client and flush the usage log"""
+        await self.health.stop()
+        if self.async_anthropic_client:
+            await self.async_anthropic_client.close()
+        self.cache.close()
+        self.usage.close()
+
+    def _cache_models(self, kind: str) -> List[str]:
+        """Models whose answer to a request of this kind may be served from the cache"""
+        models = [CLAUDE_MODEL, LARGE_OUTPUT_MODEL]
+        if self.router.enabled and kind in CASCADE_KINDS:
+            models.insert(0, self.router.fast_model)  # Tried first by the cascade
+        return list(dict.fromkeys(models))
+
+    def _cache_lookup(self, kind: str, parsed: ParsedSpec, prompt_version: str,
+                      use_cache: bool) -> Tuple[Dict[str, str], Optional[dict]]:
+        """
+        Return (cache key per candidate model, cached result or None).
+        Results are cached under the model that produced them, so a lookup
+        tries each model that could answer this request.
+        """
+        content = parsed.text if parsed.error else parsed.document
+        keys = self.cache.make_keys(kind, content, self._cache_models(kind), prompt_version)
+        if not use_cache:
+            return keys, None
+        key, cached = self.cache.get_first(keys.values())
+        if cached is None:
+            return keys, None
+        logger.info(f"Correction cache hit for {kind} ({key[:12]})")
+        return keys, {**cached, "cached": True, "cache_key": key}
+
+    def _cache_store(self, keys: Dict[str, str], model: str, result: dict):
+        """Cache a result under the model that produced it, only if Claude returned a well-formed correction"""
+        key = keys.get(model, "")
+        suggestions = result.get("suggestions", "")
+        if (key and result.get("corrected_spec") and not result.get("duplicate_keys") and not result.get("truncated")
+                and not suggestions.startswith(("Error", "AI response format error"))):
+            self.cache.set(key, result)
+        return {**result, "cached": False, "cache_key": key}
+
+    async def _acache_lookup(self, kind: str, parsed: ParsedSpec, prompt_version: str,
+                             use_cache: bool) -> Tuple[Dict[str, str], Optional[dict]]:
+        """_cache_lookup off the event loop (canonicalizing and SQLite reads)"""
+        return await asyncio.to_thread(self._cache_lookup, kind, parsed, prompt_version, use_cache)
+
+    async def _acache_store(self, keys: Dict[str, str], model: str, result: dict) -> dict:
+        """_cache_store off the event loop (SQLite writes and commits)"""
+        return await asyncio.to_thread(self._cache_store, keys, model, result)
+
+    def _compact(self, kind: str, parsed: ParsedSpec, hoist: Optional[bool] = None) -> CompactSpec:
+        """
+        The spec as sent to Claude (see spec_compactor). Shared inline schemas
+        are only hoisted for full corrections: patch paths must point into the
+        document as uploaded, and streamed spec chunks cannot be expanded again.
+        """
+        return parsed.compacted(kind == "corrections" if hoist is None else hoist)
+
+    def plan_tokens(self, kind: str, parsed: ParsedSpec, hoist: Optional[bool] = None) -> TokenPlan:
+        """
+        Choose max_tokens and the model for a request from the compacted spec's
+        token count and structure (see token_planner). kind is 'corrections', 'patch' or 'postman'.
+        """
+        with metrics.stage("prompt_build"):
+            if kind not in self._prompt_overhead:
+                self._prompt_overhead[kind] = count_tokens(SYSTEM_PROMPTS[kind] + user_message(kind, ""))
+            compact = self._compact(kind, parsed, hoist)
+            output_format = "patch" if kind == "patch" else "spec"
+            plan = plan_request(compact.text, parsed.document, self._prompt_overhead[kind], output_format)
+
+        if compact.original_tokens is None:
+            compact.compact_tokens = plan.input_tokens - self._prompt_overhead[kind]
+            compact.original_tokens = count_tokens(parsed.text) if compact.text != parsed.text else compact.compact_tokens
+            saved = compact.original_tokens - compact.compact_tokens
+            logger.info(f"Compacted spec: {compact.original_bytes} -> {compact.compact_bytes} bytes, "
+                        f"{compact.original_tokens} -> {compact.compact_tokens} tokens "
+                        f"({saved / max(1, compact.original_tokens):.0%} saved), {len(compact.hoisted)} shared schema(s) hoisted")
+        logger.info(f"Token plan: {plan.input_tokens} input, ~{plan.predicted_output_tokens} output "
+                    f"-> max_tokens={plan.max_tokens} on {plan.model}")
+        return plan
+
+    async def aplan_tokens(self, kind: str, parsed: ParsedSpec, hoist: Optional[bool] = None) -> TokenPlan:
+        """plan_tokens off the event loop (compacting and tokenizing large specs takes a while)"""
+        return await asyncio.to_thread(self.plan_tokens, kind, parsed, hoist)
+
+    def _finish_response(self, kind: str, plan: TokenPlan, full_response: str, usage, stop_reason: Optional[str],
+                         parse: Optional[Callable[[str], dict]] = None, compact: Optional[CompactSpec] = None) -> dict:
+        """Record usage against the plan and parse the response, flagging truncation"""
+        self.usage.record(kind, plan, usage, stop_reason)
+        with metrics.stage("response_parse"):
+            result = (parse or self._parse_claude_response)(full_response)
+        if compact is not None:
+            if compact.hoisted:
+                self._expand_hoisted(result, compact.hoisted)
+            result["compaction"] = compact.stats()
+        if stop_reason == "max_tokens":
+            result["truncated"] = True
+            result["suggestions"] = (f"{result['suggestions']}\n- WARNING: response hit max_tokens "
+                                     f"({plan.max_tokens}); the corrected spec may be incomplete")
+        return result
+    
+    def find_duplicate(self, yaml_content: str) -> list:
+        """
+        Return duplicate mapping keys (key, line, column, first_line) in a YAML string.
+        Invalid YAML yields an empty list - see validate_structure for syntax errors.
+        """
+        try:
+            return load_yaml(yaml_content)[1]
+        except yaml.YAMLError:
+            return []
+
+    def validate_structure(self, yaml_structure: str) -> dict:
+        """
+        Parse a YAML spec once and report syntax errors and duplicate keys
+        """
+        try:
+            document, duplicate_keys = load_yaml(yaml_structure)
+        except yaml.YAMLError as e:
+            return {"valid": False, "error": f"Invalid YAML syntax: {e}", "duplicate_keys": []}
+        
+        if not isinstance(document, dict):
+            return {"valid": False, "error": "Spec is not a YAML mapping", "duplicate_keys": duplicate_keys}
         
-        if input_tokens < 2000:
-            return 4000   # Small API
-        elif input_tokens < 10000:
-            return 16000  # Medium API  
-        elif input_tokens < 30000:
-            return 32000  # Large API
+        return {"valid": not duplicate_keys, "error": None, "duplicate_keys": duplicate_keys}
+
+    def _expand_hoisted(self, result: dict, hoisted: dict):
+        """Inline the schemas hoisted by compaction back into the corrected spec"""
+        if not result.get("corrected_spec") or result.get("duplicate_keys"):
+            return
+        try:
+            # Rewrites only the hoisted $refs, so Claude's inline comments are kept
+            with metrics.stage("serialize"):
+                result["corrected_spec"] = expand_hoisted_text(result["corrected_spec"], hoisted)
+        except yaml.YAMLError:
+            return  # Left as returned - the caller's validation reports the syntax error
+
+    def _request(self, kind: str, plan: TokenPlan, compact: CompactSpec, prefill: Optional[str] = None) -> dict:
+        """
+        Messages API arguments for a request: the static instructions go in the
+        system prompt (cached when it is long enough) and the compacted spec goes last.
+        """
+        messages = [{"role": "user", "content": user_message(kind, compact.text, compact.language)}]
+        if prefill:
+            messages.append({"role": "assistant", "content": prefill})
+        return {"model": plan.model, "max_tokens": plan.max_tokens, "system": system_blocks(kind, plan.model),
+                "messages": messages}
+
+    def _circuit_open(self) -> Optional[dict]:
+        """Fail-fast result while the circuit breaker is open, else None"""
+        if self.health.breaker.allow_request():
+            return None
+        retry_in = self.health.breaker.retry_in()
+        logger.warning(f"Claude circuit breaker is open - skipping request (retry in {retry_in:.0f}s)")
+        return {
+            "suggestions": f"Error: Could not analyze file - Claude is unavailable (circuit breaker open, retry in {retry_in:.0f}s)",
+            "corrected_spec": "",
+            "retryable": False
+        }
+
+    def _record_outcome(self, error: Optional[Exception] = None):
+        """Feed the circuit breaker; only connection errors and 5xx count as upstream failures"""
+        if error is not None and is_upstream_failure(error):
+            self.health.breaker.record_failure(str(error))
         else:
-            return 50000  # Enterprise API
-    
-    def find_duplicate(yaml_content: str):
-        pass
+            self.health.breaker.record_success()
+
+    async def _acreate(self, request: dict, plan: TokenPlan, label: str):
+        """Non-streaming Claude request through the scheduler and the circuit breaker"""
+        messages = self.async_anthropic_client.beta.prompt_caching.messages
+        try:
+            with metrics.stage("llm_wait"):
+                response = await self.scheduler.run(lambda: messages.create(**request),
+                                                    plan.input_tokens + plan.max_tokens, label)
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        self._record_outcome()
+        return response
+
+    async def _acorrect(self, kind: str, plan: TokenPlan, compact: CompactSpec,
+                        parse: Optional[Callable[[str], dict]] = None, prefill: Optional[str] = None) -> dict:
+        """One Claude request on plan.model and its parsed result"""
+        logger.info(f"Sending {kind} request to {plan.model} with max_tokens: {plan.max_tokens}")
+        response = await self._acreate(self._request(kind, plan, compact, prefill=prefill), plan, kind)
+        full_response = (prefill or "") + response.content[0].text
+        logger.info(f"Successfully received {kind} response from Claude")
 
-    def validate_structure(yaml_structure: str):
-        pass
+        # Parsing, patching, expanding hoisted schemas and dumping a large spec is CPU work - keep it off the event loop
+        return await asyncio.to_thread(self._finish_response, kind, plan, full_response, response.usage,
+                                       response.stop_reason, parse, compact)
 
-    def get_corrections(self, file_content: bytes) -> dict:
+    async def _acascade(self, kind: str, parsed: ParsedSpec, plan: TokenPlan, compact: CompactSpec,
+                        parse: Optional[Callable[[str], dict]] = None, prefill: Optional[str] = None,
+                        schema_report: Optional[dict] = None) -> Tuple[dict, Optional[Verification]]:
+        """
+        Try the router's fast model first when the spec qualifies, validate its
+        output locally and only escalate to the planned model when that fails.
+        schema_report is the input's validation report, if the caller has one;
+        otherwise the input is validated in the process pool, and only when its
+        size lets it go to the fast model. Returns the result and the verification of its corrected spec, for _averify.
+        """
+        route = self.router.screen(kind, parsed, plan)
+        if route is None:
+            if schema_report is None:
+                schema_report = await run_in_pool(validate_document, parsed.document)
+            route = self.router.choose(kind, parsed, plan, schema_report)
+        if route.tier == "fast":
+            try:
+                result = await self._acorrect(kind, dataclasses.replace(plan, model=route.model), compact, parse, prefill)
+                verification = await self._verification(result)
+                accepted, reason = self.router.check(kind, result, verification)
+            except Exception as e:
+                if is_upstream_failure(e):
+                    raise  # The planned model sits behind the same upstream
+                logger.warning(f"{route.model} request failed: {e}")
+                accepted, reason = False, "fast model request failed"
+            self.router.record(kind, route, escalated=not accepted, reason=reason)
+            routing = {"model": route.model, "tier": route.tier, "escalated": not accepted, "reason": reason}
+            if accepted:
+                return {**result, "routing": routing}, verification
+            routing["model"] = plan.model
+        else:
+            self.router.record(kind, route)
+            routing = {"model": plan.model, "tier": route.tier, "escalated": False, "reason": route.reason}
+
+        result = await self._acorrect(kind, plan, compact, parse, prefill)
+        verification = await self._verification(result)
+        return {**result, "routing": routing}, verification
+
+    async def _verification(self, result: dict) -> Optional[Verification]:
+        """
+        Verification of a result's corrected spec (the patched document for
+        patch results), in the process pool: schema validation is pure-Python
+        CPU work that would hold the GIL and stall the event loop in a thread.
+        """
+        document = result.pop(PATCH_DOCUMENT_KEY, None)
+        if document is not None:
+            return await run_in_pool(verify_document, document)
+        if result.get("corrected_spec"):
+            return await run_in_pool(verify_spec, result["corrected_spec"])
+        return None
+
+    async def _averify(self, kind: str, result: dict, verification: Optional[Verification] = None) -> dict:
+        """
+        Verify a corrected spec (syntax, duplicate keys, schema) and re-prompt
+        only the paths/components/sections that fail, splicing the answers
+        back in. Bounded by LLM_VERIFY_MAX_ROUNDS and LLM_VERIFY_BUDGET_SECONDS;
+        a round that does not reduce the total error count is discarded. Pass
+        the verification from _acascade so the spec is not validated again.
+        """
+        if not result.get("corrected_spec"):
+            return result
+        start = time.monotonic()
+        if verification is None:
+            verification = await self._verification(result)
+        if verification.parse_error:
+            # Never hand unparseable text on as a spec - callers fall back to the local result
+            logger.warning(f"Corrected spec failed verification: {verification.parse_error}")
+            return {**result, "corrected_spec": "",
+                    "suggestions": f"{result['suggestions']}\n- WARNING: {verification.parse_error}; the corrected spec was discarded",
+                    "verification": {"valid": False, "rounds": 0, "repaired_fragments": [], "remaining_errors": None,
+                                     "stopped": verification.parse_error, "elapsed_ms": _elapsed_ms(start)}}
+
+        document, repaired, rounds, stopped = verification.document, [], 0, None
+        while not verification.valid:
+            pointers = list(verification.fragments)
+            remaining = LLM_VERIFY_BUDGET_SECONDS - (time.monotonic() - start)
+            if not pointers:
+                stopped = "remaining errors are not inside a replaceable fragment"
+            elif rounds >= LLM_VERIFY_MAX_ROUNDS:
+                stopped = "retry limit reached"
+            elif len(pointers) > LLM_VERIFY_MAX_FRAGMENTS:
+                stopped = f"{len(pointers)} failing fragments (max {LLM_VERIFY_MAX_FRAGMENTS})"
+            elif remaining <= 0:
+                stopped = "latency budget exhausted"
+            if stopped:
+                break
+
+            rounds += 1
+            logger.info(f"Verification round {rounds}: re-prompting {len(pointers)} fragment(s) with {len(verification.errors)} error(s)")
+            try:
+                fixes = await asyncio.wait_for(self._arepair(verification, pointers), remaining)
+            except asyncio.TimeoutError:
+                stopped = "latency budget exhausted"
+                break
+            except Exception as e:
+                # A malformed answer costs a round; the next one may do better
+                logger.warning(f"Fragment repair round {rounds} failed: {e}")
+                continue
+            candidate, applied = splice_fragments(document, fixes, pointers)
+            check = await run_in_pool(verify_document, candidate)
+            # Compare full counts - the listed errors stop at MAX_ERRORS
+            if not applied or check.error_count >= verification.error_count:
+                logger.warning(f"Fragment repair round {rounds} did not reduce the errors - discarded")
+                continue
+            document, verification = candidate, check
+            repaired += applied
+
+        notes = [f"- Regenerated {pointer} after it failed verification" for pointer in repaired]
+        if repaired:
+            with metrics.stage("serialize"):
+                corrected_spec = await asyncio.to_thread(dump_yaml, document)
+            result = {**result, "corrected_spec": corrected_spec, "duplicate_keys": []}
+        if kind == "patch":
+            result["validation_errors"] = verification.errors
+        if verification.errors:
+            notes += format_validation_errors({"errors": verification.errors, "truncated": verification.truncated})
+        if notes:
+            result["suggestions"] = "\n".join([result["suggestions"], *notes])
+        result["verification"] = {
+            "valid": verification.valid,
+            "rounds": rounds,
+            "repaired_fragments": repaired,
+            "remaining_errors": len(verification.errors),
+            "stopped": stopped,
+            "elapsed_ms": _elapsed_ms(start)
+        }
+        if stopped:
+            logger.warning(f"Verification stopped with {len(verification.errors)} error(s) left: {stopped}")
+        return result
+
+    async def _arepair(self, verification: Verification, pointers: List[str]) -> dict:
+        """Ask Claude for corrected values of the failing fragments. Returns {pointer: value}."""
+        content = repair_request(verification, pointers)
+        if "repair" not in self._prompt_overhead:
+            self._prompt_overhead["repair"] = count_tokens(SYSTEM_PROMPTS["repair"] + user_message("repair", ""))
+        plan = await asyncio.to_thread(plan_request, content, None, self._prompt_overhead["repair"])
+        compact = CompactSpec(text=content, language="json")
+        response = await self._acreate(self._request("repair", plan, compact, prefill=REPAIR_PREFILL), plan, "repair")
+        self.usage.record("repair", plan, response.usage, response.stop_reason)
+        return self._parse_repair_response(REPAIR_PREFILL + response.content[0].text)
+
+    def get_corrections(self, spec: Union[bytes, ParsedSpec], use_cache: bool = True) -> dict:
         """
         Get both suggestions and corrected spec for the OpenAPI file.
         Returns dict with 'suggestions' and 'corrected_spec'
         """
+        parsed = spec if isinstance(spec, ParsedSpec) else parse_spec(spec)
+        cache_keys, cached = self._cache_lookup("corrections", parsed, CORRECTIONS_PROMPT_VERSION, use_cache)
+        if cached:
+            return cached
+
         if not self.anthropic_client:
             return {
                 "suggestions": "Error: No Claude API key configured or client initialization failed",
                 "corrected_spec": ""
             }
+        unavailable = self._circuit_open()
+        if unavailable:
+            return unavailable
             
         try:
-            content_str = file_content.decode('utf-8')
-            max_tokens = self.calculate_max_tokens(content_str)
-            
-            logger.info(f"Sending request to Claude with max_tokens: {max_tokens}")
-            
-            response = self.anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=max_tokens,
-                messages=[
-                    {
-                        "role": "user", 
-                        "content": (
-                            "You are an OpenAPI 3.1.0 Specification expert. Analyze and correct the following YAML specification as Per OpenAPI 3.1.0 Specification.\n\n"
-                            
-                            "REQUIREMENTS:\n"
-                            "- Fix all structural errors and validation issues\n"
-                            "- Enhance metadata, schemas, tags, and security\n"
-                            "- Return complete, valid OpenAPI 3.1.0 YAML\n"
-                            "- Add helpful inline comments explaining fixes\n\n"
-                            
-                            "MUST INCLUDE:\n"
-                            "- openapi: 3.1.0\n"
-                            "- info.title, info.version, info.description\n"
-                            "- info.termsOfService, info.contact, info.license\n"
-                            "- servers (at least one)\n"
-                            "- paths (can be empty object)\n"
-                            "- components.schemas\n"
-                            "- components.securitySchemes\n"
-                            "- security (global)\n"
-                            "- tags\n\n"
-                            
-                            "FORMATTING:\n"
-                            "- Start with multi-line comment block explaining changes\n"
-                            "- Add inline comments for fixes and improvements\n"
-                            "- Use proper YAML structure (no duplicate keys)\n"
-                            "- Include validation constraints where appropriate\n\n"
-                            
-                            "CRITICAL YAML RULES:\n"
-                            "- NEVER use duplicate keys at the same level (e.g., two 'schemas:' in components)\n"
-                            "- All schemas must be in ONE 'schemas:' section under components\n"
-                            "- Put Error schema with other schemas, not separately\n"
-                            "- Valid structure: components: { schemas: { User: ..., Error: ... }, responses: ..., securitySchemes: ... }\n\n"
-                            
-                            "Format your response as:\n"
-                            "## SUGGESTIONS:\n"
-                            "[Bulleted list of specific issues found and how they were fixed]\n\n"
-                            "## CORRECTED SPEC:\n"
-                            "```yaml\n"
-                            "[Complete corrected YAML file]\n"
-                            "```\n\n"
-                            f"File to analyze:\n```yaml\n{content_str}\n```"
-                        )
-                    }
-                ]
-            )
+            plan = self.plan_tokens("corrections", parsed)
+            compact = self._compact("corrections", parsed)
+            
+            logger.info(f"Sending request to Claude with max_tokens: {plan.max_tokens}")
+            
+            request = self._request("corrections", plan, compact)
+            try:
+                with metrics.stage("llm_wait"):
+                    response = self.scheduler.run_sync(
+                        lambda: self.anthropic_client.beta.prompt_caching.messages.create(**request),
+                        plan.input_tokens + plan.max_tokens, "corrections"
+                    )
+            except Exception as e:
+                self._record_outcome(e)
+                raise
+            self._record_outcome()
             
             full_response = response.content[0].text
             logger.info("Successfully received response from Claude")
             
             # Parse the response to separate suggestions and corrected spec
-            return self._parse_claude_response(full_response)
+            result = self._finish_response("corrections", plan, full_response, response.usage, response.stop_reason,
+                                           compact=compact)
+            return self._cache_store(cache_keys, plan.model, result)
+            
+        except Exception as e:
+            logger.error(f"Could not get corrections from Claude: {e}")
+            return _failure_result(e)
+
+    async def aget_corrections(self, spec: Union[bytes, ParsedSpec], use_cache: bool = True,
+                               plan: Optional[TokenPlan] = None, schema_report: Optional[dict] = None) -> dict:
+        """
+        Async variant of get_corrections using the pooled async client.
+        Does not block the event loop while waiting on Claude.
+        Pass plan and schema_report when the caller already planned the
+        request and validated the spec.
+        """
+        parsed = spec if isinstance(spec, ParsedSpec) else parse_spec(spec)
+        cache_keys, cached = await self._acache_lookup("corrections", parsed, CORRECTIONS_PROMPT_VERSION, use_cache)
+        if cached:
+            return cached
+
+        if not self.async_anthropic_client:
+            return {
+                "suggestions": "Error: No Claude API key configured or client initialization failed",
+                "corrected_spec": ""
+            }
+        unavailable = self._circuit_open()
+        if unavailable:
+            return unavailable
+            
+        try:
+            plan = plan or await self.aplan_tokens("corrections", parsed)
+            compact = self._compact("corrections", parsed)
+            
+            result, verification = await self._acascade("corrections", parsed, plan, compact, schema_report=schema_report)
+            result = await self._averify("corrections", result, verification)
+            return await self._acache_store(cache_keys, result["routing"]["model"], result)
             
         except Exception as e:
             logger.error(f"Could not get corrections from Claude: {e}")
+            return _failure_result(e)
+
+    async def astream_corrections(self, parsed: ParsedSpec, use_cache: bool = True) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Stream a correction as (event, payload) tuples:
+        progress, suggestion, spec_chunk, and a final summary (or error).
+        Closing the generator early closes the upstream stream as well.
+        """
+        cache_keys, cached = await self._acache_lookup("corrections", parsed, CORRECTIONS_PROMPT_VERSION, use_cache)
+        if cached:
+            yield "progress", {"stage": "cache_hit"}
+            yield "summary", cached
+            return
+
+        if not self.async_anthropic_client:
+            yield "error", {"message": "No Claude API key configured or client initialization failed"}
+            return
+        unavailable = self._circuit_open()
+        if unavailable:
+            yield "error", {"message": unavailable["suggestions"].removeprefix("Error: ")}
+            return
+
+        plan = await self.aplan_tokens("corrections", parsed, hoist=False)
+        compact = self._compact("corrections", parsed, hoist=False)
+        parser = CorrectionStreamParser()
+        chunks = []
+        logger.info(f"Streaming request to Claude with max_tokens: {plan.max_tokens}")
+        yield "progress", {"stage": "llm_request", "max_tokens": plan.max_tokens, "model": plan.model}
+
+        request = self._request("corrections", plan, compact)
+        attempt = 0
+        llm_start = time.perf_counter()
+        while True:
+            first = True
+            try:
+                async with self.scheduler.slot(plan.input_tokens + plan.max_tokens if attempt == 0 else 0, "stream"):
+                    async with self.async_anthropic_client.beta.prompt_caching.messages.stream(**request) as stream:
+                        async for delta in stream.text_stream:
+                            if first:
+                                yield "progress", {"stage": "llm_first_token"}
+                                first = False
+                            chunks.append(delta)
+                            for event, text in parser.feed(delta):
+                                yield event, {"text": text}
+                        for event, text in parser.close():
+                            yield event, {"text": text}
+                        final = await stream.get_final_message()
+                break
+            except Exception as e:
+                attempt += 1
+                # Once text has been sent to the client the stream cannot be replayed
+                if first and self.scheduler.should_retry(e, attempt):
+                    delay = self.scheduler.backoff(e, attempt)
+                    logger.warning(f"Claude stream failed ({e}); retry {attempt}/{self.scheduler.max_retries} in {delay:.1f}s")
+                    yield "progress", {"stage": "llm_retry", "attempt": attempt, "delay_seconds": round(delay, 1)}
+                    await asyncio.sleep(delay)
+                    continue
+                self._record_outcome(e)
+                logger.error(f"Streaming corrections from Claude failed: {e}")
+                yield "error", {"message": f"Could not analyze file - {str(e)}"}
+                return
+
+        self._record_outcome()
+        metrics.STAGE_DURATION.observe(time.perf_counter() - llm_start, "llm_wait")
+        logger.info("Successfully streamed response from Claude")
+        result = await asyncio.to_thread(self._finish_response, "corrections", plan, "".join(chunks), final.usage,
+                                         final.stop_reason, None, compact)
+        yield "summary", await self._acache_store(cache_keys, plan.model, result)
+
+    async def aget_patch_corrections(self, parsed: ParsedSpec, use_cache: bool = True,
+                                     plan: Optional[TokenPlan] = None, schema_report: Optional[dict] = None) -> dict:
+        """
+        Ask Claude for JSON Patch operations instead of a regenerated spec,
+        apply them locally, validate and serialize the result.
+        Output (and so latency) scales with the number of fixes, not the spec size.
+        """
+        if not parsed.is_mapping:
+            # Nothing to patch - only a full rewrite can help
+            return await self.aget_corrections(parsed, use_cache=use_cache, schema_report=schema_report)
+
+        cache_keys, cached = await self._acache_lookup("patch", parsed, PATCH_PROMPT_VERSION, use_cache)
+        if cached:
+            return cached
+
+        if not self.async_anthropic_client:
             return {
-                "suggestions": f"Error: Could not analyze file - {str(e)}",
+                "suggestions": "Error: No Claude API key configured or client initialization failed",
                 "corrected_spec": ""
             }
+        unavailable = self._circuit_open()
+        if unavailable:
+            return unavailable
+
+        try:
+            plan = plan or await self.aplan_tokens("patch", parsed)
+            result, verification = await self._acascade("patch", parsed, plan, self._compact("patch", parsed),
+                                                        parse=lambda text: self._apply_patch_response(parsed, text),
+                                                        prefill=PATCH_PREFILL, schema_report=schema_report)
+            result = await self._averify("patch", result, verification)
+            return await self._acache_store(cache_keys, result["routing"]["model"], result)
+
+        except Exception as e:
+            logger.error(f"Could not get patch corrections from Claude: {e}")
+            return _failure_result(e)
+
+    async def aconvert_postman(self, collection: dict, use_cache: bool = True) -> dict:
+        """
+        Convert a parsed Postman collection to OpenAPI using the async client.
+        Returns dict with 'suggestions' and 'corrected_spec'
+        """
+        parsed = ParsedSpec.from_document(collection)
+        cache_keys, cached = await self._acache_lookup("postman", parsed, POSTMAN_PROMPT_VERSION, use_cache)
+        if cached:
+            return cached
+
+        if not self.async_anthropic_client:
+            return {"suggestions": "Error: No Claude API key configured", "corrected_spec": ""}
+        unavailable = self._circuit_open()
+        if unavailable:
+            return unavailable
+        
+        try:
+            plan = await self.aplan_tokens("postman", parsed)
+            compact = self._compact("postman", parsed)
+            
+            response = await self._acreate(self._request("postman", plan, compact), plan, "postman")
+            
+            full_response = response.content[0].text
+            # Parsing the response and dumping the spec is CPU work - keep it off the event loop
+            result = await asyncio.to_thread(self._finish_response, "postman", plan, full_response, response.usage,
+                                             response.stop_reason, None, compact)
+            return await self._acache_store(cache_keys, plan.model, result)
+            
+        except Exception as e:
+            logger.error(f"LLM conversion failed: {e}")
+            return {"suggestions": f"AI conversion failed: {str(e)}", "corrected_spec": ""}
+
+    async def aget_corrections_sharded(self, parsed: ParsedSpec, use_cache: bool = True,
+                                       max_paths: int = SHARD_MAX_PATHS,
+                                       concurrency: int = SHARD_CONCURRENCY) -> dict:
+        """
+        Correct a large spec as independent shards (path groups plus the
+        components they reference) concurrently, then merge the results and
+        verify the merged spec, which catches cross-shard problems such as
+        duplicate operationIds. Splitting, merging and verification run in
+        the process pool. Wall-clock time scales with the largest shard
+        instead of the whole spec.
+        """
+        if not parsed.is_mapping:
+            return await self.aget_corrections(parsed, use_cache=use_cache)
+
+        shards = await run_in_pool(_split_shards, parsed.document, max_paths)
+        if len(shards) == 1:
+            return await self.aget_corrections(parsed, use_cache=use_cache)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def correct_shard(shard: ParsedSpec) -> dict:
+            async with semaphore:
+                return await self.aget_corrections(shard, use_cache=use_cache)
+
+        logger.info(f"Correcting {len(shards)} shards with concurrency {concurrency}")
+        results = await asyncio.gather(*(correct_shard(shard) for shard in shards))
+        retryable = any(r.get("retryable") for r in results)
+
+        corrected_spec, verification, corrected, notes, conflicts = await run_in_pool(
+            _merge_shard_results, parsed.document, [shard.document for shard in shards], results)
+        if not corrected:
+            # Nothing came back from Claude - re-dumping the input would pass for a correction
+            failure = next((r["suggestions"] for r in results if r.get("suggestions", "").startswith("Error")),
+                           "Error: Could not analyze file - no shard could be corrected")
+            return {"suggestions": failure, "corrected_spec": "", "shards": len(shards), "retryable": retryable}
+
+        suggestions = [r["suggestions"] for r in results if r.get("suggestions")]
+        shard_stats = [r["compaction"] for r in results if r.get("compaction")]
+        result = {
+            "suggestions": "\n".join(suggestions + notes),
+            "corrected_spec": corrected_spec,
+            "duplicate_keys": [],
+            "shards": len(shards),
+            "shard_conflicts": conflicts,
+            "compaction": {key: sum(stats[key] or 0 for stats in shard_stats) for key in shard_stats[0]} if shard_stats else None,
+            "cached": all(r.get("cached") for r in results),
+            "retryable": retryable
+        }
+        return await self._averify("corrections", result, verification)
+
+    def _parse_patch_response(self, full_response: str) -> List[dict]:
+        """Decode the operations list from a JSON Patch response"""
+        start = full_response.find("{")
+        if start == -1:
+            raise ValueError("No JSON object in response")
+        payload, _ = json.JSONDecoder().raw_decode(full_response[start:])
+        operations = payload.get("operations") if isinstance(payload, dict) else payload
+        if not isinstance(operations, list):
+            raise ValueError("Response has no 'operations' list")
+        return operations
+
+    def _parse_repair_response(self, full_response: str) -> dict:
+        """Decode the pointer -> value map from a fragment repair response"""
+        start = full_response.find("{")
+        if start == -1:
+            raise ValueError("No JSON object in response")
+        payload, _ = json.JSONDecoder().raw_decode(full_response[start:])
+        fragments = payload.get("fragments") if isinstance(payload, dict) else None
+        if not isinstance(fragments, dict):
+            raise ValueError("Response has no 'fragments' object")
+        return fragments
+
+    def _apply_patch_response(self, parsed: ParsedSpec, full_response: str) -> dict:
+        """Apply Claude's patch to the parsed spec and serialize the result; _verification validates it"""
+        try:
+            operations = self._parse_patch_response(full_response)
+        except ValueError as e:
+            logger.warning(f"Claude patch response could not be decoded: {e}")
+            # Empty corrected_spec so callers fall back to the local result
+            return {"suggestions": "AI response format error - manual review needed", "corrected_spec": ""}
+
+        patched, applied, rejected = apply_patch(parsed.document, operations)
+
+        suggestions = [f"- {op.get('rationale') or 'No rationale given'} ({op['op']} {op['path']})" for op in applied]
+        suggestions += [f"- WARNING: rejected {op.get('op')} {op.get('path')}: {op['error']}" for op in rejected]
+        with metrics.stage("serialize"):
+            corrected_spec = dump_yaml(patched)
+        return {
+            "suggestions": "\n".join(suggestions) or "- No changes needed",
+            "corrected_spec": corrected_spec,
+            "duplicate_keys": [],
+            "patch": applied,
+            "rejected_operations": rejected,
+            # Validated from the document rather than by re-parsing the dump; removed before caching
+            PATCH_DOCUMENT_KEY: patched
+        }
 
     def _parse_claude_response(self, full_response: str) -> dict:
         """
@@ -147,26 +788,47 @@ class LLMService:
                         corrected_spec = corrected_spec[yaml_start:yaml_end].strip()
                     else:
                         corrected_spec = corrected_spec[yaml_start:].strip()
+                
+                # Catch duplicate keys locally instead of leaving them for Swagger Editor
+                duplicate_keys = self.find_duplicate(corrected_spec)
+                if duplicate_keys:
+                    logger.warning(f"Corrected spec contains {len(duplicate_keys)} duplicate key(s)")
+                    warnings = "\n".join(f"- WARNING: {m}" for m in format_duplicate_keys(duplicate_keys))
+                    suggestions = f"{suggestions}\n{warnings}"
                         
                 return {
                     "suggestions": suggestions,
-                    "corrected_spec": corrected_spec
+                    "corrected_spec": corrected_spec,
+                    "duplicate_keys": duplicate_keys
                 }
             
-            # Fallback if format not followed
+            # Fallback if format not followed - the text is only kept if it is a spec by itself
             logger.warning("Claude response did not follow expected format")
             return {
                 "suggestions": "AI response format error - manual review needed",
-                "corrected_spec": full_response
+                "corrected_spec": self._salvage_spec(full_response)
             }
             
         except Exception as e:
             logger.error(f"Error parsing Claude response: {e}")
             return {
                 "suggestions": f"Error parsing response: {str(e)}",
-                "corrected_spec": full_response
+                "corrected_spec": ""
             }
 
+    def _salvage_spec(self, full_response: str) -> str:
+        """A response without the expected headers, if it is an OpenAPI/Swagger document on its own, else ''"""
+        text = full_response.strip()
+        if "```" in text:
+            start = text.find("\n", text.find("```")) + 1
+            end = text.find("```", start)
+            text = text[start:end if end != -1 else len(text)].strip()
+        try:
+            document = load_yaml(text)[0]
+        except yaml.YAMLError:
+            return ""
+        return text if isinstance(document, dict) and ('openapi' in document or 'swagger' in document) else ""
+
     def test_connection(self) -> dict:
         """
         Test the Claude connection with a simple request
@@ -175,21 +837,49 @@ class LLMService:
             return {"success": False, "error": "No Claude client available"}
         
         try:
-            response = self.anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=100,
-                messages=[{"role": "user", "content": "Hello, please respond with 'Claude is working!'"}]
+            response = self.scheduler.run_sync(
+                lambda: self.anthropic_client.messages.create(
+                    model=CLAUDE_MODEL, max_tokens=PROBE_MAX_TOKENS, messages=PROBE_MESSAGES
+                ),
+                PROBE_TOKENS, "connection test", retry=False
             )
             
             return {
                 "success": True, 
                 "response": response.content[0].text.strip(),
-                "model": "claude-3-5-sonnet-20241022"
+                "model": CLAUDE_MODEL
             }
             
         except Exception as e:
             logger.error(f"Claude connection test failed: {e}")
-            return {"success": False, "error": str(e)}
+            # Only connection errors and 5xx count against the circuit breaker, as for real requests
+            return {"success": False, "error": str(e), "upstream_failure": is_upstream_failure(e)}
+
+    async def atest_connection(self) -> dict:
+        """
+        Async variant of test_connection using the pooled async client
+        """
+        if not self.async_anthropic_client:
+            return {"success": False, "error": "No Claude client available"}
+        
+        try:
+            response = await self.scheduler.run(
+                lambda: self.async_anthropic_client.messages.create(
+                    model=CLAUDE_MODEL, max_tokens=PROBE_MAX_TOKENS, messages=PROBE_MESSAGES
+                ),
+                PROBE_TOKENS, "connection test", retry=False
+            )
+            
+            return {
+                "success": True, 
+                "response": response.content[0].text.strip(),
+                "model": CLAUDE_MODEL
+            }
+            
+        except Exception as e:
+            logger.error(f"Claude connection test failed: {e}")
+            # Only connection errors and 5xx count against the circuit breaker, as for real requests
+            return {"success": False, "error": str(e), "upstream_failure": is_upstream_failure(e)}
 
 
     def get_service_info(self) -> dict:
@@ -206,7 +896,59 @@ class LLMService:
             "service_name": "LLM Service",
             "claude_available": self.anthropic_client is not None,
             "api_key_configured": bool(os.getenv("ANTHROPIC_API_KEY")),
+            "base_url": ANTHROPIC_BASE_URL,
             "anthropic_version": anthropic_version,
-            "supported_models": ["claude-3-5-sonnet-20241022", "claude-3-5-haiku-20241022"],
-            "max_tokens_supported": 50000
-        }
\ No newline at end of file
+            "supported_models": list(MODEL_LIMITS),
+            "max_tokens_supported": max(limits["max_output"] for limits in MODEL_LIMITS.values()),
+            "cache": self.cache.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "routing": self.router.get_stats(),
+            "token_usage": self.usage.get_stats()
+        }
+
+
+def _split_shards(document: dict, max_paths: int) -> List[ParsedSpec]:
+    """Split a spec into shard specs; top-level so it can be shipped to a process pool"""
+    return [ParsedSpec.from_document(shard, file_type='yaml') for shard in split_spec(document, max_paths)]
+
+
+def _merge_shard_results(document: dict, shards: List[dict],
+                         results: List[dict]) -> Tuple[str, Verification, int, List[str], List[str]]:
+    """
+    Parse the corrected shards (keeping the original section for any that
+    failed), merge, verify and serialize them. Returns (corrected spec, its
+    verification, number of shards corrected, warnings, merge conflicts).
+    Top-level so it can be shipped to a process pool.
+    """
+    corrected_shards, notes, corrected_count = [], [], 0
+    for index, (shard, result) in enumerate(zip(shards, results)):
+        corrected = None
+        if result.get("corrected_spec") and not result.get("duplicate_keys"):
+            try:
+                corrected = load_yaml(result["corrected_spec"])[0]
+            except yaml.YAMLError as e:
+                logger.warning(f"Shard {index} returned invalid YAML: {e}")
+        if isinstance(corrected, dict):
+            corrected_count += 1
+        else:
+            notes.append(f"- WARNING: shard {index} could not be corrected; kept the original section")
+            corrected = shard
+        corrected_shards.append(corrected)
+
+    merged, conflicts = merge_shards(document, corrected_shards)
+    notes += [f"- WARNING: {conflict}" for conflict in conflicts]
+    verification = verify_document(merged)
+    return dump_yaml(merged), verification, corrected_count, notes, conflicts
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.monotonic() - start) * 1000, 1)
+
+
+def _failure_result(error: Exception) -> dict:
+    """Result for a failed Claude call; retryable is only set for rate limits, 5xx and connection errors"""
+    return {
+        "suggestions": f"Error: Could not analyze file - {str(error)}",
+        "corrected_spec": "",
+        "retryable": is_retryable(error)
+    }
@@ -0,0 +1,234 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are plain dict/list increments without locks: on
+the event loop they are exact, and the rare lost increment when two worker
+threads race is an acceptable price for keeping instrumentation off the
+hot path's critical sections. Values owned by other components (scheduler
+queue, cache counters) are read through callbacks at scrape time only.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+
+from config.logging import dropped_records
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+# Seconds: sub-millisecond parsing up to multi-minute Claude responses
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Bytes: 1KB .. 50MB
+SIZE_BUCKETS = (1024, 10240, 102400, 524288, 1048576, 5242880, 10485760, 52428800)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._function: Optional[Callable[[], Dict[Labels, float]]] = None
+
+    def set_function(self, function: Callable[[], Dict[Labels, float]]):
+        """Read the values at scrape time instead ({label values: value})"""
+        self._function = function
+
+    def _values(self) -> Dict[Labels, float]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        values = self._function() if self._function is not None else self._values()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._counts: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._counts[labels] = self._counts.get(labels, 0) + amount
+
+    def _values(self) -> Dict[Labels, float]:
+        return dict(self._counts)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._gauges: Dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str):
+        self._gauges[labels] = value
+
+    def _values(self) -> Dict[Labels, float]:
+        return dict(self._gauges)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts..., +Inf count, sum]; made cumulative only when rendered
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the duration of the block in seconds"""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in sorted(self._series.items()):
+            series = list(series)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: entering a generator costs several times more
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "spec_inspector_http_requests_total", "HTTP requests by route template, method and status",
+    ("method", "route", "status")))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "spec_inspector_http_request_duration_seconds", "HTTP request latency (until the response body is sent)",
+    ("method", "route")))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "spec_inspector_stage_duration_seconds",
+    "Pipeline stage latency: upload_read, decode, parse, validate, prompt_build, llm_wait, response_parse, serialize",
+    ("stage",)))
+UPLOAD_SIZE = REGISTRY.register(Histogram(
+    "spec_inspector_upload_size_bytes", "Size of uploaded files", (), SIZE_BUCKETS))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "spec_inspector_llm_tokens_total",
+    "Claude tokens by model and type (input, output, cache_read, cache_write)", ("model", "type")))
+LLM_UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "spec_inspector_llm_upstream_errors_total", "Failed Claude request attempts by exception type", ("type",)))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "spec_inspector_llm_in_flight", "Claude requests currently holding a scheduler slot"))
+LLM_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "spec_inspector_llm_queue_depth", "Claude requests waiting for a scheduler slot or token budget"))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "spec_inspector_cache_lookups_total", "Correction cache lookups by result (memory_hit, disk_hit, miss)",
+    ("result",)))
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    "spec_inspector_log_records_dropped_total", "Log records dropped because the logging queue was full"))
+LOG_RECORDS_DROPPED.set_function(lambda: {(): dropped_records()})
+
+
+def observe_stages(timings: Dict[str, float]):
+    """Record stage durations (seconds) measured elsewhere, e.g. in a process pool worker"""
+    for stage, seconds in timings.items():
+        STAGE_DURATION.observe(seconds, stage)
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage"""
+    return STAGE_DURATION.time(name)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and their latency per route template (not per raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners cannot blow up the series count
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_DURATION.observe(time.perf_counter() - start, scope["method"], path)
+            HTTP_REQUESTS.inc(scope["method"], path, str(status[0]))
@@ -0,0 +1,147 @@
+"""
+Model routing for corrections.
+
+Small specs with few validation issues go to a cheaper, faster model first;
+its output is validated locally and the request is escalated to the model
+chosen by the token planner (Sonnet) only when that validation fails.
+Every decision is logged and counted so the escalation rate can be watched.
+"""
+from collections import Counter, deque
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from typing import Any, Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from api.services.token_planner import MODEL_LIMITS, TokenPlan
+from utils.schema_validation import detect_version
+from utils.spec_verifier import Verification
+from utils.validators import ParsedSpec
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LLM_CASCADE_ENABLED = os.getenv("LLM_CASCADE_ENABLED", "true").lower() == "true"
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "claude-3-5-haiku-20241022")
+# Larger or messier specs go straight to the planner's model
+LLM_CASCADE_MAX_INPUT_TOKENS = int(os.getenv("LLM_CASCADE_MAX_INPUT_TOKENS", "16000"))
+LLM_CASCADE_MAX_ISSUES = int(os.getenv("LLM_CASCADE_MAX_ISSUES", "10"))
+
+# Request kinds whose output can be checked locally
+CASCADE_KINDS = ("corrections", "patch")
+ROUTING_HISTORY = 200
+
+
+@dataclass
+class Route:
+    model: str
+    tier: str  # 'fast' (try the cheap model first) or 'direct'
+    reason: str
+    issues: Optional[int] = None
+
+
+class ModelRouter:
+    """Chooses the model per request and records routing decisions and escalations"""
+
+    def __init__(self, enabled: bool = LLM_CASCADE_ENABLED, fast_model: str = LLM_FAST_MODEL,
+                 max_input_tokens: int = LLM_CASCADE_MAX_INPUT_TOKENS, max_issues: int = LLM_CASCADE_MAX_ISSUES):
+        self.enabled = enabled
+        self.fast_model = fast_model
+        self.max_input_tokens = max_input_tokens
+        self.max_issues = max_issues
+        self._decisions = deque(maxlen=ROUTING_HISTORY)
+        self._counts = Counter()
+        self._escalation_reasons = Counter()
+        self._lock = threading.Lock()
+
+    def screen(self, kind: str, parsed: ParsedSpec, plan: TokenPlan) -> Optional[Route]:
+        """
+        Direct route for a request that cannot go to the fast model whatever
+        its validation issues, else None - the caller then validates the input
+        (off the event loop) and calls choose.
+        """
+        if not self.enabled or kind not in CASCADE_KINDS or plan.model == self.fast_model:
+            return Route(plan.model, "direct", "cascade not applicable")
+        if not parsed.is_mapping:
+            return Route(plan.model, "direct", "input is not a parsed mapping")
+        limits = MODEL_LIMITS.get(self.fast_model)
+        if limits is None or not plan.fits or plan.max_tokens > limits["max_output"]:
+            return Route(plan.model, "direct", "expected output exceeds the fast model's limit")
+        if plan.input_tokens > self.max_input_tokens:
+            return Route(plan.model, "direct", f"{plan.input_tokens} input tokens > {self.max_input_tokens}")
+        return None
+
+    def choose(self, kind: str, parsed: ParsedSpec, plan: TokenPlan, report: dict) -> Route:
+        """Route for one request, given the input's schema validation report"""
+        route = self.screen(kind, parsed, plan)
+        if route is not None:
+            return route
+        issues = len(report["errors"]) + (1 if report["truncated"] else 0)
+        if issues > self.max_issues:
+            return Route(plan.model, "direct", f"{issues} validation issues > {self.max_issues}", issues)
+        return Route(self.fast_model, "fast", f"{plan.input_tokens} input tokens, {issues} validation issues", issues)
+
+    def check(self, kind: str, result: dict, verification: Optional[Verification] = None) -> Tuple[bool, str]:
+        """
+        Judge the fast model's result from its local verification (the same one
+        the caller goes on to repair from, so nothing is validated twice).
+        Returns (accepted, reason).
+        """
+        suggestions = result.get("suggestions", "")
+        if not result.get("corrected_spec") or suggestions.startswith(("Error", "AI response format error")):
+            return False, "no usable correction"
+        if result.get("truncated"):
+            return False, "response hit max_tokens"
+        if result.get("duplicate_keys"):
+            return False, "duplicate keys"
+        if kind == "patch":
+            if result.get("rejected_operations"):
+                return False, "rejected patch operations"
+            if verification is None or verification.errors:
+                return False, "patched spec fails schema validation"
+            return True, "patched spec is valid"
+
+        if verification is None or verification.parse_error:
+            return False, "invalid YAML"
+        if detect_version(verification.document) != "3.1":
+            return False, "corrected spec is not OpenAPI 3.1"
+        if verification.errors:
+            return False, "corrected spec fails schema validation"
+        return True, "corrected spec is valid"
+
+    def record(self, kind: str, route: Route, escalated: Optional[bool] = None, reason: Optional[str] = None):
+        """Record a decision; escalated is None for requests sent straight to the planner's model"""
+        decision = {"timestamp": time.time(), "kind": kind, "model": route.model, "tier": route.tier,
+                    "route_reason": route.reason, "issues": route.issues, "escalated": escalated, "reason": reason}
+        if escalated:
+            logger.info(f"Escalating {kind} from {route.model}: {reason}")
+        else:
+            logger.info(f"Routed {kind} to {route.model} ({route.tier}): {reason or route.reason}")
+        with self._lock:
+            self._decisions.append(decision)
+            self._counts[route.tier] += 1
+            if escalated:
+                self._counts["escalated"] += 1
+                self._escalation_reasons[reason] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            reasons = dict(self._escalation_reasons.most_common(10))
+            recent = list(self._decisions)[-20:]
+        fast = counts.get("fast", 0)
+        return {
+            "enabled": self.enabled,
+            "fast_model": self.fast_model,
+            "max_input_tokens": self.max_input_tokens,
+            "max_issues": self.max_issues,
+            "fast_attempts": fast,
+            "direct": counts.get("direct", 0),
+            "escalated": counts.get("escalated", 0),
+            # Share of fast-model attempts that had to be redone on the planner's model
+            "escalation_rate": round(counts.get("escalated", 0) / fast, 3) if fast else None,
+            "escalation_reasons": reasons,
+            "recent": recent
+        }
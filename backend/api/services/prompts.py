@@ -0,0 +1,142 @@
+"""
+Prompts for Claude.
+
+Static instructions live in system prompts and the variable spec content
+always goes last, in the user message. A system prompt gets a cache_control
+breakpoint only when it reaches the model's minimum cacheable length - a
+shorter prefix is never cached, so marking it would only add noise.
+"""
+from functools import lru_cache
+from typing import Dict, List
+
+from api.services.token_planner import count_tokens
+
+# Minimum cacheable prefix per model family (Anthropic prompt caching)
+CACHE_MIN_TOKENS = {"haiku": 2048}
+DEFAULT_CACHE_MIN_TOKENS = 1024
+
+OPENAPI_31_RULES = (
+    "You are an OpenAPI 3.1.0 Specification expert. You correct API specifications so that they are "
+    "complete, valid OpenAPI 3.1.0 documents.\n\n"
+
+    "REQUIREMENTS:\n"
+    "- Fix all structural errors and validation issues\n"
+    "- Enhance metadata, schemas, tags, and security\n"
+    "- Keep every existing path, operation, parameter and schema unless it is invalid\n\n"
+
+    "THE RESULT MUST INCLUDE:\n"
+    "- openapi: 3.1.0\n"
+    "- info.title, info.version, info.description\n"
+    "- info.termsOfService, info.contact, info.license\n"
+    "- servers (at least one)\n"
+    "- paths (can be empty object)\n"
+    "- components.schemas\n"
+    "- components.securitySchemes\n"
+    "- security (global)\n"
+    "- tags\n\n"
+
+    "OPENAPI 3.1 RULES:\n"
+    "- Schemas follow JSON Schema 2020-12: use type arrays such as [string, 'null'] instead of nullable: true\n"
+    "- Request bodies use requestBody with a content map, never 'in: body' parameters\n"
+    "- Every path template parameter ({id}) is declared as an 'in: path' parameter with required: true\n"
+    "- Include validation constraints where appropriate\n\n"
+
+    "CRITICAL YAML RULES:\n"
+    "- NEVER use duplicate keys at the same level (e.g., two 'schemas:' in components)\n"
+    "- All schemas must be in ONE 'schemas:' section under components\n"
+    "- Put Error schema with other schemas, not separately\n"
+    "- Valid structure: components: { schemas: { User: ..., Error: ... }, responses: ..., securitySchemes: ... }\n"
+)
+
+CORRECTIONS_FORMAT = (
+    "\nRESPONSE FORMAT:\n"
+    "- Start the corrected spec with a multi-line comment block explaining the changes\n"
+    "- Add inline comments for fixes and improvements\n"
+    "- Return the complete corrected YAML, not a diff\n\n"
+    "Format your response as:\n"
+    "## SUGGESTIONS:\n"
+    "[Bulleted list of specific issues found and how they were fixed]\n\n"
+    "## CORRECTED SPEC:\n"
+    "```yaml\n"
+    "[Complete corrected YAML file]\n"
+    "```\n"
+)
+
+PATCH_FORMAT = (
+    "\nRESPONSE FORMAT:\n"
+    "Only describe changes - never restate parts of the document that stay the same.\n"
+    "Respond with ONLY a JSON object, no markdown:\n"
+    '{"operations": [{"op": "add", "path": "/info/description", "value": "...", "rationale": "..."}]}\n'
+    "- op is one of add, remove, replace, move, copy, test (RFC 6902 JSON Patch); move/copy use 'from'\n"
+    "- path is a JSON Pointer into the document as given (escape '/' in keys as ~1 and '~' as ~0)\n"
+    "- Operations are applied in order\n"
+    "- rationale is one short sentence explaining the fix\n"
+)
+
+REPAIR_FORMAT = (
+    "\nTASK:\n"
+    "You are given fragments of a corrected OpenAPI 3.1.0 document that still fail validation. Each fragment\n"
+    "is keyed by its JSON Pointer and lists the errors found in it, with either its current 'value' or, when it\n"
+    "contains duplicate keys, the raw 'yaml' that was generated. Fix only those fragments.\n\n"
+    "RESPONSE FORMAT:\n"
+    "Respond with ONLY a JSON object, no markdown:\n"
+    '{"fragments": {"/paths/~1users~1{id}": {...corrected path item...}, "/components/schemas/User": {...}}}\n'
+    "- Return every fragment you were given, keyed by the same pointer, as its complete corrected value\n"
+    "- Keep everything in a fragment that is already valid exactly as it is\n"
+    "- Merge duplicate keys into a single key that keeps the content of every definition\n"
+    "- $ref values may only point at the components listed in the request\n"
+    "- Never return fragments you were not given\n"
+)
+
+POSTMAN_INSTRUCTIONS = (
+    "You are an expert at converting Postman collections to OpenAPI 3.1.0 specifications.\n\n"
+    "Convert the Postman collection you are given to a complete, valid OpenAPI 3.1.0 YAML specification.\n\n"
+    "REQUIREMENTS:\n"
+    "- Extract API info from collection.info\n"
+    "- Convert collection.item[] to OpenAPI paths\n"
+    "- Extract servers from request URLs\n"
+    "- Add security schemes based on auth types\n"
+    "- Include standard error responses (400, 401, 403, 404, 500)\n\n"
+    "MUST INCLUDE:\n"
+    "- openapi: 3.1.0\n"
+    "- Complete info, servers, paths, components sections\n"
+    "- Proper YAML structure (no duplicate keys)\n\n"
+    "Format response as:\n"
+    "## SUGGESTIONS:\n"
+    "[List of conversion decisions made]\n\n"
+    "## CORRECTED SPEC:\n"
+    "```yaml\n"
+    "[Complete OpenAPI 3.1.0 YAML]\n"
+    "```\n"
+)
+
+SYSTEM_PROMPTS = {
+    "corrections": OPENAPI_31_RULES + CORRECTIONS_FORMAT,
+    "patch": OPENAPI_31_RULES + PATCH_FORMAT,
+    "repair": OPENAPI_31_RULES + REPAIR_FORMAT,
+    "postman": POSTMAN_INSTRUCTIONS,
+}
+
+
+@lru_cache(maxsize=None)
+def is_cacheable(kind: str, model: str) -> bool:
+    """Whether kind's system prompt reaches model's minimum cacheable prefix"""
+    minimum = next((tokens for family, tokens in CACHE_MIN_TOKENS.items() if family in model), DEFAULT_CACHE_MIN_TOKENS)
+    return count_tokens(SYSTEM_PROMPTS[kind]) >= minimum
+
+
+def system_blocks(kind: str, model: str) -> List[Dict]:
+    """System prompt for kind as content blocks, with a cache breakpoint after the static text when it can be cached"""
+    block = {"type": "text", "text": SYSTEM_PROMPTS[kind]}
+    if is_cacheable(kind, model):
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
+
+
+def user_message(kind: str, content: str, language: str = "yaml") -> str:
+    """The variable part of a request - always sent after the cached system prompt"""
+    if kind == "postman":
+        return f"Postman Collection:\n```json\n{content}\n```"
+    if kind == "repair":
+        return f"Fragments to repair:\n```json\n{content}\n```"
+    return f"File to analyze:\n```{language}\n{content}\n```"
@@ -0,0 +1,245 @@
+"""
+Concurrency and token-rate limits for LLM work.
+
+LLMScheduler is the single gate every Claude request goes through: a
+concurrency cap, a tokens-per-minute bucket charged with the estimated input
+plus max_tokens, and jittered exponential backoff on 429/5xx/connection
+errors that honors retry-after. A batch gets its own concurrency cap from
+batch_limit, but its tokens are charged to the shared bucket like any other
+request.
+"""
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+from anthropic import APIConnectionError, APIStatusError
+from api.services import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "400000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "60"))
+
+# 408 timeout, 409 lock conflict, 429 rate limit, 5xx (529 overloaded) are worth retrying
+RETRYABLE_STATUS = (408, 409, 429)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute bucket that refills continuously. Callers reserve
+    tokens up front and sleep for the returned delay, so waiters are served
+    in order and the same bucket works from threads and the event loop.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Take tokens (the balance may go negative) and return the seconds to wait before sending"""
+        if self.tokens_per_minute <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            rate = self.tokens_per_minute / WINDOW_SECONDS
+            self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            # A single request larger than the bucket still goes through once the bucket is full
+            self._tokens -= min(tokens, self.tokens_per_minute)
+            return max(0.0, -self._tokens / rate)
+
+    def available(self) -> float:
+        if self.tokens_per_minute <= 0:
+            return 0.0
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            return min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / WINDOW_SECONDS)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code in RETRYABLE_STATUS or error.status_code >= 500)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait (retry-after-ms / retry-after headers), if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return (parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """Concurrency cap, token bucket and retry policy shared by every Claude request"""
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = LLM_MAX_RETRIES, retry_base_seconds: float = LLM_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = LLM_RETRY_MAX_SECONDS):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.bucket = TokenBucket(tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # Blocking callers (the sync client) get their own slots - they run outside the event loop
+        self._thread_semaphore = threading.BoundedSemaphore(self.concurrency)
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.retried_errors = {}  # status code (or 'connection') -> count
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def backoff(self, error: Exception, attempt: int) -> float:
+        """Delay before retry number attempt (1-based): retry-after when given, else exponential with jitter"""
+        delay = retry_after(error)
+        if delay is None:
+            delay = self.retry_base_seconds * (2 ** (attempt - 1))
+            delay += random.uniform(0, delay / 2)
+        return min(max(delay, 0.0), self.retry_max_seconds)
+
+    def should_retry(self, error: Exception, attempt: int, retry: bool = True) -> bool:
+        """Record a failed attempt; True when it should be retried"""
+        metrics.LLM_UPSTREAM_ERRORS.inc(type(error).__name__)
+        retry = retry and is_retryable(error) and attempt <= self.max_retries
+        with self._stats_lock:
+            if retry:
+                self.retries += 1
+                key = str(getattr(error, "status_code", "connection"))
+                self.retried_errors[key] = self.retried_errors.get(key, 0) + 1
+            else:
+                self.failures += 1
+        return retry
+
+    def _queued(self, delta: int):
+        with self._stats_lock:
+            self.queued += delta
+
+    def _started(self, waited: float):
+        with self._stats_lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.requests += 1
+            self.wait_ms_total += waited * 1000
+            self.wait_ms_max = max(self.wait_ms_max, waited * 1000)
+
+    def _finished(self):
+        with self._stats_lock:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, label: str = "request"):
+        """Hold one concurrency slot for a single attempt, after the token bucket allows it"""
+        start = time.monotonic()
+        self._queued(1)
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._queued(-1)
+            raise
+        try:
+            delay = self.bucket.reserve(tokens)
+            if delay > 0:
+                logger.info(f"Token bucket empty, delaying {label} by {delay:.1f}s")
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._queued(-1)
+            self._semaphore.release()
+            raise
+        self._started(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._finished()
+            self._semaphore.release()
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: int, label: str = "request", retry: bool = True) -> T:
+        """Await call() under the scheduler, retrying transient errors with backoff unless retry is False"""
+        attempt = 0
+        while True:
+            try:
+                # Tokens are charged once - a rejected attempt did not spend them upstream
+                async with self.slot(tokens if attempt == 0 else 0, label):
+                    return await call()
+            except Exception as e:
+                attempt += 1
+                if not self.should_retry(e, attempt, retry):
+                    raise
+                delay = self.backoff(e, attempt)
+                logger.warning(f"Claude {label} failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def run_sync(self, call: Callable[[], T], tokens: int, label: str = "request", retry: bool = True) -> T:
+        """Blocking variant of run for the sync client"""
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            self._queued(1)
+            with self._thread_semaphore:
+                time.sleep(self.bucket.reserve(tokens if attempt == 0 else 0))
+                self._started(time.monotonic() - start)
+                try:
+                    return call()
+                except Exception as e:
+                    error = e
+                finally:
+                    self._finished()
+            attempt += 1
+            if not self.should_retry(error, attempt, retry):
+                raise error
+            delay = self.backoff(error, attempt)
+            logger.warning(f"Claude {label} failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def batch_limit(self, concurrency: int) -> asyncio.Semaphore:
+        """Cap on one batch's concurrent corrections, within the scheduler's own concurrency"""
+        return asyncio.Semaphore(max(1, min(concurrency, self.concurrency)))
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "retried_errors": dict(self.retried_errors),
+                "avg_wait_ms": round(self.wait_ms_total / self.requests, 1) if self.requests else 0.0,
+                "max_wait_ms": round(self.wait_ms_max, 1),
+                "tokens_per_minute": self.bucket.tokens_per_minute,
+                "tokens_available": round(self.bucket.available())
+            }
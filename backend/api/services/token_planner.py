@@ -0,0 +1,304 @@
+"""
+Token budget planning for Claude requests.
+
+Input tokens are counted offline, so the counts are approximations: the
+tokenizer bundled with the anthropic SDK (a private module built for older
+models) when it loads, otherwise ~4 characters per token. Output size is
+estimated from the structure of the parsed spec (the corrected spec is
+roughly the input plus descriptions/responses per operation and schema,
+plus the suggestions list), which picks max_tokens and the smallest model
+whose output limit fits. Each response's actual usage is recorded against
+the prediction so the estimator can be recalibrated (see
+TOKEN_PLANNER_CALIBRATION); the usage log is written by a background
+thread and rotated at TOKEN_USAGE_LOG_MAX_BYTES.
+"""
+from config.logging import DroppingQueueHandler, LOG_QUEUE_SIZE, setup_logging
+from collections import deque
+from dataclasses import asdict, dataclass
+from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import threading
+import time
+from api.services import metrics
+from utils.postman_compiler import count_requests
+from utils.swagger_converter import HTTP_METHODS
+
+try:
+    # Private SDK module - may move or disappear in any release
+    from anthropic._tokenizers import sync_get_tokenizer
+except Exception:  # pragma: no cover - depends on the installed SDK
+    sync_get_tokenizer = None
+
+load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Output token limits per model; requests above the default model's limit move up.
+# Haiku is only used by the model router's cascade (see model_router).
+MODEL_LIMITS = {
+    "claude-3-5-haiku-20241022": {"max_output": 8192, "context": 200000},
+    "claude-3-5-sonnet-20241022": {"max_output": 8192, "context": 200000},
+    "claude-3-7-sonnet-20250219": {"max_output": 64000, "context": 200000},
+}
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+DEFAULT_MODEL_LIMITS = {"max_output": 8192, "context": 200000}
+LARGE_OUTPUT_MODEL = os.getenv("LLM_LARGE_OUTPUT_MODEL", "claude-3-7-sonnet-20250219")
+
+# Output estimate = base + ratio * spec tokens + per-operation + per-schema additions
+OUTPUT_BASE_TOKENS = 400         # Suggestions list and headers
+OUTPUT_SPEC_RATIO = 1.1          # Corrected spec re-emits the whole input
+OUTPUT_PER_OPERATION = 40        # Added summaries, descriptions, responses
+OUTPUT_PER_SCHEMA = 15           # Added descriptions/examples
+OUTPUT_SAFETY_MARGIN = 1.2
+
+# Patch output only lists changes, so it scales with structure instead of spec size
+PATCH_OUTPUT_BASE_TOKENS = 300
+PATCH_PER_OPERATION = 60
+PATCH_PER_SCHEMA = 30
+MIN_MAX_TOKENS = 1024
+TOKEN_PLANNER_CALIBRATION = float(os.getenv("TOKEN_PLANNER_CALIBRATION", "1.0"))
+
+TOKEN_USAGE_LOG_PATH = os.getenv("TOKEN_USAGE_LOG_PATH", "data/usage/token_usage.jsonl")
+TOKEN_USAGE_LOG_MAX_BYTES = int(os.getenv("TOKEN_USAGE_LOG_MAX_BYTES", "10485760"))  # 10 MB
+TOKEN_USAGE_LOG_BACKUP_COUNT = int(os.getenv("TOKEN_USAGE_LOG_BACKUP_COUNT", "3"))
+USAGE_HISTORY = 500
+
+# Tokenizing runs at roughly 1MB/s; larger texts are sampled
+EXACT_COUNT_MAX_CHARS = 100000
+COUNT_SAMPLES = 10
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    """The SDK's bundled tokenizer, or None when it cannot be loaded"""
+    if sync_get_tokenizer is None:
+        return None
+    try:
+        return sync_get_tokenizer()
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, estimating ~4 characters per token: {e}")
+        return None
+
+
+def token_count_method() -> str:
+    """How count_tokens estimates; both are approximations of the API's own count"""
+    return "tokenizer (approximate)" if _tokenizer() is not None else "characters / 4 (approximate)"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate token count, computed offline: the SDK's bundled tokenizer
+    when it loads, otherwise ~4 characters per token.
+    Texts over EXACT_COUNT_MAX_CHARS are counted from evenly spaced samples.
+    """
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return len(text) // 4
+
+    if len(text) <= EXACT_COUNT_MAX_CHARS:
+        return len(tokenizer.encode(text).ids)
+
+    sample_size = EXACT_COUNT_MAX_CHARS // COUNT_SAMPLES
+    stride = len(text) // COUNT_SAMPLES
+    sampled = sum(len(tokenizer.encode(text[i * stride:i * stride + sample_size]).ids) for i in range(COUNT_SAMPLES))
+    return int(sampled * len(text) / (sample_size * COUNT_SAMPLES))
+
+
+@dataclass
+class SpecShape:
+    paths: int = 0
+    operations: int = 0
+    schemas: int = 0
+    parameters: int = 0
+    responses: int = 0
+
+
+def measure_spec(document: Any) -> SpecShape:
+    """Structural counts that drive the output estimate (OpenAPI 3, Swagger 2 or a Postman collection)"""
+    shape = SpecShape()
+    if not isinstance(document, dict):
+        return shape
+
+    if 'paths' not in document and isinstance(document.get('item'), list):
+        # Postman collection - every request becomes (part of) an operation
+        shape.operations = count_requests(document)
+        return shape
+
+    paths = document.get('paths') if isinstance(document.get('paths'), dict) else {}
+    shape.paths = len(paths)
+    for path_item in paths.values():
+        if not isinstance(path_item, dict):
+            continue
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if isinstance(operation, dict):
+                shape.operations += 1
+                shape.parameters += len(operation.get('parameters') or [])
+                responses = operation.get('responses')
+                shape.responses += len(responses) if isinstance(responses, dict) else 0
+
+    components = document.get('components') if isinstance(document.get('components'), dict) else {}
+    schemas = components.get('schemas') or document.get('definitions') or {}
+    shape.schemas = len(schemas) if isinstance(schemas, dict) else 0
+    return shape
+
+
+@dataclass
+class TokenPlan:
+    model: str
+    max_tokens: int
+    input_tokens: int
+    predicted_output_tokens: int
+    fits: bool  # False when even the largest model cannot hold the expected output
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _limits(model: str) -> Dict[str, int]:
+    return MODEL_LIMITS.get(model, DEFAULT_MODEL_LIMITS)
+
+
+def plan_request(content: str, document: Any = None, overhead_tokens: int = 0, output_format: str = "spec",
+                 default_model: str = DEFAULT_MODEL, calibration: float = TOKEN_PLANNER_CALIBRATION) -> TokenPlan:
+    """
+    Plan one request: count the spec (plus the prompt template's overhead),
+    estimate the output from the spec structure and choose max_tokens and
+    the model. output_format is 'spec' (full corrected spec) or 'patch'.
+    """
+    content_tokens = count_tokens(content)
+    input_tokens = content_tokens + overhead_tokens
+    shape = measure_spec(document)
+
+    predicted = (OUTPUT_BASE_TOKENS + OUTPUT_SPEC_RATIO * content_tokens
+                 + OUTPUT_PER_OPERATION * shape.operations + OUTPUT_PER_SCHEMA * shape.schemas)
+    if output_format == "patch":
+        predicted = min(predicted, PATCH_OUTPUT_BASE_TOKENS + PATCH_PER_OPERATION * shape.operations
+                        + PATCH_PER_SCHEMA * shape.schemas)
+    predicted = int(predicted * calibration)
+    max_tokens = max(MIN_MAX_TOKENS, math.ceil(predicted * OUTPUT_SAFETY_MARGIN / 512) * 512)
+
+    candidates = [default_model] + ([LARGE_OUTPUT_MODEL] if LARGE_OUTPUT_MODEL != default_model else [])
+    for model in candidates:
+        limits = _limits(model)
+        if max_tokens <= limits["max_output"] and input_tokens + max_tokens <= limits["context"]:
+            return TokenPlan(model, max_tokens, input_tokens, predicted, True)
+
+    # Nothing fits - use the largest model as far as it goes and let the caller shard
+    limits = _limits(candidates[-1])
+    max_tokens = max(MIN_MAX_TOKENS, min(limits["max_output"], limits["context"] - input_tokens))
+    return TokenPlan(candidates[-1], max_tokens, input_tokens, predicted, False)
+
+
+class UsageRecorder:
+    """
+    Predicted vs actual token usage per request, kept in memory and appended
+    to a rotating JSONL log. Records are only enqueued by record(); a
+    QueueListener thread does the file I/O, as for the application log.
+    """
+
+    def __init__(self, log_path: Optional[str] = TOKEN_USAGE_LOG_PATH, history: int = USAGE_HISTORY,
+                 max_bytes: int = TOKEN_USAGE_LOG_MAX_BYTES, backup_count: int = TOKEN_USAGE_LOG_BACKUP_COUNT):
+        self.log_path = log_path
+        self._records = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._log: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        if self.log_path:
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(self.log_path, maxBytes=max_bytes,
+                                                               backupCount=backup_count, encoding="utf-8")
+            except OSError as e:
+                logger.error(f"Could not open token usage log, keeping usage in memory: {e}")
+                self.log_path = None
+            else:
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+                # A standalone logger: usage records never reach the application log handlers
+                self._log = logging.Logger("token_usage", logging.INFO)
+                self._log.addHandler(queue_handler)
+                self._listener = logging.handlers.QueueListener(queue_handler.queue, handler)
+                self._listener.start()
+
+    def record(self, kind: str, plan: TokenPlan, usage: Any, stop_reason: Optional[str]):
+        """Record one response's usage (an anthropic Usage object) against its plan"""
+        record = {
+            "timestamp": time.time(),
+            "kind": kind,
+            "model": plan.model,
+            "max_tokens": plan.max_tokens,
+            "predicted_input_tokens": plan.input_tokens,
+            "predicted_output_tokens": plan.predicted_output_tokens,
+            "input_tokens": getattr(usage, "input_tokens", 0),
+            "output_tokens": getattr(usage, "output_tokens", 0),
+            # Prompt caching: prefix tokens written to / read from the cache (not included in input_tokens)
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+            "truncated": stop_reason == "max_tokens"
+        }
+        logger.info(f"Token usage ({kind}): {record['input_tokens']} input, {record['cache_read_input_tokens']} "
+                    f"cache read, {record['cache_creation_input_tokens']} cache write, {record['output_tokens']} output")
+        if record["truncated"]:
+            logger.warning(f"Claude response hit max_tokens={plan.max_tokens} ({kind})")
+
+        for token_type, key in (("input", "input_tokens"), ("output", "output_tokens"),
+                                  ("cache_read", "cache_read_input_tokens"), ("cache_write", "cache_creation_input_tokens")):
+            if record[key]:
+                metrics.LLM_TOKENS.inc(plan.model, token_type, amount=record[key])
+
+        with self._lock:
+            self._records.append(record)
+        if self._log is not None:
+            self._log.info(json.dumps(record))
+
+    def close(self):
+        """Flush pending usage records and stop the writer thread"""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Prediction accuracy over recent requests and a suggested calibration factor"""
+        with self._lock:
+            records = list(self._records)
+        if not records:
+            return {"requests": 0, "token_count_method": token_count_method(), "calibration": TOKEN_PLANNER_CALIBRATION}
+
+        # Truncated outputs only show a lower bound, so they are left out of the ratio
+        output_ratios = sorted(r["output_tokens"] / r["predicted_output_tokens"]
+                               for r in records if r["predicted_output_tokens"] and not r["truncated"])
+        input_ratios = [_total_input(r) / r["predicted_input_tokens"] for r in records if r["predicted_input_tokens"]]
+        cache_read = sum(r.get("cache_read_input_tokens", 0) for r in records)
+        cache_write = sum(r.get("cache_creation_input_tokens", 0) for r in records)
+        total_input = sum(_total_input(r) for r in records)
+        p90 = output_ratios[min(len(output_ratios) - 1, int(len(output_ratios) * 0.9))] if output_ratios else 1.0
+        return {
+            "requests": len(records),
+            "token_count_method": token_count_method(),
+            "calibration": TOKEN_PLANNER_CALIBRATION,
+            "truncated": sum(r["truncated"] for r in records),
+            "mean_input_ratio": round(sum(input_ratios) / len(input_ratios), 3) if input_ratios else None,
+            "mean_output_ratio": round(sum(output_ratios) / len(output_ratios), 3) if output_ratios else None,
+            # Calibration that would have covered 90% of recent outputs
+            "suggested_calibration": round(TOKEN_PLANNER_CALIBRATION * p90, 3),
+            "unused_max_tokens": sum(max(0, r["max_tokens"] - r["output_tokens"]) for r in records),
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_write,
+            # Share of all input tokens served from the prompt cache
+            "cache_hit_rate": round(cache_read / total_input, 3) if total_input else None
+        }
+
+
+def _total_input(record: dict) -> int:
+    """Input tokens of a request including the cached prefix"""
+    return record["input_tokens"] + record.get("cache_read_input_tokens", 0) + record.get("cache_creation_input_tokens", 0)
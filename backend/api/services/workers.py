@@ -0,0 +1,47 @@
+"""
+Shared process pool for CPU-bound work (parsing, validation) so large
+specs do not block the event loop. Each worker compiles the schema
+validators once when it starts.
+"""
+from config.logging import setup_logging
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from typing import Optional
+from utils.schema_validation import warm_validators
+import logging
+import os
+
+load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool, creating it on first use"""
+    global _process_pool
+
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, initializer=warm_validators)
+        logger.info(f"Process pool started with {CPU_WORKERS} workers")
+
+    return _process_pool
+
+
+async def run_in_pool(func, *args):
+    """Run CPU-bound work in the shared process pool; func and its arguments must be picklable"""
+    return await asyncio.get_running_loop().run_in_executor(get_process_pool(), func, *args)
+
+
+def shutdown_process_pool():
+    """Stop the shared process pool on application shutdown"""
+    global _process_pool
+
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+        logger.info("Process pool stopped")
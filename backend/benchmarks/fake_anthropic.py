@@ -0,0 +1,305 @@
+"""
+Local stand-in for the Anthropic Messages API, for load tests without API credits.
+
+POST /v1/messages answers in the format the prompts ask for: a correction
+request gets "## SUGGESTIONS:" / "## CORRECTED SPEC:" with the submitted
+spec echoed back as YAML, prefilled patch and repair requests get an empty
+operation/fragment list, anything else (the health probe) a short text.
+Responses can be streamed (SSE), are delayed by a configurable latency
+distribution plus an output token rate, and a share of requests can be
+failed with 429 (with retry-after) or 529. GET /stats reports request counts.
+
+    python -m benchmarks.fake_anthropic --port 8090 --latency lognormal:2,0.5 --tokens-per-second 200 --rate-429 0.05
+    ANTHROPIC_BASE_URL=http://localhost:8090 ANTHROPIC_API_KEY=fake uvicorn api.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.synthetic import claude_response
+from utils.yaml_loader import dump_yaml, load_json
+
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 64  # About what the API sends per text delta
+FENCED = re.compile(r"```([\w-]*)\n(.*)\n```", re.DOTALL)
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+@dataclass
+class Latency:
+    """
+    Seconds before the first token: 'fixed:S', 'uniform:LOW,HIGH', 'normal:MEAN,SD',
+    'lognormal:MEDIAN,SIGMA' or 'exponential:MEAN'
+    """
+    distribution: str = "fixed"
+    params: Tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, text: str) -> "Latency":
+        distribution, _, params = text.partition(":")
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"latency distribution must be one of: {', '.join(DISTRIBUTIONS)}")
+        values = tuple(float(value) for value in params.split(",") if value.strip()) or (0.0,)
+        expected = 2 if distribution in ("uniform", "normal", "lognormal") else 1
+        if len(values) != expected:
+            raise ValueError(f"{distribution} latency takes {expected} parameter(s), got '{params}'")
+        return cls(distribution, values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.distribution == "normal":
+            value = rng.gauss(*self.params)
+        elif self.distribution == "lognormal":
+            value = rng.lognormvariate(math.log(max(self.params[0], 1e-6)), self.params[1])
+        elif self.distribution == "exponential":
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        else:
+            value = self.params[0]
+        return max(0.0, value)
+
+
+@dataclass
+class FakeConfig:
+    latency: Latency = field(default_factory=Latency)
+    tokens_per_second: float = 0.0  # Output token rate; 0 sends the whole response at once
+    rate_429: float = 0.0
+    rate_529: float = 0.0
+    retry_after: float = 1.0
+    response_text: Optional[str] = None  # Fixed response text instead of the generated one
+    suggestions: int = 5
+    seed: Optional[int] = None
+
+
+def _text(content) -> str:
+    """Text of a message's (or system prompt's) content: a string or a list of blocks"""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content or [] if isinstance(block, dict))
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def canned_response(body: dict, config: FakeConfig) -> str:
+    """Response text for a Messages request, in the format the prompt asks for"""
+    if config.response_text is not None:
+        return config.response_text
+    messages = body.get("messages") or []
+    if messages and messages[-1].get("role") == "assistant":
+        # Prefilled JSON (patch operations or repair fragments): close it without changes
+        prefill = _text(messages[-1].get("content")).strip()
+        return "]}" if prefill.endswith("[") else "}}"
+
+    user = _text(messages[-1].get("content")) if messages else ""
+    match = FENCED.search(user)
+    if not match:
+        return "Claude is working!"
+    language, spec_text = match.groups()
+    if user.startswith("Postman Collection:"):
+        spec_yaml = dump_yaml({"openapi": "3.1.0", "info": {"title": "Converted Collection", "version": "1.0.0"},
+                               "paths": {}})
+    elif language == "json":
+        # Corrections always come back as YAML
+        try:
+            spec_yaml = dump_yaml(load_json(spec_text)[0])
+        except Exception:
+            spec_yaml = spec_text + "\n"
+    else:
+        spec_yaml = spec_text + "\n"
+    seed = config.seed if config.seed is not None else int(hashlib.sha256(user.encode("utf-8")).hexdigest()[:8], 16)
+    return claude_response(spec_yaml, config.suggestions, seed)
+
+
+class FakeAnthropic:
+    """Request handling and counters; one per server"""
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.cached_prefixes = set()
+        self.stats = {"requests": 0, "streamed": 0, "completed": 0, "rate_limited": 0, "overloaded": 0,
+                      "in_flight": 0, "max_in_flight": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def _error(self) -> Optional[JSONResponse]:
+        """An injected 429 or 529, or None"""
+        roll = self.rng.random()
+        if roll < self.config.rate_429:
+            self.stats["rate_limited"] += 1
+            return JSONResponse(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Fake rate limit"}},
+                status_code=429, headers={"retry-after": f"{self.config.retry_after:g}"})
+        if roll < self.config.rate_429 + self.config.rate_529:
+            self.stats["overloaded"] += 1
+            return JSONResponse({"type": "error", "error": {"type": "overloaded_error", "message": "Fake overload"}},
+                                status_code=529)
+        return None
+
+    def _usage(self, body: dict, output_tokens: int) -> dict:
+        """Usage block; a system prompt marked for caching is written once, then read"""
+        system = _text(body.get("system"))
+        messages = "".join(_text(message.get("content")) for message in body.get("messages") or [])
+        cache_write = cache_read = 0
+        cacheable = any(isinstance(block, dict) and block.get("cache_control") for block in body.get("system") or [])
+        if cacheable and system:
+            key = hashlib.sha256(system.encode("utf-8")).hexdigest()
+            if key in self.cached_prefixes:
+                cache_read = _count_tokens(system)
+            else:
+                self.cached_prefixes.add(key)
+                cache_write = _count_tokens(system)
+        input_tokens = _count_tokens(messages) + (0 if cacheable else _count_tokens(system))
+        self.stats["input_tokens"] += input_tokens
+        self.stats["output_tokens"] += output_tokens
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "cache_creation_input_tokens": cache_write, "cache_read_input_tokens": cache_read}
+
+    def _completion(self, body: dict) -> Tuple[str, str, int]:
+        """(text, stop_reason, output tokens), cut at max_tokens like the real API"""
+        text = canned_response(body, self.config)
+        max_chars = int(body.get("max_tokens") or 4096) * CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            return text[:max_chars], "max_tokens", _count_tokens(text[:max_chars])
+        return text, "end_turn", _count_tokens(text)
+
+    def _output_delay(self, tokens: int) -> float:
+        return tokens / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+    async def messages(self, request: Request):
+        body = await request.json()
+        self.stats["requests"] += 1
+        error = self._error()
+        if error is not None:
+            return error
+
+        # Echoing a large spec back is CPU work - keep it off the event loop like the real server would
+        text, stop_reason, output_tokens = await asyncio.to_thread(self._completion, body)
+        message = {
+            "id": f"msg_fake_{os.urandom(8).hex()}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "stop_sequence": None,
+            "usage": self._usage(body, output_tokens)
+        }
+        first_token = self.config.latency.sample(self.rng)
+        if body.get("stream"):
+            self.stats["streamed"] += 1
+            return StreamingResponse(self._stream(message, text, stop_reason, first_token),
+                                     media_type="text/event-stream")
+        self._started()
+        try:
+            await asyncio.sleep(first_token + self._output_delay(output_tokens))
+        finally:
+            self._finished()
+        return {**message, "content": [{"type": "text", "text": text}], "stop_reason": stop_reason}
+
+    async def _stream(self, message: dict, text: str, stop_reason: str, first_token: float) -> AsyncIterator[str]:
+        """Server-sent events in the order the Messages API sends them"""
+        def event(name: str, data: dict) -> str:
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+        usage = message["usage"]
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        chunk_delay = self._output_delay(usage["output_tokens"]) / max(1, len(chunks))
+        self._started()
+        try:
+            await asyncio.sleep(first_token)
+            yield event("message_start", {"type": "message_start", "message": {
+                **message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1}}})
+            yield event("content_block_start", {"type": "content_block_start", "index": 0,
+                                                "content_block": {"type": "text", "text": ""}})
+            yield event("ping", {"type": "ping"})
+            for chunk in chunks:
+                if chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+                yield event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                    "delta": {"type": "text_delta", "text": chunk}})
+            yield event("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield event("message_delta", {"type": "message_delta",
+                                          "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                          "usage": {"output_tokens": usage["output_tokens"]}})
+            yield event("message_stop", {"type": "message_stop"})
+        finally:
+            self._finished()
+
+    def _started(self):
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def _finished(self):
+        self.stats["in_flight"] -= 1
+        self.stats["completed"] += 1
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    fake = FakeAnthropic(config or FakeConfig())
+    app = FastAPI(title="Fake Anthropic Messages API")
+    app.state.fake = fake
+    app.add_api_route("/v1/messages", fake.messages, methods=["POST"])
+    app.add_api_route("/stats", lambda: dict(fake.stats), methods=["GET"])
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Fake server options, shared with the load driver (which can start the server itself)"""
+    parser.add_argument("--latency", default="fixed:0",
+                        help="Time to first token: fixed:S, uniform:LO,HI, normal:MEAN,SD, lognormal:MEDIAN,SIGMA "
+                             "or exponential:MEAN (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Output token rate (0: instant)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--rate-529", type=float, default=0.0, help="Share of requests answered with 529")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after seconds sent with 429")
+    parser.add_argument("--response-file", help="Always answer with this file's text")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    response_text = None
+    if args.response_file:
+        with open(args.response_file, encoding="utf-8") as response:
+            response_text = response.read()
+    return FakeConfig(latency=Latency.parse(args.latency), tokens_per_second=args.tokens_per_second,
+                      rate_429=args.rate_429, rate_529=args.rate_529, retry_after=args.retry_after,
+                      response_text=response_text, seed=args.seed)
+
+
+def to_arguments(args: argparse.Namespace) -> List[str]:
+    """The options from add_arguments as a command line again, for starting the server in a subprocess"""
+    argv = [f"--latency={args.latency}", f"--tokens-per-second={args.tokens_per_second}",
+            f"--rate-429={args.rate_429}", f"--rate-529={args.rate_529}", f"--retry-after={args.retry_after}"]
+    if args.response_file:
+        argv.append(f"--response-file={os.path.abspath(args.response_file)}")
+    if args.seed is not None:
+        argv.append(f"--seed={args.seed}")
+    return argv
+
+
+def main(argv: Optional[list] = None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local fake of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        config = config_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Load driver for the API: throughput, p50/p95/p99 latency and error rate per
+route at a range of concurrency levels.
+
+Each level runs closed-loop clients (every client sends its next request as
+soon as the previous one finishes) for a fixed time or request count, all
+uploading the same synthetic spec with the correction cache bypassed. With
+--spawn the driver starts the API and a fake Anthropic server
+(benchmarks.fake_anthropic) itself, so no API credits are used; the fake's
+request counter then also shows Claude calls per API request (retries,
+verification rounds). Run from backend/:
+
+    python -m benchmarks.load --spawn --workers 2 --latency lognormal:2,0.5 --rate-429 0.05
+    python -m benchmarks.load --url http://localhost:8000 --routes inspect,inspect_stream --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks import fake_anthropic
+from benchmarks.synthetic import openapi_document, postman_collection, serialize
+
+API_PREFIX = "/api/v1"
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+@dataclass
+class Payload:
+    """The inputs every request of a run sends"""
+    document: dict
+    spec_yaml: bytes
+    collection: dict
+
+
+@dataclass
+class Route:
+    path: str
+    request: Callable[[Payload, str], dict]  # (payload, mode) -> httpx request arguments
+    stream: bool = False  # Server-sent events; an 'error' event counts as a failed request
+
+
+def _upload(params: Optional[dict] = None) -> Callable[[Payload, str], dict]:
+    def request(payload: Payload, mode: str) -> dict:
+        return {"params": {"mode": mode, "no_cache": "true", **(params or {})},
+                "files": {"file": ("spec.yaml", payload.spec_yaml, "application/x-yaml")}}
+    return request
+
+
+ROUTES: Dict[str, Route] = {
+    "inspect": Route("/inspect", _upload()),
+    "inspect_patch": Route("/inspect", _upload({"llm_output": "patch"})),
+    "inspect_stream": Route("/inspect/stream", _upload(), stream=True),
+    "inspect_openapi": Route("/inspect/openapi", lambda payload, mode: {
+        "params": {"mode": mode, "no_cache": "true"}, "json": {"spec": payload.document}}),
+    "inspect_postman": Route("/inspect/postman", lambda payload, mode: {
+        "params": {"mode": mode, "no_cache": "true"}, "json": payload.collection}),
+}
+
+
+@dataclass
+class LevelResult:
+    route: str
+    concurrency: int
+    elapsed: float
+    latencies: List[float] = field(default_factory=list)  # Seconds, successful requests only
+    errors: Counter = field(default_factory=Counter)  # Status code or exception name -> count
+    upstream_requests: Optional[int] = None  # Messages API calls seen by the fake server
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "route": self.route,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "throughput": self.requests / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(ordered, 50) * 1000 if ordered else None,
+            "p95_ms": percentile(ordered, 95) * 1000 if ordered else None,
+            "p99_ms": percentile(ordered, 99) * 1000 if ordered else None,
+            "error_rate": sum(self.errors.values()) / self.requests if self.requests else 0.0,
+            "errors": dict(self.errors),
+            "upstream_per_request": self.upstream_requests / self.requests
+            if self.upstream_requests is not None and self.requests else None
+        }
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(1, -(-len(ordered) * q // 100))  # ceil without floats
+    return ordered[int(rank) - 1]
+
+
+async def send(client: httpx.AsyncClient, route: Route, payload: Payload, mode: str) -> Optional[str]:
+    """One request; None on success, else the error (status code or exception name)"""
+    try:
+        arguments = route.request(payload, mode)
+        if route.stream:
+            async with client.stream("POST", API_PREFIX + route.path, **arguments) as response:
+                if response.status_code >= 400:
+                    return str(response.status_code)
+                async for line in response.aiter_lines():
+                    if line.startswith("event: error"):
+                        return "stream error"
+            return None
+        response = await client.post(API_PREFIX + route.path, **arguments)
+        return str(response.status_code) if response.status_code >= 400 else None
+    except httpx.HTTPError as e:
+        return type(e).__name__
+
+
+async def _upstream_count(client: Optional[httpx.AsyncClient]) -> Optional[int]:
+    if client is None:
+        return None
+    try:
+        response = await client.get("/stats")
+        return response.json()["requests"]
+    except (httpx.HTTPError, ValueError, KeyError):
+        return None
+
+
+async def run_level(client: httpx.AsyncClient, name: str, payload: Payload, mode: str, concurrency: int,
+                    duration: float, max_requests: Optional[int] = None,
+                    fake_client: Optional[httpx.AsyncClient] = None) -> LevelResult:
+    """Closed-loop clients sending to one route for duration seconds (or until max_requests are started)"""
+    route = ROUTES[name]
+    result = LevelResult(name, concurrency, 0.0)
+    started = 0
+    upstream_before = await _upstream_count(fake_client)
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def client_loop():
+        nonlocal started
+        while time.perf_counter() < deadline and (max_requests is None or started < max_requests):
+            started += 1
+            sent = time.perf_counter()
+            error = await send(client, route, payload, mode)
+            if error is None:
+                result.latencies.append(time.perf_counter() - sent)
+            else:
+                result.errors[error] += 1
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    upstream_after = await _upstream_count(fake_client)
+    if upstream_before is not None and upstream_after is not None:
+        result.upstream_requests = upstream_after - upstream_before
+    return result
+
+
+def _format_ms(value: Optional[float]) -> str:
+    return f"{value:.0f}" if value is not None else "-"
+
+
+def print_header():
+    print(f"{'route':<16} {'conc':>5} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'llm/req':>8}")
+
+
+def print_row(summary: dict):
+    upstream = summary["upstream_per_request"]
+    print(f"{summary['route']:<16} {summary['concurrency']:>5} {summary['requests']:>9} "
+          f"{summary['throughput']:>8.2f} {_format_ms(summary['p50_ms']):>9} {_format_ms(summary['p95_ms']):>9} "
+          f"{_format_ms(summary['p99_ms']):>9} {summary['error_rate']:>7.1%} "
+          f"{(f'{upstream:.2f}' if upstream is not None else '-'):>8}")
+    if summary["errors"]:
+        errors = ", ".join(f"{error} x{count}" for error, count in sorted(summary["errors"].items()))
+        print(f"{'':<16} errors: {errors}")
+
+
+async def _wait_until_up(url: str, path: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    async with httpx.AsyncClient(base_url=url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+            try:
+                if (await client.get(path)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url}{path} did not come up within {STARTUP_TIMEOUT_SECONDS}s")
+
+
+def spawn(args: argparse.Namespace) -> List[subprocess.Popen]:
+    """Start the fake Anthropic server and the API (pointed at it) as subprocesses"""
+    backend = Path(__file__).resolve().parent.parent
+    quiet = {"stdout": subprocess.DEVNULL} if not args.verbose else {}
+    fake = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_anthropic", "--port", str(args.fake_port),
+                             *fake_anthropic.to_arguments(args)], cwd=backend, **quiet)
+    env = {
+        **os.environ,
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{args.fake_port}",
+        "ANTHROPIC_API_KEY": "fake-key",  # Never the real one: a misconfigured run must not spend credits
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING") if args.verbose else "WARNING",
+    }
+    api = subprocess.Popen([sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1",
+                            "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+                           cwd=backend, env=env, **quiet)
+    return [fake, api]
+
+
+def stop(processes: List[subprocess.Popen]):
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)  # Lets uvicorn run the app's shutdown
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run(args: argparse.Namespace) -> List[dict]:
+    document = openapi_document(args.paths, max(1, args.paths // 2), seed=args.seed or 0)
+    payload = Payload(document, serialize(document, "yaml"), postman_collection(args.paths, seed=args.seed or 0))
+    print(f"Payload: {args.paths} paths, {len(payload.spec_yaml) / 1024:.0f}KB YAML, mode={args.mode}",
+          file=sys.stderr)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=max(args.concurrency))
+    fake_client = httpx.AsyncClient(base_url=args.fake_url, timeout=5) if args.fake_url else None
+    summaries = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        print_header()
+        for name in args.routes:
+            # Warm-up: first-request costs (imports, pools, the prompt cache) are not what is being measured
+            await send(client, ROUTES[name], payload, args.mode)
+            for concurrency in args.concurrency:
+                result = await run_level(client, name, payload, args.mode, concurrency, args.duration,
+                                         args.requests, fake_client)
+                summary = result.summary()
+                summaries.append(summary)
+                print_row(summary)
+    if fake_client is not None:
+        await fake_client.aclose()
+    return summaries
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _route_list(value: str) -> List[str]:
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [name for name in names if name not in ROUTES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown route(s) {', '.join(unknown)}; choose from {', '.join(ROUTES)}")
+    return names
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API at a range of concurrency levels")
+    parser.add_argument("--url", default=None, help="API base URL (default: http://127.0.0.1:PORT)")
+    parser.add_argument("--routes", type=_route_list, default=["inspect"], help=f"Comma-separated: {', '.join(ROUTES)}")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per level")
+    parser.add_argument("--requests", type=int, default=None, help="Stop a level after this many requests")
+    parser.add_argument("--mode", default="full", help="Correction mode (full always calls Claude)")
+    parser.add_argument("--paths", type=int, default=20, help="Paths in the synthetic spec")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout in seconds")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the spawned servers' output")
+
+    spawned = parser.add_argument_group("spawned servers", "With --spawn, start the API and a fake Anthropic server")
+    spawned.add_argument("--spawn", action="store_true")
+    spawned.add_argument("--port", type=int, default=8000, help="API port")
+    spawned.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    spawned.add_argument("--fake-port", type=int, default=8090)
+    spawned.add_argument("--fake-url", default=None,
+                         help="Fake server already running (for Claude calls per request); implied by --spawn")
+    fake_anthropic.add_arguments(spawned)
+    args = parser.parse_args(argv)
+
+    args.url = args.url or f"http://127.0.0.1:{args.port}"
+    processes = []
+    try:
+        if args.spawn:
+            fake_anthropic.Latency.parse(args.latency)  # Fail here rather than in the subprocess
+            args.fake_url = args.fake_url or f"http://127.0.0.1:{args.fake_port}"
+            processes = spawn(args)
+            asyncio.run(_wait_until_up(args.fake_url, "/stats", processes[0]))
+            asyncio.run(_wait_until_up(args.url, f"{API_PREFIX}/health", processes[1]))
+        summaries = asyncio.run(run(args))
+    except (ValueError, RuntimeError) as e:
+        print(f"Load test failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        stop(processes)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump({"arguments": {key: value for key, value in vars(args).items() if key != "json"},
+                       "results": summaries}, output, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+Offline micro-benchmarks for parsing, validation and response handling.
+
+Each case times one function on one input (best and median of several
+samples) and records its peak Python memory with tracemalloc, then compares the
+run against benchmarks/baseline.json. Times are compared relative to a
+fixed reference workload timed around every case (the run's median), so a
+machine that is uniformly slower today does not read as a regression. A case that is
+slower or larger than its baseline beyond the tolerances is a regression
+and the run exits with status 1. Run from backend/:
+
+    python -m benchmarks.run                   # compare against the baseline
+    python -m benchmarks.run --save-baseline   # accept this run as the new baseline
+    python -m benchmarks.run --filter validate_file --quick
+    python -m benchmarks.run --full            # adds 10MB YAML and 1MB schema validation (minutes)
+
+Baselines should still be recorded on the machine that compares against them.
+"""
+import os
+
+# Benchmarks never call Claude or touch the app's cache, usage log or log file
+os.environ.pop("ANTHROPIC_API_KEY", None)
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("TOKEN_USAGE_LOG_PATH", "")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+os.environ.setdefault("LOG_TO_FILE", "false")
+os.environ.setdefault("LLM_HEALTH_INTERVAL_SECONDS", "0")
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic import claude_response, generate, generate_size, serialize
+from utils.schema_validation import validate_document
+from utils.validators import _convert_json_to_yaml, _detect_file_type, parse_spec, validate_file
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "data" / "test_specs"
+
+KB = 1024
+MB = 1024 * KB
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(10 * MB)))
+
+# Defaults: a case regresses when it is this much slower / larger than the baseline...
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.20
+# ...and the difference is above the noise floor
+TIME_NOISE_FLOOR_MS = 0.05
+MEMORY_NOISE_FLOOR_KB = 64
+
+# Cases that look slower are timed again this many times before the run fails, keeping their best result
+RECHECK_ROUNDS = 2
+
+SAMPLE_SECONDS = 0.05  # Calls are looped until one sample takes at least this long
+REFERENCE_SAMPLES = 5
+
+
+@dataclass
+class Case:
+    name: str
+    func: Callable[[], Any]
+
+
+def _inputs(full: bool) -> Dict[str, bytes]:
+    """Fixture files plus synthetic documents, keyed by a short label"""
+    inputs = {}
+    for path in sorted(FIXTURES_DIR.glob("*")):
+        if path.is_file():
+            inputs[f"fixture:{path.stem.replace(' ', '_')}{path.suffix}"] = path.read_bytes()
+
+    for label, size in (("10KB", 10 * KB), ("100KB", 100 * KB), ("1MB", MB)):
+        inputs[f"openapi:{label}.yaml"] = generate_size("openapi", size, "yaml")
+        inputs[f"openapi:{label}.json"] = generate_size("openapi", size, "json")
+    inputs["openapi:10MB.json"] = generate_size("openapi", MAX_FILE_SIZE, "json")
+    if full:
+        inputs["openapi:10MB.yaml"] = generate_size("openapi", MAX_FILE_SIZE, "yaml")
+    inputs["openapi:refdepth10.yaml"] = serialize(generate("openapi", paths=50, schemas=110, ref_depth=10))
+    inputs["swagger:100KB.yaml"] = generate_size("swagger", 100 * KB, "yaml")
+    inputs["postman:100KB.json"] = generate_size("postman", 100 * KB, "json")
+    return inputs
+
+
+def _llm_service():
+    from api.services.llm_service import LLMService
+    return LLMService()
+
+
+def build_cases(full: bool = False) -> List[Case]:
+    inputs = _inputs(full)
+    cases = []
+    for label, content in inputs.items():
+        cases.append(Case(f"validate_file[{label}]", lambda content=content: validate_file(content)))
+        cases.append(Case(f"_detect_file_type[{label}]", lambda content=content: _detect_file_type(content)))
+        if label.endswith(".json") and len(content) <= MB:
+            cases.append(Case(f"_convert_json_to_yaml[{label}]", lambda content=content: _convert_json_to_yaml(content)))
+
+    # Schema validation grows steeply with size: 100KB by default, 1MB with --full
+    limit = MB if full else 100 * KB
+    for label, content in inputs.items():
+        if len(content) <= limit:
+            parsed = parse_spec(content)
+            if parsed.is_mapping and ("openapi" in parsed.document or "swagger" in parsed.document):
+                cases.append(Case(f"validate_document[{label}]",
+                                  lambda document=parsed.document: validate_document(document)))
+
+    service = _llm_service()
+    for label in ("10KB", "100KB", "1MB"):
+        response = claude_response(inputs[f"openapi:{label}.yaml"].decode("utf-8"))
+        cases.append(Case(f"_parse_claude_response[{label}]",
+                          lambda response=response: service._parse_claude_response(response)))
+    unformatted = inputs["openapi:100KB.yaml"].decode("utf-8")
+    cases.append(Case("_parse_claude_response[no-headers:100KB]",
+                      lambda: service._parse_claude_response(unformatted)))
+    return cases
+
+
+def measure_time(func: Callable[[], Any], samples: int) -> Dict[str, float]:
+    """Best and median per-call time over samples, each looping enough calls to be measurable"""
+    start = time.perf_counter()
+    func()  # Warm-up, also sizes the loop
+    single = time.perf_counter() - start
+    loops = max(1, int(SAMPLE_SECONDS / single)) if single > 0 else 1000
+    if single > 1:
+        samples = min(samples, 5)
+
+    timings = []
+    # Like timeit: collection pauses depend on everything else alive in the process, not on the code measured
+    for _ in range(samples):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((time.perf_counter() - start) / loops)
+        finally:
+            gc.enable()
+    return {"median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000, "loops": loops}
+
+
+def _reference_workload():
+    """Fixed mix of the work the benchmarked code does: dict building, JSON and string handling"""
+    document = {f"key{i}": {"id": i, "name": f"name{i}", "tags": ["a", "b", "c"], "value": i * 0.5} for i in range(300)}
+    text = json.dumps(document)
+    json.loads(text)
+    sorted(text.split(","))
+
+
+def measure_reference() -> float:
+    """Best-of time of the reference workload in ms, the unit case timings are normalized by"""
+    timings = []
+    for _ in range(REFERENCE_SAMPLES):
+        start = time.perf_counter()
+        _reference_workload()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def measure_case(case: Case, samples: int) -> Dict[str, float]:
+    """Time a case, with the reference workload timed around it"""
+    reference = measure_reference()
+    result = measure_time(case.func, samples)
+    result["reference_ms"] = min(reference, measure_reference())
+    return result
+
+
+def measure_memory(func: Callable[[], Any]) -> float:
+    """Peak memory allocated by one call, in KB"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / KB
+
+
+def environment() -> Dict[str, str]:
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "system": platform.system(), "processor": platform.processor()}
+
+
+def run_reference(results: Dict[str, dict]) -> Optional[float]:
+    """Machine speed for the whole run: a single reference sample is too noisy to scale one case by"""
+    references = [r["reference_ms"] for r in results.values() if r.get("reference_ms")]
+    return statistics.median(references) if references else None
+
+
+def compare(results: Dict[str, dict], baseline: dict, time_tolerance: float,
+            memory_tolerance: float) -> Dict[str, List[str]]:
+    """Regression messages, by case name, for cases slower or larger than their baseline"""
+    regressions: Dict[str, List[str]] = {}
+    cases = baseline.get("cases", {})
+    current_reference, base_reference = run_reference(results), baseline.get("reference_ms")
+    scale = current_reference / base_reference if current_reference and base_reference else 1.0
+    for name, result in results.items():
+        base = cases.get(name)
+        if base is None:
+            continue
+        # Today's best sample (least disturbed by other load) against the baseline's typical one, scaled by
+        # today's reference speed - comparing best to best fails every run after a lucky baseline
+        expected = base["median_ms"] * scale
+        slower = result["min_ms"] - expected
+        if result["min_ms"] > expected * (1 + time_tolerance) and slower > TIME_NOISE_FLOOR_MS:
+            regressions.setdefault(name, []).append(f"{result['min_ms']:.3f}ms vs {expected:.3f}ms expected from the baseline "
+                               f"(+{slower / expected:.0%})")
+        if result.get("peak_kb") is not None and base.get("peak_kb") is not None:
+            larger = result["peak_kb"] - base["peak_kb"]
+            if result["peak_kb"] > base["peak_kb"] * (1 + memory_tolerance) and larger > MEMORY_NOISE_FLOOR_KB:
+                regressions.setdefault(name, []).append(f"peak {result['peak_kb']:.0f}KB vs {base['peak_kb']:.0f}KB baseline "
+                                   f"(+{larger / max(base['peak_kb'], 1):.0%})")
+    return regressions
+
+
+def load_baseline(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(path: Path, results: Dict[str, dict], previous: Optional[dict]):
+    """Write results as the baseline, keeping cases this run did not cover (e.g. --filter or no --full)"""
+    cases = dict((previous or {}).get("cases", {}))
+    cases.update({name: {"min_ms": round(r["min_ms"], 4), "median_ms": round(r["median_ms"], 4),
+                         "peak_kb": round(r["peak_kb"], 1) if r.get("peak_kb") is not None else None}
+                  for name, r in results.items()})
+    reference = run_reference(results)
+    with open(path, "w", encoding="utf-8") as baseline:
+        json.dump({"environment": environment(), "reference_ms": round(reference, 4) if reference else None,
+                   "cases": dict(sorted(cases.items()))}, baseline, indent=2)
+        baseline.write("\n")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the parsing/validation micro-benchmarks")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--full", action="store_true", help="Include the slow 10MB YAML and 1MB validation cases")
+    parser.add_argument("--quick", action="store_true", help="Fewer samples, no memory measurement")
+    parser.add_argument("--samples", type=int, default=7)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc peak memory")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--rechecks", type=int, default=RECHECK_ROUNDS,
+                        help="Times to re-measure cases that look slower before failing")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    samples = 3 if args.quick else args.samples
+    with_memory = not (args.quick or args.no_memory)
+    baseline = load_baseline(args.baseline)
+    base_cases = (baseline or {}).get("cases", {})
+    if baseline and baseline.get("environment") != environment():
+        print(f"WARNING: baseline was recorded on {baseline.get('environment')}, not {environment()}; "
+              "timings may not be comparable", file=sys.stderr)
+
+    print("Generating inputs...", file=sys.stderr)
+    cases = [case for case in build_cases(args.full) if args.filter in case.name]
+    results = {}
+    width = max((len(case.name) for case in cases), default=4)
+    print(f"{'case':<{width}} {'best ms':>10} {'median ms':>10} {'baseline':>10} {'peak KB':>10} {'baseline':>10}")
+    for case in cases:
+        result = measure_case(case, samples)
+        result["peak_kb"] = measure_memory(case.func) if with_memory else None
+        results[case.name] = result
+        base = base_cases.get(case.name, {})
+        base_ms = f"{base['median_ms']:.3f}" if base.get("median_ms") is not None else "new"
+        peak = f"{result['peak_kb']:.0f}" if result["peak_kb"] is not None else "-"
+        base_kb = f"{base['peak_kb']:.0f}" if base.get("peak_kb") is not None else "-"
+        print(f"{case.name:<{width}} {result['min_ms']:>10.3f} {result['median_ms']:>10.3f} {base_ms:>10} "
+              f"{peak:>10} {base_kb:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump({"environment": environment(), "results": results}, output, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"Baseline saved to {args.baseline} ({len(results)} cases)")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline} - run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    by_name = {case.name: case for case in cases}
+    for _ in range(args.rechecks):
+        if not regressions:
+            break
+        # A burst of load on the machine slows every sample of a case; a real regression survives a second look
+        print(f"Re-measuring {len(regressions)} case(s) that look slower...", file=sys.stderr)
+        for name in regressions:
+            result = measure_case(by_name[name], samples)
+            if result["min_ms"] < results[name]["min_ms"]:
+                results[name].update(result)
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+
+    if regressions:
+        print(f"\nPERFORMANCE REGRESSION in {len(regressions)} case(s):", file=sys.stderr)
+        for name, messages in regressions.items():
+            print(f"  {name}: {'; '.join(messages)}", file=sys.stderr)
+        return 1
+    print(f"\nNo regressions against {args.baseline} ({len(results)} cases)")
+    return 0
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        # String hashing is randomized per process, which shifts dict-heavy timings from run to run
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable, "-m", "benchmarks.run", *sys.argv[1:]])
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Deterministic synthetic specs for benchmarks and load tests.
+
+OpenAPI 3.x, Swagger 2.0 and Postman v2.1 documents with a chosen number
+of paths/requests and schemas, and $ref chains of a chosen depth, or
+grown to roughly a target serialized size.
+
+    python -m benchmarks.synthetic openapi --paths 200 --schemas 50 --ref-depth 4 -o spec.yaml
+    python -m benchmarks.synthetic swagger --size 5MB --format json -o spec.json
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Callable, Dict, Optional
+
+from utils.yaml_loader import dump_yaml
+
+KINDS = ("openapi", "swagger", "postman")
+FIELD_TYPES = (("string", None), ("integer", "int64"), ("number", "double"), ("boolean", None), ("string", "date-time"))
+WORDS = ("account", "order", "invoice", "customer", "product", "shipment", "payment", "review", "ticket", "report")
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _schema(rng: random.Random, index: int, ref_prefix: str, schemas: int, ref_depth: int) -> dict:
+    """Model{index}: a few typed fields, plus a $ref to the next model while inside its chain"""
+    properties = {"id": {"type": "string", "description": f"Identifier of the {_words(rng, 1)}"}}
+    for field in range(rng.randint(3, 8)):
+        field_type, field_format = rng.choice(FIELD_TYPES)
+        properties[f"field{field}"] = {"type": field_type, "description": _words(rng, 4)}
+        if field_format:
+            properties[f"field{field}"]["format"] = field_format
+    # Models form chains of ref_depth + 1 so an operation's schema is ref_depth hops deep
+    if ref_depth and index % (ref_depth + 1) != ref_depth and index + 1 < schemas:
+        properties["related"] = {"$ref": f"{ref_prefix}Model{index + 1}"}
+    return {"type": "object", "required": ["id"], "properties": properties}
+
+
+def _chain_head(path: int, schemas: int, ref_depth: int) -> int:
+    return (path * (ref_depth + 1)) % max(1, schemas)
+
+
+def openapi_document(paths: int = 10, schemas: int = 10, ref_depth: int = 2, version: str = "3.1.0",
+                     seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    prefix = "#/components/schemas/"
+    document = {
+        "openapi": version,
+        "info": {"title": "Synthetic API", "version": "1.0.0", "description": _words(rng, 12)},
+        "servers": [{"url": "https://api.example.com/v1"}],
+        "paths": {},
+        "components": {"schemas": {f"Model{i}": _schema(rng, i, prefix, schemas, ref_depth) for i in range(schemas)}}
+    }
+    for path in range(paths):
+        model = {"$ref": f"{prefix}Model{_chain_head(path, schemas, ref_depth)}"} if schemas else {"type": "object"}
+        content = {"application/json": {"schema": model}}
+        document["paths"][f"/resource{path}/{{id}}"] = {
+            "parameters": [{"name": "id", "in": "path", "required": True, "schema": {"type": "string"}}],
+            "get": {
+                "operationId": f"getResource{path}",
+                "summary": _words(rng, 5),
+                "tags": [rng.choice(WORDS)],
+                "responses": {"200": {"description": "OK", "content": content},
+                              "404": {"description": "Not found"}}
+            },
+            "put": {
+                "operationId": f"updateResource{path}",
+                "summary": _words(rng, 5),
+                "requestBody": {"required": True, "content": content},
+                "responses": {"200": {"description": "Updated", "content": content}}
+            }
+        }
+    return document
+
+
+def swagger_document(paths: int = 10, schemas: int = 10, ref_depth: int = 2, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    prefix = "#/definitions/"
+    document = {
+        "swagger": "2.0",
+        "info": {"title": "Synthetic API", "version": "1.0.0", "description": _words(rng, 12)},
+        "host": "api.example.com",
+        "basePath": "/v1",
+        "schemes": ["https"],
+        "consumes": ["application/json"],
+        "produces": ["application/json"],
+        "paths": {},
+        "definitions": {f"Model{i}": _schema(rng, i, prefix, schemas, ref_depth) for i in range(schemas)}
+    }
+    for path in range(paths):
+        model = {"$ref": f"{prefix}Model{_chain_head(path, schemas, ref_depth)}"} if schemas else {"type": "object"}
+        document["paths"][f"/resource{path}/{{id}}"] = {
+            "parameters": [{"name": "id", "in": "path", "required": True, "type": "string"}],
+            "get": {
+                "operationId": f"getResource{path}",
+                "summary": _words(rng, 5),
+                "responses": {"200": {"description": "OK", "schema": model}, "404": {"description": "Not found"}}
+            },
+            "put": {
+                "operationId": f"updateResource{path}",
+                "summary": _words(rng, 5),
+                "parameters": [{"name": "body", "in": "body", "required": True, "schema": model}],
+                "responses": {"200": {"description": "Updated", "schema": model}}
+            }
+        }
+    return document
+
+
+def postman_collection(requests: int = 10, folders: int = 2, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    groups = [{"name": f"Folder {i}", "item": []} for i in range(max(1, folders))]
+    for request in range(requests):
+        body = {f"field{i}": _words(rng, 2) for i in range(rng.randint(2, 6))}
+        url = f"{{{{baseUrl}}}}/resource{request}/:id?expand=true"
+        groups[request % len(groups)]["item"].append({
+            "name": f"Update resource {request}",
+            "request": {
+                "method": "PUT",
+                "header": [{"key": "Content-Type", "value": "application/json"}],
+                "body": {"mode": "raw", "raw": json.dumps(body), "options": {"raw": {"language": "json"}}},
+                "url": {"raw": url, "host": ["{{baseUrl}}"], "path": [f"resource{request}", ":id"],
+                        "query": [{"key": "expand", "value": "true"}],
+                        "variable": [{"key": "id", "value": "42"}]},
+                "description": _words(rng, 8)
+            },
+            "response": [{"name": "OK", "code": 200, "status": "OK", "body": json.dumps({"id": "42", **body})}]
+        })
+    return {
+        "info": {"name": "Synthetic Collection", "schema": "https://schema.getpostman.com/json/collection/v2.1.0/collection.json"},
+        "item": groups,
+        "variable": [{"key": "baseUrl", "value": "https://api.example.com/v1"}]
+    }
+
+
+def serialize(document: dict, file_format: str = "yaml") -> bytes:
+    if file_format == "json":
+        return json.dumps(document, indent=2).encode("utf-8")
+    return dump_yaml(document).encode("utf-8")
+
+
+def _builder(kind: str, schemas: Optional[int], ref_depth: int, seed: int) -> Callable[[int], dict]:
+    """Document of the given kind as a function of its path (or request) count"""
+    if kind == "postman":
+        return lambda count: postman_collection(count, max(1, count // 25), seed)
+    build = swagger_document if kind == "swagger" else openapi_document
+    # Without a fixed schema count the components grow with the paths
+    return lambda count: build(count, schemas if schemas is not None else max(1, count // 2), ref_depth, seed=seed)
+
+
+def generate(kind: str = "openapi", paths: int = 10, schemas: Optional[int] = None, ref_depth: int = 2,
+             seed: int = 0) -> dict:
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(KINDS)}")
+    return _builder(kind, schemas, ref_depth, seed)(paths)
+
+
+def generate_size(kind: str, target_bytes: int, file_format: str = "yaml", schemas: Optional[int] = None,
+                  ref_depth: int = 2, seed: int = 0) -> bytes:
+    """Serialized document grown to just under target_bytes"""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(KINDS)}")
+    build = _builder(kind, schemas, ref_depth, seed)
+    base = len(serialize(build(0), file_format))
+    sample = 20
+    per_path = max(1.0, (len(serialize(build(sample), file_format)) - base) / sample)
+    count = max(1, int((target_bytes - base) / per_path))
+    content = serialize(build(count), file_format)
+    # Shrink when the estimate overshoots (per-path size is not exactly linear)
+    while len(content) > target_bytes and count > 1:
+        count = max(1, int(count * target_bytes / len(content) * 0.99))
+        content = serialize(build(count), file_format)
+    return content
+
+
+def claude_response(spec_yaml: str, suggestions: int = 10, seed: int = 0) -> str:
+    """A correction response in the format the corrections prompt asks Claude for"""
+    rng = random.Random(seed)
+    bullets = "\n".join(f"- Fixed {_words(rng, 3)} in /resource{i}" for i in range(suggestions))
+    return f"## SUGGESTIONS:\n{bullets}\n\n## CORRECTED SPEC:\n```yaml\n{spec_yaml}```\n"
+
+
+def parse_size(value: str) -> int:
+    """'512KB', '10MB' or a plain byte count"""
+    units = {"KB": 1024, "MB": 1024 * 1024, "B": 1}
+    text = value.strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic OpenAPI, Swagger or Postman document")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("--paths", type=int, default=10, help="Paths (requests for postman)")
+    parser.add_argument("--schemas", type=int, default=None, help="Schemas (default: half the paths)")
+    parser.add_argument("--ref-depth", type=int, default=2, help="$ref hops from an operation to its deepest schema")
+    parser.add_argument("--size", type=parse_size, default=None, help="Grow to about this size instead, e.g. 5MB")
+    parser.add_argument("--format", choices=("yaml", "json"), default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or ("json" if args.kind == "postman" else "yaml")
+    if args.size:
+        content = generate_size(args.kind, args.size, file_format, args.schemas, args.ref_depth, args.seed)
+    else:
+        content = serialize(generate(args.kind, args.paths, args.schemas, args.ref_depth, args.seed), file_format)
+    if args.output:
+        with open(args.output, "wb") as output:
+            output.write(content)
+    else:
+        sys.stdout.buffer.write(content)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,249 @@
-import logging.config
-
-LOGGING_CONFIG = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'standard': {
-            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        },
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'standard',
-            'level': 'INFO',
-        },
-        'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
-            'formatter': 'standard',
-            'level': 'DEBUG',
-            'filename': 'app.log',
-            'maxBytes': 10485760,  # 10 MB
-            'backupCount': 5,
-        },
-    },
-    'loggers': {
-        '': {  # Root logger
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
-            'propagate': False,
-        },
-        'my_module': {  # Logger for a specific module
-            'handlers': ['file'],
-            'level': 'WARNING',
-            'propagate': False,
-        },
-    }
-}
+"""
+Logging setup, applied once per process.
+
+Loggers only enqueue records (QueueHandler); a background QueueListener
+thread formats them and does the console and file I/O, so a slow disk
+never blocks a request. The queue is bounded: when it is full, records
+are dropped and counted instead of blocking the caller.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-module overrides, e.g. "api.services.llm_service=DEBUG,httpx=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Keep a fraction of a module's records below WARNING, e.g. "api.services.rate_limit=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # 'text' or 'json'
+LOG_TO_FILE = os.getenv("LOG_TO_FILE", "true").lower() == "true"
+LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", "app.log")
+LOG_MAX_SIZE = int(os.getenv("LOG_MAX_SIZE", "10485760"))  # 10 MB
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Correlation ID of the HTTP request being handled (copied into to_thread workers with the context)
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_configured = False
+
+
+def _parse_settings(value: str) -> Dict[str, str]:
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}"""
+    settings = {}
+    for item in value.split(","):
+        name, sep, setting = item.partition("=")
+        if sep and name.strip():
+            settings[name.strip()] = setting.strip()
+    return settings
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID; runs in the caller's thread, before the queue"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a configured fraction of a logger's (and its children's) records below WARNING"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}  # Logger name -> rate of its most specific configured prefix
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            prefix = name
+            rate = 1.0
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the request ID for correlating a request's records"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "process": record.process,
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record and counts it"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _output_handlers(include_file: bool = True) -> list:
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    console = logging.StreamHandler()
+    handlers = [console]
+    if include_file and LOG_TO_FILE and LOG_FILE_PATH:
+        try:
+            os.makedirs(os.path.dirname(LOG_FILE_PATH) or ".", exist_ok=True)
+            handlers.append(logging.handlers.RotatingFileHandler(
+                LOG_FILE_PATH, maxBytes=LOG_MAX_SIZE, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"))
+        except OSError as e:
+            # Keep the console - the file is optional
+            logging.getLogger(__name__).warning(f"Could not open log file {LOG_FILE_PATH}: {e}")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _apply_levels(root: logging.Logger):
+    root.setLevel(LOG_LEVEL)
+    for name, level in _parse_settings(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+
+def _filters() -> list:
+    filters = [RequestIdFilter()]
+    rates = {}
+    for name, rate in _parse_settings(LOG_SAMPLING).items():
+        try:
+            rates[name] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            pass
+    if rates:
+        filters.append(SamplingFilter(rates))
+    return filters
+
 
 def setup_logging():
-    logging.config.dictConfig(LOGGING_CONFIG)
\ No newline at end of file
+    """Configure logging on the first call; later calls (every module calls this on import) do nothing"""
+    global _configured, _listener, _queue_handler
+
+    with _lock:
+        if _configured:
+            return
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        for log_filter in _filters():
+            _queue_handler.addFilter(log_filter)
+        root.addHandler(_queue_handler)
+        _apply_levels(root)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *_output_handlers(),
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        _configured = True
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def _after_fork_in_child():
+    """
+    A forked child (process pool worker) inherits the queue handler but not the
+    listener thread. It logs synchronously to the console instead - it is not on the
+    request path, and a RotatingFileHandler per process would race the parent's
+    rollover of the same file.
+    """
+    global _listener, _queue_handler, _lock
+
+    _lock = threading.Lock()
+    if not _configured:
+        return
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+    filters = _queue_handler.filters if _queue_handler is not None else []
+    for handler in _output_handlers(include_file=False):
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+        root.addHandler(handler)
+    _listener, _queue_handler = None, None
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware binding each request to an ID (X-Request-ID if the client sent one) for its log records"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:128]
+        current = header or os.urandom(8).hex()
+        token = request_id.set(current)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", current.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
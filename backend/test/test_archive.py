@@ -0,0 +1,66 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from utils.archive import extract_specs, unique_name
+
+
+def _zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar_gz(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def test_zip_returns_only_spec_members():
+    content = _zip({"a.yaml": b"openapi: 3.1.0", "docs/README.md": b"hi", "b/c.json": b"{}"})
+    assert extract_specs("specs.zip", content, 1000, 10) == [("a.yaml", b"openapi: 3.1.0"), ("b/c.json", b"{}")]
+
+
+def test_tar_gz_skips_non_spec_members():
+    content = _tar_gz({"notes.txt": b"x" * 100, "a.yml": b"openapi: 3.1.0"})
+    assert extract_specs("specs.tar.gz", content, 1000, 10) == [("a.yml", b"openapi: 3.1.0")]
+
+
+@pytest.mark.parametrize("build, filename", [(_zip, "specs.zip"), (_tar_gz, "specs.tgz")])
+def test_byte_limit_is_enforced(build, filename):
+    content = build({"a.yaml": b"x" * 60, "b.yaml": b"x" * 60})
+    with pytest.raises(ValueError, match="bytes"):
+        extract_specs(filename, content, 100, 10)
+
+
+@pytest.mark.parametrize("build, filename", [(_zip, "specs.zip"), (_tar_gz, "specs.tgz")])
+def test_file_count_limit_is_enforced(build, filename):
+    content = build({f"{i}.yaml": b"{}" for i in range(3)})
+    with pytest.raises(ValueError, match="files"):
+        extract_specs(filename, content, 1000, 2)
+
+
+def test_tar_stops_reading_large_non_spec_members():
+    content = _tar_gz({"video.bin": b"\0" * 5000, "a.yaml": b"{}"})
+    with pytest.raises(ValueError, match="uncompressed"):
+        extract_specs("specs.tar.gz", content, 1000, 10)
+
+
+def test_invalid_archive_is_rejected():
+    with pytest.raises(ValueError):
+        extract_specs("specs.zip", b"not a zip", 1000, 10)
+
+
+def test_unique_name_suffixes_repeats():
+    used = set()
+    assert [unique_name(n, used) for n in ("a.yaml", "a.yaml", "a.yaml", "b")] == ["a.yaml", "a (2).yaml",
+                                                                                  "a (3).yaml", "b"]
@@ -0,0 +1,130 @@
+from utils.autofixer import autofix, iter_document_schemas
+
+
+def _openapi_30(schemas: dict, operation: dict = None) -> dict:
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "t", "version": "1", "description": "d"},
+        "paths": {"/a": {"get": operation or {"responses": {"200": {"description": "OK"}}}}},
+        "components": {"schemas": schemas},
+    }
+
+
+def test_nullable_becomes_type_array_in_schemas_only():
+    document = _openapi_30({"Flag": {
+        "type": "object",
+        "nullable": True,
+        "properties": {
+            # A real property named 'nullable' - user data, not the 3.0 keyword
+            "nullable": {"type": "boolean"},
+            "note": {"type": "string", "nullable": True},
+        },
+        "example": {"nullable": True, "note": None},
+    }})
+    fixed, report = autofix(document)
+    flag = fixed["components"]["schemas"]["Flag"]
+
+    assert fixed["openapi"] == "3.1.0"
+    assert flag["type"] == ["object", "null"]
+    assert flag["properties"]["nullable"] == {"type": "boolean"}
+    assert flag["properties"]["note"] == {"type": ["string", "null"]}
+    assert flag["example"] == {"nullable": True, "note": None}
+    assert sorted(fix["path"] for fix in report.fixes if fix["rule"] == "openapi_version") == [
+        "/components/schemas/Flag/nullable", "/components/schemas/Flag/properties/note/nullable", "/openapi"]
+
+
+def test_nullable_in_parameter_and_media_type_schemas():
+    operation = {
+        "parameters": [{"name": "q", "in": "query", "schema": {"type": "string", "nullable": True},
+                        "example": {"nullable": True}}],
+        "responses": {"200": {"description": "OK", "content": {"application/json": {
+            "schema": {"type": "integer", "nullable": True},
+            "examples": {"one": {"value": {"nullable": True}}}}}}},
+    }
+    fixed, _ = autofix(_openapi_30({}, operation))
+    get = fixed["paths"]["/a"]["get"]
+
+    assert get["parameters"][0]["schema"] == {"type": ["string", "null"]}
+    assert get["parameters"][0]["example"] == {"nullable": True}
+    media = get["responses"]["200"]["content"]["application/json"]
+    assert media["schema"] == {"type": ["integer", "null"]}
+    assert media["examples"]["one"]["value"] == {"nullable": True}
+
+
+def test_boolean_exclusive_bounds_become_numeric():
+    document = _openapi_30({"Range": {"type": "number", "minimum": 0, "exclusiveMinimum": True,
+                                      "maximum": 9, "exclusiveMaximum": False}})
+    fixed, _ = autofix(document)
+
+    assert fixed["components"]["schemas"]["Range"] == {"type": "number", "exclusiveMinimum": 0, "maximum": 9}
+
+
+def test_empty_properties_fixed_in_schemas_but_not_in_examples():
+    document = _openapi_30({"Thing": {
+        "type": "object",
+        "properties": {"anything": None},
+        "example": {"properties": {"anything": None}},
+    }})
+    fixed, _ = autofix(document)
+    thing = fixed["components"]["schemas"]["Thing"]
+
+    assert thing["properties"]["anything"] == {}
+    assert thing["example"] == {"properties": {"anything": None}}
+
+
+def test_dangling_refs_ignore_example_payloads():
+    operation = {"responses": {"200": {"description": "OK", "content": {"application/json": {
+        "schema": {"$ref": "#/components/schemas/Missing"},
+        "example": {"$ref": "#/not/a/reference"},
+        "examples": {"stored": {"$ref": "#/components/examples/Gone"},
+                     "inline": {"value": {"$ref": "#/also/data"}}}}}}}}
+    _, report = autofix(_openapi_30({}, operation))
+
+    messages = sorted(issue["message"] for issue in report.unresolved)
+    assert messages == ["$ref '#/components/examples/Gone' does not resolve",
+                        "$ref '#/components/schemas/Missing' does not resolve"]
+
+
+def test_iter_document_schemas_positions():
+    document = _openapi_30({"A": {"type": "object", "properties": {"b": {"type": "string"}}}}, {
+        "parameters": [{"name": "p", "in": "query", "schema": {"type": "string"}}],
+        "requestBody": {"content": {"application/json": {"schema": {"type": "object"}}}},
+        "responses": {"200": {"description": "OK", "headers": {"X-Rate": {"schema": {"type": "integer"}}}}},
+    })
+    pointers = sorted(pointer for pointer, _ in iter_document_schemas(document))
+
+    assert pointers == [
+        "/components/schemas/A",
+        "/components/schemas/A/properties/b",
+        "/paths/~1a/get/parameters/0/schema",
+        "/paths/~1a/get/requestBody/content/application~1json/schema",
+        "/paths/~1a/get/responses/200/headers/X-Rate/schema",
+    ]
+
+
+def test_nullable_without_a_type_string_still_allows_null():
+    document = _openapi_30({
+        "Pet": {"type": "object"},
+        "Tags": {"type": ["array", "string"], "nullable": True},
+        "Owner": {"$ref": "#/components/schemas/Pet", "description": "o", "nullable": True},
+        "Either": {"allOf": [{"$ref": "#/components/schemas/Pet"}], "nullable": True},
+        "Plain": {"nullable": False},
+    })
+    fixed, report = autofix(document)
+    schemas = fixed["components"]["schemas"]
+
+    assert schemas["Tags"] == {"type": ["array", "string", "null"]}
+    assert schemas["Owner"] == {"description": "o",
+                                "anyOf": [{"$ref": "#/components/schemas/Pet"}, {"type": "null"}]}
+    assert schemas["Either"] == {"anyOf": [{"allOf": [{"$ref": "#/components/schemas/Pet"}]}, {"type": "null"}]}
+    assert schemas["Plain"] == {}
+    messages = {fix["path"]: fix["message"] for fix in report.fixes}
+    assert messages["/components/schemas/Owner/nullable"] == "Replaced 3.0 'nullable' with anyOf [schema, {type: 'null'}]"
+
+
+def test_later_3_1_versions_are_kept():
+    document = {"openapi": "3.1.1", "info": {"title": "t", "version": "1", "description": "d"}, "paths": {}}
+    fixed, report = autofix(document)
+
+    assert fixed["openapi"] == "3.1.1"
+    assert not [fix for fix in report.fixes if fix["rule"] == "openapi_version"]
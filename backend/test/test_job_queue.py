@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from api.routes import jobs
+from api.services.job_queue import JobStore, JobWorkerPool, RetryableJobError
+
+SPEC = json.dumps({"openapi": "3.1.0", "info": {"title": "t", "version": "1"}, "paths": {}}).encode()
+
+
+def _job(store: JobStore) -> dict:
+    store.submit("openapi", SPEC, {"mode": "auto", "use_cache": True})
+    return store.claim()
+
+
+def test_purge_expired_keeps_recent_and_unfinished_jobs():
+    store = JobStore(":memory:")
+    old, recent = _job(store), _job(store)
+    store.complete(old["id"], {"status": "success"}, {})
+    store.fail(recent["id"], "boom", {})
+    queued = store.submit("openapi", SPEC, {})
+    store._db.execute("UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time() - 7200, old["id"]))
+
+    assert store.purge_expired(retention_seconds=3600) == 1
+    assert store.get(old["id"]) is None
+    assert store.get(recent["id"])["status"] == "failed"
+    assert store.get(queued)["status"] == "queued"
+
+
+def test_worker_retries_only_retryable_errors():
+    store = JobStore(":memory:")
+    retried = store.submit("openapi", SPEC, {"error": "retryable"})
+    failed = store.submit("openapi", SPEC, {"error": "fatal"})
+
+    async def handler(job, timings):
+        if job["params"]["error"] == "retryable":
+            raise RetryableJobError("rate limited")
+        raise ValueError("bad request")
+
+    async def drain():
+        pool = JobWorkerPool(store, handler, workers=1, max_attempts=2, retry_base_seconds=0.01, poll_interval=0.01)
+        pool.start()
+        for _ in range(200):
+            if store.counts()["failed"] == 2:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+    asyncio.run(drain())
+    assert store.get(retried)["attempts"] == 2
+    assert store.get(failed)["attempts"] == 1
+
+
+@pytest.mark.parametrize("corrections, retried", [
+    ({"suggestions": "Error: 429", "corrected_spec": "", "retryable": True, "source": "llm"}, True),
+    ({"suggestions": "Error: 400", "corrected_spec": "", "retryable": False, "source": "llm"}, False),
+    ({"suggestions": "- local fix", "corrected_spec": "openapi: 3.1.0", "source": "local"}, False),
+    ({"suggestions": "- local fix", "corrected_spec": "openapi: 3.1.0", "retryable": True, "source": "local"}, False),
+])
+def test_correction_job_retries_from_the_error_flag(monkeypatch, corrections, retried):
+    async def correct_spec(*args, **kwargs):
+        return corrections
+
+    monkeypatch.setattr(jobs, "_correct_spec", correct_spec)
+    monkeypatch.setattr(jobs, "get_llm_service", lambda: None)
+    job = {"id": "j", "filename": None, "params": {"mode": "auto", "use_cache": True}, "payload": SPEC}
+
+    if retried:
+        with pytest.raises(RetryableJobError):
+            asyncio.run(jobs.run_correction_job(job, {}))
+    else:
+        result = asyncio.run(jobs.run_correction_job(job, {}))
+        assert result["corrected_spec"] == corrections["corrected_spec"]
+        assert result["correction_source"] == corrections["source"]
@@ -0,0 +1,48 @@
+import pytest
+
+from utils.json_patch import PatchError, apply_operation, apply_patch
+
+
+def test_rejected_move_leaves_the_document_unchanged():
+    document = {'a': [1, 2], 'b': [9]}
+    patched, applied, rejected = apply_patch(document, [{'op': 'move', 'from': '/a/0', 'path': '/b/5'}])
+
+    assert patched == {'a': [1, 2], 'b': [9]}
+    assert applied == []
+    assert rejected[0]['error'] == "Array index out of range: 5"
+
+
+def test_rejected_move_restores_key_order():
+    document = {'responses': {200: {'description': 'OK'}, 404: {'description': 'Missing'}}, 'tags': 'x'}
+    with pytest.raises(PatchError):
+        apply_operation(document, {'op': 'move', 'from': '/responses/200', 'path': '/tags/0'})
+
+    assert list(document['responses'].items()) == [(200, {'description': 'OK'}), (404, {'description': 'Missing'})]
+
+
+def test_move_within_one_array_past_the_end_is_rejected():
+    patched, _, rejected = apply_patch({'a': [1, 2]}, [{'op': 'move', 'from': '/a/0', 'path': '/a/2'}])
+
+    assert patched == {'a': [1, 2]}
+    assert len(rejected) == 1
+
+
+def test_later_operations_still_apply_after_a_rejection():
+    operations = [
+        {'op': 'move', 'from': '/a/0', 'path': '/b/5'},
+        {'op': 'move', 'from': '/a/0', 'path': '/b/-'},
+        {'op': 'test', 'path': '/b', 'value': [9, 1]},
+    ]
+    patched, applied, rejected = apply_patch({'a': [1, 2], 'b': [9]}, operations)
+
+    assert patched == {'a': [2], 'b': [9, 1]}
+    assert applied == operations[1:]
+    assert len(rejected) == 1
+
+
+def test_input_document_is_not_modified():
+    document = {'paths': {'/a': {}}}
+    patched, _, _ = apply_patch(document, [{'op': 'add', 'path': '/paths/~1b', 'value': {}}])
+
+    assert document == {'paths': {'/a': {}}}
+    assert list(patched['paths']) == ['/a', '/b']
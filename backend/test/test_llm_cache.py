@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from api.services import llm_service
+from api.services.cache_service import CorrectionCache
+from api.services.token_planner import UsageRecorder
+from utils.validators import parse_spec
+
+FAST_MODEL = "claude-3-5-haiku-20241022"
+VALID = "openapi: 3.1.0\ninfo: {title: t, version: '1'}\npaths: {}\n"
+INVALID = "openapi: 3.1.0\ninfo: {title: t}\npaths: {}\n"
+
+
+class FakeMessages:
+    def __init__(self, replies: dict):
+        self.replies = replies
+        self.models = []
+
+    async def create(self, **request):
+        self.models.append(request["model"])
+        spec = self.replies.get(request["model"], VALID)
+        text = f"## SUGGESTIONS:\n- ok\n\n## CORRECTED SPEC:\n```yaml\n{spec}```"
+        usage = SimpleNamespace(input_tokens=1, output_tokens=1)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage, stop_reason="end_turn")
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_service, "CorrectionCache", lambda: CorrectionCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(llm_service, "UsageRecorder", lambda: UsageRecorder(None))
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    service = llm_service.LLMService()
+    yield service
+    service.cache.close()
+
+
+def _connect(service, replies: dict) -> FakeMessages:
+    messages = FakeMessages(replies)
+    service.async_anthropic_client = SimpleNamespace(beta=SimpleNamespace(prompt_caching=SimpleNamespace(messages=messages)))
+    return messages
+
+
+def test_results_are_cached_under_the_model_that_answered(service):
+    messages = _connect(service, {FAST_MODEL: INVALID})
+    parsed = parse_spec(INVALID.encode())
+
+    first = asyncio.run(service.aget_corrections(parsed))
+    assert first["routing"]["escalated"]
+    keys = service.cache.make_keys("corrections", parsed.document, [FAST_MODEL, first["routing"]["model"]],
+                                   llm_service.CORRECTIONS_PROMPT_VERSION)
+    assert first["cache_key"] == keys[first["routing"]["model"]]
+    assert service.cache.get(keys[FAST_MODEL]) is None
+
+    again = asyncio.run(service.aget_corrections(parsed))
+    assert again["cached"] and again["cache_key"] == first["cache_key"]
+    assert len(messages.models) == 2
+
+
+def test_fast_model_answers_are_not_served_with_the_cascade_off(service):
+    _connect(service, {})
+    parsed = parse_spec(INVALID.encode())
+    first = asyncio.run(service.aget_corrections(parsed))
+    assert first["routing"]["model"] == FAST_MODEL
+
+    service.router.enabled = False
+    second = asyncio.run(service.aget_corrections(parsed))
+    assert not second["cached"]
+    assert second["routing"]["model"] == llm_service.CLAUDE_MODEL
+
+
+def test_a_lookup_over_several_models_counts_one_miss(tmp_path):
+    cache = CorrectionCache(str(tmp_path / "cache.sqlite3"))
+    keys = cache.make_keys("corrections", {"a": 1}, ["m1", "m2", "m3"], "v1")
+    assert keys["m2"] == cache.make_key("corrections", {"a": 1}, "m2", "v1")
+
+    assert cache.get_first(keys.values()) == (None, None)
+    cache.set(keys["m3"], {"corrected_spec": "x"})
+    assert cache.get_first(keys.values()) == (keys["m3"], {"corrected_spec": "x"})
+    assert (cache.stats["misses"], cache.stats["memory_hits"]) == (1, 1)
+    cache.close()
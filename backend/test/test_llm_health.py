@@ -0,0 +1,79 @@
+import asyncio
+from typing import Tuple
+
+from api.services import llm_health
+from api.services.llm_health import CircuitBreaker, LLMHealthMonitor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(monkeypatch, threshold: int = 2, reset: float = 30) -> Tuple[CircuitBreaker, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(llm_health.time, "monotonic", clock)
+    return CircuitBreaker(failure_threshold=threshold, reset_seconds=reset), clock
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    breaker, _ = _breaker(monkeypatch)
+    breaker.record_failure("down")
+    breaker.record_success()
+    breaker.record_failure("down")
+    assert breaker.state == "closed" and breaker.allow_request()
+
+    breaker.record_failure("down again")
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert breaker.snapshot()["last_error"] == "down again"
+
+
+def test_half_open_lets_one_trial_through(monkeypatch):
+    breaker, clock = _breaker(monkeypatch, threshold=1)
+    breaker.record_failure("down")
+    clock.now += 29
+    assert not breaker.allow_request() and breaker.retry_in() == 1
+
+    clock.now += 1
+    assert breaker.allow_request()
+    assert breaker.state == "half_open"
+    assert not breaker.allow_request()
+
+    breaker.record_failure("still down")
+    assert breaker.state == "open" and not breaker.allow_request()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+
+
+def test_unreported_trial_expires(monkeypatch):
+    breaker, clock = _breaker(monkeypatch, threshold=1)
+    breaker.record_failure("down")
+    clock.now += 30
+    assert breaker.allow_request()
+
+    clock.now += 29
+    assert not breaker.allow_request()
+    clock.now += 1
+    assert breaker.allow_request()
+
+
+def test_only_upstream_probe_failures_count(monkeypatch):
+    results = iter([{"success": False, "error": "429", "upstream_failure": False}] * 3
+                   + [{"success": False, "error": "503", "upstream_failure": True}])
+
+    async def probe():
+        return next(results)
+
+    monitor = LLMHealthMonitor(probe, interval=0, breaker=CircuitBreaker(failure_threshold=1))
+    for _ in range(3):
+        asyncio.run(monitor.check())
+        assert monitor.breaker.state == "closed"
+    asyncio.run(monitor.check())
+    assert monitor.breaker.state == "open"
+    assert [entry["success"] for entry in monitor.history] == [False] * 4
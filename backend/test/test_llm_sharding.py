@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from api.services import llm_service
+from api.services.cache_service import CorrectionCache
+from api.services.token_planner import UsageRecorder
+from utils.validators import ParsedSpec
+from utils.yaml_loader import load_yaml
+
+
+def _document() -> dict:
+    paths = {f"/{group}/{i}": {"get": {"tags": [group], "operationId": "getThing" if i == 0 else f"get{group}{i}",
+                                       "responses": {"200": {"description": "OK"}}}}
+             for group in ("pets", "stores") for i in range(2)}
+    return {"openapi": "3.1.0", "info": {"title": "t", "version": "1"}, "paths": paths}
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_service, "CorrectionCache", lambda: CorrectionCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(llm_service, "UsageRecorder", lambda: UsageRecorder(None))
+    monkeypatch.setattr(llm_service, "LLM_VERIFY_MAX_ROUNDS", 0)
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    service = llm_service.LLMService()
+    yield service
+    service.cache.close()
+
+
+def test_no_corrected_shard_is_an_error(service):
+    result = asyncio.run(service.aget_corrections_sharded(ParsedSpec.from_document(_document()), max_paths=2))
+
+    assert result["corrected_spec"] == ""
+    assert result["suggestions"].startswith("Error")
+    assert result["shards"] == 2
+
+
+def test_merged_spec_is_verified_across_shards(service, monkeypatch):
+    async def echo(parsed, use_cache=True):
+        return {"suggestions": "- ok", "corrected_spec": parsed.text, "duplicate_keys": []}
+
+    monkeypatch.setattr(service, "aget_corrections", echo)
+    result = asyncio.run(service.aget_corrections_sharded(ParsedSpec.from_document(_document()), max_paths=2))
+
+    assert load_yaml(result["corrected_spec"])[0] == _document()
+    assert not result["verification"]["valid"]
+    assert "getThing" in result["suggestions"]
@@ -0,0 +1,40 @@
+from api.services.model_router import ModelRouter
+from api.services.token_planner import TokenPlan
+from utils.spec_verifier import verify_spec
+from utils.validators import ParsedSpec
+
+PLAN = TokenPlan("claude-3-5-sonnet-20241022", 2048, 1000, 1500, True)
+SPEC = {"openapi": "3.1.0", "info": {"title": "t", "version": "1"}, "paths": {}}
+
+
+def test_choose_routes_on_the_callers_schema_report():
+    router = ModelRouter(enabled=True, max_input_tokens=16000, max_issues=1)
+    parsed = ParsedSpec.from_document(SPEC)
+    assert router.screen("corrections", parsed, PLAN) is None
+
+    fast = router.choose("corrections", parsed, PLAN, {"valid": True, "errors": [], "truncated": False})
+    report = {"valid": False, "errors": [{"path": "/", "message": "x", "validator": "type"}] * 2, "truncated": False}
+    direct = router.choose("corrections", parsed, PLAN, report)
+
+    assert (fast.tier, fast.issues) == ("fast", 0)
+    assert (direct.tier, direct.issues) == ("direct", 2)
+
+
+def test_large_inputs_are_screened_out_before_validation():
+    router = ModelRouter(enabled=True, max_input_tokens=500)
+    route = router.screen("corrections", ParsedSpec.from_document(SPEC), PLAN)
+
+    assert (route.tier, route.reason) == ("direct", "1000 input tokens > 500")
+
+
+def test_check_judges_the_given_verification():
+    router = ModelRouter(enabled=True)
+    valid = "openapi: 3.1.0\ninfo: {title: t, version: '1'}\npaths: {}\n"
+    invalid = "openapi: 3.1.0\ninfo: {title: t}\npaths: {}\n"
+
+    assert router.check("corrections", {"corrected_spec": valid, "suggestions": "- ok"}, verify_spec(valid)) == (
+        True, "corrected spec is valid")
+    assert router.check("corrections", {"corrected_spec": invalid, "suggestions": "- ok"}, verify_spec(invalid)) == (
+        False, "corrected spec fails schema validation")
+    assert router.check("corrections", {"corrected_spec": "a: [", "suggestions": "- ok"}, verify_spec("a: [")) == (
+        False, "invalid YAML")
@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+
+from utils.postman_compiler import compile_postman
+
+TEST_SPECS = Path(__file__).resolve().parents[2] / "data" / "test_specs"
+
+
+def _collection(*requests: dict) -> dict:
+    return {"info": {"name": "Test"},
+            "item": [{"name": f"Request {i}", "request": request} for i, request in enumerate(requests)]}
+
+
+def test_string_path_in_v2_0_url():
+    document, _ = compile_postman(_collection({
+        "method": "GET",
+        "url": {"raw": "https://api.example.com/users/:id/orders", "host": "api.example.com",
+                "path": "users/:id/orders"},
+    }))
+
+    assert list(document["paths"]) == ["/users/{id}/orders"]
+    parameters = document["paths"]["/users/{id}/orders"]["get"]["parameters"]
+    assert parameters == [{"name": "id", "in": "path", "required": True, "schema": {"type": "string"}}]
+
+
+def test_variables_inside_a_segment_become_parameters():
+    document, _ = compile_postman(_collection({
+        "method": "GET",
+        "url": {"raw": "{{baseUrl}}/v{{version}}/items/{{itemId}}", "host": ["{{baseUrl}}"],
+                "path": ["v{{version}}", "items", "{{itemId}}"]},
+    }))
+
+    assert list(document["paths"]) == ["/v{version}/items/{itemId}"]
+    names = [p["name"] for p in document["paths"]["/v{version}/items/{itemId}"]["get"]["parameters"]]
+    assert names == ["version", "itemId"]
+
+
+def test_raw_string_url_with_path_variables():
+    document, _ = compile_postman(_collection({"method": "DELETE", "url": "https://api.example.com/users/:userId"}))
+
+    assert list(document["paths"]) == ["/users/{userId}"]
+    assert document["servers"] == [{"url": "https://api.example.com"}]
+
+
+def test_query_parameters_are_optional():
+    document, _ = compile_postman(_collection({
+        "method": "GET",
+        "url": {"raw": "https://api.example.com/search?q=x&page=2", "host": ["api", "example", "com"],
+                "path": ["search"],
+                "query": [{"key": "q", "value": "x"}, {"key": "page", "value": "2", "disabled": True}]},
+    }))
+
+    parameters = document["paths"]["/search"]["get"]["parameters"]
+    assert [(p["name"], p["required"], p["schema"]["type"]) for p in parameters] == [
+        ("q", False, "string"), ("page", False, "integer")]
+
+
+def test_fixture_collection_compiles():
+    with open(TEST_SPECS / "Heart Disease Prediction API.postman_collection.json", encoding="utf-8") as fixture:
+        collection = json.load(fixture)
+    document, notes = compile_postman(collection)
+
+    assert document["openapi"] == "3.1.0"
+    assert document["paths"]
+    assert not any("{{" in path for path in document["paths"])
+    assert notes[0].startswith("- Compiled")
+
+
+def test_collection_auth_is_inherited():
+    collection = _collection({"method": "GET", "url": "https://api.example.com/users"},
+                             {"method": "GET", "url": "https://api.example.com/health", "auth": {"type": "noauth"}})
+    collection["auth"] = {"type": "bearer"}
+    document, _ = compile_postman(collection)
+
+    assert document["components"]["securitySchemes"] == {"bearerAuth": {"type": "http", "scheme": "bearer"}}
+    assert document["paths"]["/users"]["get"]["security"] == [{"bearerAuth": []}]
+    assert "security" not in document["paths"]["/health"]["get"]
+
+
+def test_header_parameters_are_optional():
+    document, _ = compile_postman(_collection({
+        "method": "GET", "url": "https://api.example.com/users",
+        "header": [{"key": "X-Trace", "value": "1"}, {"key": "Accept", "value": "application/json"}],
+    }))
+
+    assert document["paths"]["/users"]["get"]["parameters"] == [
+        {"name": "X-Trace", "in": "header", "required": False, "schema": {"type": "string"}}]
@@ -0,0 +1,22 @@
+from api.services import prompts
+from api.services.prompts import SYSTEM_PROMPTS, is_cacheable, system_blocks
+
+SONNET = "claude-3-5-sonnet-20241022"
+HAIKU = "claude-3-5-haiku-20241022"
+
+
+def test_short_prompts_get_no_cache_breakpoint():
+    is_cacheable.cache_clear()
+    for kind in SYSTEM_PROMPTS:
+        assert system_blocks(kind, SONNET) == [{"type": "text", "text": SYSTEM_PROMPTS[kind]}]
+
+
+def test_breakpoint_follows_the_model_minimum(monkeypatch):
+    monkeypatch.setattr(prompts, "DEFAULT_CACHE_MIN_TOKENS", 100)
+    monkeypatch.setattr(prompts, "CACHE_MIN_TOKENS", {"haiku": 100000})
+    is_cacheable.cache_clear()
+    try:
+        assert system_blocks("corrections", SONNET)[0]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in system_blocks("corrections", HAIKU)[0]
+    finally:
+        is_cacheable.cache_clear()
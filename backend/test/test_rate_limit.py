@@ -0,0 +1,96 @@
+import asyncio
+from email.utils import formatdate
+
+import httpx
+import pytest
+from anthropic import APIStatusError
+
+from api.services import rate_limit
+from api.services.rate_limit import LLMScheduler, TokenBucket, retry_after
+
+
+def _error(status: int, headers: dict = None) -> APIStatusError:
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return APIStatusError(f"HTTP {status}", response=response, body=None)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_reservations_queue_behind_each_other(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    bucket = TokenBucket(tokens_per_minute=60)  # One token per second
+
+    assert bucket.reserve(30) == 0
+    assert bucket.reserve(40) == pytest.approx(10)
+    assert bucket.reserve(5) == pytest.approx(15)
+    clock.now += 15
+    assert bucket.available() == pytest.approx(0)
+
+
+def test_oversized_request_waits_for_a_full_bucket(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    bucket = TokenBucket(tokens_per_minute=60)
+
+    assert bucket.reserve(500) == 0
+    assert bucket.reserve(1) == pytest.approx(1)
+    assert TokenBucket(tokens_per_minute=0).reserve(10 ** 9) == 0
+
+
+def test_retry_after_headers():
+    assert retry_after(_error(429, {"retry-after-ms": "1500", "retry-after": "9"})) == 1.5
+    assert retry_after(_error(429, {"retry-after": "3"})) == 3.0
+    assert retry_after(_error(529, {"retry-after": formatdate(usegmt=True)})) == pytest.approx(0, abs=2)
+    assert retry_after(_error(429, {"retry-after": "soon"})) is None
+    assert retry_after(_error(500)) is None
+    assert retry_after(ValueError("no response")) is None
+
+
+def test_backoff_honors_retry_after_within_the_cap():
+    scheduler = LLMScheduler(retry_base_seconds=1, retry_max_seconds=5)
+
+    assert scheduler.backoff(_error(429, {"retry-after": "2"}), 1) == 2
+    assert scheduler.backoff(_error(429, {"retry-after": "60"}), 1) == 5
+    assert 4 <= scheduler.backoff(_error(500), 3) <= 5
+
+
+def test_run_retries_transient_errors():
+    scheduler = LLMScheduler(max_retries=2, retry_base_seconds=0.001, tokens_per_minute=0)
+    errors = [_error(429), _error(529)]
+
+    async def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert asyncio.run(scheduler.run(call, 100)) == "ok"
+    stats = scheduler.get_stats()
+    assert (stats["requests"], stats["retries"], stats["failures"]) == (3, 2, 0)
+    assert stats["retried_errors"] == {"429": 1, "529": 1}
+
+
+def test_run_gives_up_on_client_errors_and_after_max_retries():
+    scheduler = LLMScheduler(max_retries=1, retry_base_seconds=0.001, tokens_per_minute=0)
+    attempts = []
+
+    async def call(status):
+        attempts.append(status)
+        raise _error(status)
+
+    with pytest.raises(APIStatusError):
+        asyncio.run(scheduler.run(lambda: call(400), 100))
+    with pytest.raises(APIStatusError):
+        asyncio.run(scheduler.run(lambda: call(503), 100))
+    with pytest.raises(APIStatusError):
+        asyncio.run(scheduler.run(lambda: call(503), 100, retry=False))
+
+    assert attempts == [400, 503, 503, 503]
+    assert scheduler.get_stats()["failures"] == 3
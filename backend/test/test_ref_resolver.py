@@ -0,0 +1,115 @@
+import pytest
+import yaml
+
+from utils.ref_resolver import RefResolver, normalize_path, resolve_bundle
+
+
+def _yaml(document: dict) -> bytes:
+    return yaml.safe_dump(document, sort_keys=False).encode()
+
+
+def _files() -> dict:
+    root = {
+        "openapi": "3.1.0",
+        "info": {"title": "t", "version": "1"},
+        "paths": {"/pets": {"$ref": "paths/pets.yaml"}},
+        "components": {"schemas": {"Pet": {"type": "string"}}},
+    }
+    pets = {"get": {"responses": {
+        "200": {"description": "OK", "content": {"application/json": {"schema": {"$ref": "../schemas.yaml#/Pet"}}}},
+        "404": {"$ref": "https://example.com/responses.yaml"},
+        "500": {"$ref": "missing.yaml"},
+    }}}
+    schemas = {
+        "Pet": {"type": "object", "properties": {"parent": {"$ref": "#/Pet"}, "tag": {"$ref": "#/Tag"}}},
+        "Tag": {"type": "string"},
+    }
+    return {"openapi.yaml": _yaml(root), "paths/pets.yaml": _yaml(pets), "schemas.yaml": _yaml(schemas)}
+
+
+def _response_schema(document: dict) -> dict:
+    return document["paths"]["/pets"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+
+def test_bundle_moves_external_schemas_into_components():
+    parsed, report = resolve_bundle(_files())
+    document = parsed.document
+
+    # The path item is inlined; the schema becomes a component without clobbering the root's 'Pet'
+    assert _response_schema(document) == {"$ref": "#/components/schemas/Pet2"}
+    assert document["components"]["schemas"]["Pet"] == {"type": "string"}
+    assert document["components"]["schemas"]["Pet2"]["properties"] == {
+        "parent": {"$ref": "#/components/schemas/Pet2"},
+        "tag": {"$ref": "#/components/schemas/Tag"},
+    }
+    assert document["components"]["schemas"]["Tag"] == {"type": "string"}
+    assert report["root"] == "openapi.yaml"
+    assert report["circular_refs"] == ["#/Pet"]
+
+
+def test_remote_and_missing_refs_are_kept_and_reported():
+    parsed, report = resolve_bundle(_files())
+    responses = parsed.document["paths"]["/pets"]["get"]["responses"]
+
+    assert responses["404"] == {"$ref": "https://example.com/responses.yaml"}
+    assert responses["500"] == {"$ref": "missing.yaml"}
+    assert report["unresolved_refs"] == [
+        {"ref": "https://example.com/responses.yaml", "file": "paths/pets.yaml",
+         "error": "Remote references are not fetched"},
+        {"ref": "missing.yaml", "file": "paths/pets.yaml", "error": "File not found: paths/missing.yaml"},
+    ]
+
+
+def test_dereference_inlines_targets_and_keeps_cycles_as_local_refs():
+    parsed, report = resolve_bundle(_files(), dereference=True)
+    schema = _response_schema(parsed.document)
+
+    assert schema["properties"]["tag"] == {"type": "string"}
+    assert schema["properties"]["parent"] == {
+        "$ref": "#/paths/~1pets/get/responses/200/content/application~1json/schema"}
+    assert report["refs"] == "dereference"
+    assert report["circular_refs"] == ["#/Pet"]
+
+
+def test_refs_inside_the_root_are_left_alone_when_bundling():
+    root = {"openapi": "3.1.0", "info": {"title": "t", "version": "1"},
+            "paths": {"/a": {"get": {"responses": {"200": {"$ref": "#/components/responses/Ok"}}}}},
+            "components": {"responses": {"Ok": {"description": "OK"}}}}
+    parsed, report = resolve_bundle({"api.yaml": _yaml(root)})
+
+    assert parsed.document == root
+    assert report["unresolved_refs"] == []
+
+
+def test_long_reference_chains_do_not_exhaust_the_stack():
+    depth = 2000
+    chain = {f"S{i}": {"$ref": f"#/S{i + 1}"} for i in range(depth)}
+    chain[f"S{depth}"] = {"type": "string"}
+    root = {"openapi": "3.1.0", "info": {"title": "t", "version": "1"}, "paths": {},
+            "components": {"schemas": {"Start": {"$ref": "chain.yaml#/S0"}}}}
+    parsed, _ = resolve_bundle({"openapi.yaml": _yaml(root), "chain.yaml": _yaml(chain)})
+
+    # Each hop is the definition of the same component, so the chain collapses into it
+    assert parsed.document["components"]["schemas"] == {"Start": {"type": "string"}}
+
+
+def test_find_root_prefers_the_spec_no_other_file_references():
+    info = {"title": "t", "version": "1"}
+    files = {
+        "main.yaml": _yaml({"openapi": "3.1.0", "info": info, "paths": {"/a": {"$ref": "other.yaml#/paths/~1a"}}}),
+        "other.yaml": _yaml({"openapi": "3.1.0", "info": info, "paths": {"/a": {"get": {"responses": {}}}}}),
+    }
+    assert RefResolver(files).find_root() == "main.yaml"
+
+    with pytest.raises(ValueError, match="Could not pick the root spec"):
+        RefResolver({"a.yaml": files["other.yaml"], "b.yaml": files["other.yaml"]}).find_root()
+
+
+def test_explicit_root_must_be_in_the_bundle():
+    with pytest.raises(ValueError, match="not in the bundle"):
+        resolve_bundle(_files(), root="nope.yaml")
+
+
+def test_normalize_path():
+    assert normalize_path("./specs\\paths/../openapi.yaml") == "specs/openapi.yaml"
+    assert normalize_path("/openapi.yaml") == "openapi.yaml"
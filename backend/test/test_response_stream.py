@@ -0,0 +1,48 @@
+from utils.response_stream import CorrectionStreamParser
+
+RESPONSE = """Here you go.
+## SUGGESTIONS:
+- Added a description
+  to the info object
+- Fixed the version
+
+## CORRECTED SPEC:
+```yaml
+openapi: 3.1.0
+info:
+  title: t
+```
+"""
+
+
+def _events(deltas) -> list:
+    parser = CorrectionStreamParser()
+    events = [event for delta in deltas for event in parser.feed(delta)]
+    return events + parser.close()
+
+
+def _spec(events) -> str:
+    return "".join(text for event, text in events if event == "spec_chunk")
+
+
+def test_split_deltas_give_the_same_events():
+    whole = _events([RESPONSE])
+    split = _events([RESPONSE[i:i + 3] for i in range(0, len(RESPONSE), 3)])
+
+    suggestions = [text for event, text in whole if event == "suggestion"]
+    assert suggestions == ["- Added a description\nto the info object", "- Fixed the version"]
+    assert [e for e in split if e[0] == "suggestion"] == [e for e in whole if e[0] == "suggestion"]
+    assert _spec(split) == _spec(whole) == "openapi: 3.1.0\ninfo:\n  title: t\n"
+
+
+def test_spec_without_a_code_fence():
+    events = _events(["## SUGGESTIONS:\n1. One fix\n## CORRECTED SPEC:\n", "openapi: 3.1.0\npaths: {}"])
+
+    assert events[0] == ("suggestion", "1. One fix")
+    assert _spec(events) == "openapi: 3.1.0\npaths: {}\n"
+
+
+def test_text_after_the_closing_fence_is_ignored():
+    events = _events([RESPONSE + "Let me know if you need more.\n"])
+
+    assert "Let me know" not in _spec(events)
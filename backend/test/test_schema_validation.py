@@ -0,0 +1,53 @@
+from utils.schema_validation import MAX_ERRORS, validate_document
+
+
+def _openapi_31(schema: dict, **extra) -> dict:
+    return {
+        "openapi": "3.1.0",
+        "info": {"title": "t", "version": "1"},
+        "paths": {"/a": {"get": {
+            "parameters": [{"name": "q", "in": "query", "schema": {"type": "string"}}],
+            "responses": {"200": {"description": "OK", "content": {"application/json": {"schema": schema}}}},
+        }}},
+        **extra,
+    }
+
+
+def test_invalid_3_1_schema_objects_are_reported():
+    report = validate_document(_openapi_31({
+        "type": "object",
+        "properties": {"n": {"type": "integr", "exclusiveMinimum": True}},
+    }))
+
+    assert not report["valid"]
+    pointer = "/paths/~1a/get/responses/200/content/application~1json/schema/properties/n"
+    assert sorted(error["path"] for error in report["errors"]) == [
+        f"{pointer}/exclusiveMinimum", f"{pointer}/type"]
+
+
+def test_valid_3_1_schema_objects_pass():
+    report = validate_document(_openapi_31({
+        "type": ["object", "null"],
+        "properties": {"n": {"type": "integer", "exclusiveMinimum": 0}},
+        "discriminator": {"propertyName": "n"},
+        "example": {"n": 1},
+    }))
+
+    assert report == {"valid": True, "version": "3.1", "errors": [], "error_count": 0, "truncated": False}
+
+
+def test_other_dialects_are_not_checked_against_2020_12():
+    custom = _openapi_31({"type": "integr"}, jsonSchemaDialect="https://example.com/dialect")
+    declared = _openapi_31({"$schema": "https://example.com/dialect", "type": "integr"})
+
+    assert validate_document(custom)["valid"]
+    assert validate_document(declared)["valid"]
+
+
+def test_errors_past_the_limit_are_counted():
+    properties = {f"p{i}": {"type": "integr"} for i in range(MAX_ERRORS + 10)}
+    report = validate_document(_openapi_31({"type": "object", "properties": properties}))
+
+    assert len(report["errors"]) == MAX_ERRORS
+    assert report["error_count"] == MAX_ERRORS + 10
+    assert report["truncated"]
@@ -0,0 +1,79 @@
+from utils.sharding import merge_shards, split_spec
+
+
+def _document() -> dict:
+    paths = {}
+    for group in ("pets", "stores"):
+        for i in range(3):
+            paths[f"/{group}/{i}"] = {"get": {
+                "tags": [group],
+                "responses": {"200": {"description": "OK", "content": {"application/json": {
+                    "schema": {"$ref": f"#/components/schemas/{group.capitalize()}"}}}}}}}
+    return {
+        "openapi": "3.1.0",
+        "info": {"title": "t", "version": "1"},
+        "tags": [{"name": "pets", "description": "Pets"}, {"name": "stores", "description": "Stores"},
+                 {"name": "admin", "description": "Declared but used by no operation"}],
+        "paths": paths,
+        "components": {"schemas": {"Pets": {"type": "object"}, "Stores": {"type": "object"},
+                                   "Unused": {"type": "string"}}},
+    }
+
+
+def test_split_keeps_referenced_components_with_their_paths():
+    shards = split_spec(_document(), max_paths_per_shard=3)
+
+    pets = next(shard for shard in shards if "/pets/0" in shard["paths"])
+    assert set(pets["paths"]) == {"/pets/0", "/pets/1", "/pets/2"}
+    assert set(pets["components"]["schemas"]) == {"Pets"}
+    assert pets["tags"] == [{"name": "pets", "description": "Pets"}]
+    # Components no path uses get a shard of their own
+    assert any(shard["components"]["schemas"] == {"Unused": {"type": "string"}} for shard in shards)
+
+
+def test_round_trip_keeps_unreferenced_tags():
+    document = _document()
+    merged, conflicts = merge_shards(document, split_spec(document, max_paths_per_shard=3))
+
+    assert conflicts == []
+    assert merged["tags"] == document["tags"]
+    assert merged["paths"] == document["paths"]
+    assert merged["components"] == document["components"]
+
+
+def test_corrected_and_added_tags_are_merged_into_the_original_list():
+    document = _document()
+    shards = split_spec(document, max_paths_per_shard=3)
+    for shard in shards:
+        for tag in shard.get("tags", []):
+            if tag["name"] == "stores":
+                tag["description"] = "Store locations"
+        if "/pets/0" in shard["paths"]:
+            shard["tags"].append({"name": "new"})
+    merged, _ = merge_shards(document, shards)
+
+    assert [tag["name"] for tag in merged["tags"]] == ["pets", "stores", "admin", "new"]
+    assert merged["tags"][1]["description"] == "Store locations"
+
+
+def test_conflicting_components_keep_first_version():
+    document = _document()
+    shards = split_spec(document, max_paths_per_shard=3)
+    first, second = [shard for shard in shards if shard["paths"]][:2]
+    first.setdefault("components", {}).setdefault("schemas", {})["Shared"] = {"type": "integer"}
+    second.setdefault("components", {}).setdefault("schemas", {})["Shared"] = {"type": "string"}
+    merged, conflicts = merge_shards(document, shards)
+
+    assert merged["components"]["schemas"]["Shared"] == {"type": "integer"}
+    assert conflicts == ["Component 'schemas/Shared' differs between shards (kept first version)"]
+
+
+def test_conflicting_top_level_sections_are_reported():
+    document = _document()
+    shards = split_spec(document, max_paths_per_shard=3)
+    shards[1]["info"] = {"title": "Renamed", "version": "1"}
+    del shards[2]["info"]
+    merged, conflicts = merge_shards(document, shards)
+
+    assert merged["info"] == document["info"]
+    assert conflicts == ["Top-level 'info' differs between shards (kept first version)"]
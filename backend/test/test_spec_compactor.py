@@ -0,0 +1,92 @@
+import json
+
+from utils.spec_compactor import HOIST_PREFIX, compact_document, expand_hoisted, expand_hoisted_text
+from utils.yaml_loader import dump_yaml, load_yaml
+
+USER = {"type": "object", "properties": {"id": {"type": "string"}, "name": {"type": "string"},
+                                         "email": {"type": "string", "format": "email"}}}
+
+
+def _document() -> dict:
+    def operation():
+        return {"responses": {"200": {"description": "OK", "content": {"application/json": {"schema": json.loads(
+            json.dumps(USER))}}}}}
+    return {"openapi": "3.1.0", "info": {"title": "t", "version": "1"},
+            "paths": {"/a": {"get": operation()}, "/b": {"get": operation()}}}
+
+
+def test_hoist_then_expand_round_trips():
+    document = _document()
+    compact = compact_document(document, dump_yaml(document), hoist=True)
+    assert list(compact.hoisted) == [f"{HOIST_PREFIX}1"]
+    hoisted_document = json.loads(compact.text)
+    assert "$ref" in hoisted_document["paths"]["/a"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+    assert expand_hoisted(json.loads(compact.text), compact.hoisted) == document
+    assert load_yaml(expand_hoisted_text(dump_yaml(hoisted_document), compact.hoisted))[0] == document
+
+
+def test_expand_text_keeps_comments():
+    text = (
+        "# Changes: added descriptions\n"
+        "openapi: 3.1.0\n"
+        "info: {title: t, version: '1'}  # quoted version\n"
+        "paths:\n"
+        "  /a:\n"
+        "    get:\n"
+        "      responses:\n"
+        "        '200':\n"
+        "          description: OK\n"
+        "          schema:\n"
+        "            $ref: '#/components/schemas/CompactShared1'\n"
+        "        '404':\n"
+        "          description: Missing\n"
+        "          schema: {$ref: '#/components/schemas/CompactShared1', description: Gone}\n"
+        "components:\n"
+        "  schemas:\n"
+        "    CompactShared1:\n"
+        "      type: object\n"
+        "      description: Corrected by the model\n"
+    )
+    expanded = expand_hoisted_text(text, {"CompactShared1": USER})
+    assert "# Changes: added descriptions" in expanded
+    assert "# quoted version" in expanded
+    corrected = {"type": "object", "description": "Corrected by the model"}
+    assert load_yaml(expanded)[0] == {
+        "openapi": "3.1.0", "info": {"title": "t", "version": "1"},
+        "paths": {"/a": {"get": {"responses": {
+            "200": {"description": "OK", "schema": corrected},
+            "404": {"description": "Missing", "schema": {**corrected, "description": "Gone"}}}}}},
+    }
+
+
+def test_expand_text_without_hoisted_refs_is_unchanged():
+    text = "openapi: 3.1.0  # untouched\npaths: {}\n"
+    assert expand_hoisted_text(text, {"CompactShared1": USER}) == text
+
+
+def test_expand_falls_back_to_dumping_for_aliases():
+    text = (
+        "openapi: 3.1.0\n"
+        "paths:\n"
+        "  /a: &item {get: {responses: {'200': {description: OK, schema: {$ref: '#/components/schemas/CompactShared1'}}}}}\n"
+        "  /b: *item\n"
+    )
+    expanded = load_yaml(expand_hoisted_text(text, {"CompactShared1": USER}))[0]
+    assert expanded["paths"]["/b"]["get"]["responses"]["200"]["schema"] == USER
+
+
+def test_expand_handles_deep_nesting():
+    depth = 5000
+    document = {"openapi": "3.1.0"}
+    node = document
+    for _ in range(depth):
+        node["items"] = {}
+        node = node["items"]
+    node["$ref"] = f"#/components/schemas/{HOIST_PREFIX}1"
+
+    expand_hoisted(document, {f"{HOIST_PREFIX}1": USER})
+    node = document
+    for _ in range(depth):
+        node = node["items"]
+    assert node == USER
@@ -0,0 +1,76 @@
+from utils.spec_verifier import splice_fragments, verify_spec
+
+SPEC = """openapi: 3.1.0
+info:
+  title: t
+  version: '1'
+paths:
+  /a:
+    get:
+      responses:
+        '200':
+          description: ok
+    get:
+      responses:
+        '200':
+          description: again
+  /b:
+    get:
+      responses: {}
+components:
+  schemas:
+    Pet:
+      type: object
+      type: string
+"""
+
+
+def test_valid_spec_passes():
+    verification = verify_spec("openapi: 3.1.0\ninfo: {title: t, version: '1'}\npaths: {}\n")
+
+    assert verification.valid
+    assert (verification.errors, verification.fragments, verification.error_count) == ([], {}, 0)
+
+
+def test_unparseable_spec_reports_a_parse_error():
+    assert verify_spec("a: [").parse_error.startswith("Invalid YAML")
+    assert verify_spec("- a\n- b\n").parse_error == "Corrected spec is not a mapping"
+
+
+def test_errors_are_attributed_to_fragments():
+    verification = verify_spec(SPEC)
+
+    assert set(verification.fragments) == {"/paths/~1a", "/paths/~1b", "/components/schemas/Pet"}
+    assert {e["validator"] for e in verification.fragments["/paths/~1b"]} == {"minProperties", "required"}
+    assert verification.error_count == len(verification.errors) == 4
+    assert verification.unlocated == []
+
+
+def test_duplicate_keys_keep_the_source_as_written():
+    verification = verify_spec(SPEC)
+
+    assert [e["validator"] for e in verification.fragments["/paths/~1a"]] == ["duplicate_key"]
+    assert verification.sources == {
+        "/paths/~1a": "\n".join(SPEC.splitlines()[5:14]),
+        "/components/schemas/Pet": "    Pet:\n      type: object\n      type: string",
+    }
+    assert "/paths/~1b" not in verification.sources
+
+
+def test_duplicate_top_level_keys_stay_at_the_root():
+    verification = verify_spec("openapi: 3.1.0\ninfo: {title: t, version: '1'}\npaths: {}\npaths: {}\n")
+
+    assert verification.fragments == {} and verification.sources == {}
+    assert verification.unlocated == verification.errors
+    assert verification.errors[0]["path"] == "/"
+
+
+def test_splice_applies_only_allowed_fragments():
+    document = {"paths": {"/a": {"get": {}}, "/b": {"get": {}}}}
+    fixed = {"get": {"responses": {"200": {"description": "ok"}}}}
+    patched, applied = splice_fragments(document, {"/paths/~1a": fixed, "/paths/~1b": fixed, "/info": None},
+                                        ["/paths/~1a", "/info"])
+
+    assert applied == ["/paths/~1a"]
+    assert patched["paths"] == {"/a": fixed, "/b": {"get": {}}}
+    assert document["paths"]["/a"] == {"get": {}}
@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import yaml
+
+from utils.swagger_converter import convert_swagger2, iter_schemas, upgrade_exclusive_bounds
+
+TEST_SPECS = Path(__file__).resolve().parents[2] / "data" / "test_specs"
+
+
+def _load(name: str) -> dict:
+    with open(TEST_SPECS / name, encoding="utf-8") as spec:
+        return yaml.safe_load(spec)
+
+
+def _assert_subset(converted, golden, pointer=""):
+    """Everything the converter produced must appear unchanged in the golden file (which adds enrichment)"""
+    if isinstance(converted, dict):
+        assert isinstance(golden, dict), pointer
+        for key, value in converted.items():
+            assert key in golden, f"{pointer}/{key} missing from the golden file"
+            _assert_subset(value, golden[key], f"{pointer}/{key}")
+    elif isinstance(converted, list):
+        assert isinstance(golden, list) and len(converted) == len(golden), pointer
+        for i, (item, golden_item) in enumerate(zip(converted, golden)):
+            _assert_subset(item, golden_item, f"{pointer}/{i}")
+    else:
+        assert converted == golden, pointer
+
+
+def test_swagger_2_0_matches_golden_file():
+    converted, notes = convert_swagger2(_load("swagger_2_0.yaml"))
+    golden = _load("corrected-swagger_2_0.yaml")
+
+    # The golden description was rewritten by the LLM; the structure must match as-is
+    converted["info"].pop("description")
+    _assert_subset(converted, golden)
+    assert converted["openapi"] == "3.1.0"
+    assert notes[0].startswith("- Upgraded Swagger 2.0")
+
+
+def _swagger(definitions: dict, parameters: list = None) -> dict:
+    operation = {"responses": {"200": {"description": "OK"}}}
+    if parameters:
+        operation["parameters"] = parameters
+    return {"swagger": "2.0", "info": {"title": "t", "version": "1"}, "paths": {"/a": {"get": operation}},
+            "definitions": definitions}
+
+
+def test_boolean_exclusive_bounds_become_numeric():
+    converted, _ = convert_swagger2(_swagger(
+        {"Range": {"type": "integer", "minimum": 1, "exclusiveMinimum": True,
+                   "maximum": 10, "exclusiveMaximum": False}},
+        [{"name": "n", "in": "query", "type": "number", "maximum": 5, "exclusiveMaximum": True}]))
+
+    assert converted["components"]["schemas"]["Range"] == {"type": "integer", "exclusiveMinimum": 1, "maximum": 10}
+    assert converted["paths"]["/a"]["get"]["parameters"][0]["schema"] == {"type": "number", "exclusiveMaximum": 5}
+
+
+def test_discriminator_becomes_object():
+    converted, _ = convert_swagger2(_swagger(
+        {"Pet": {"type": "object", "discriminator": "petType",
+                 "properties": {"petType": {"type": "string"}}}}))
+
+    assert converted["components"]["schemas"]["Pet"]["discriminator"] == {"propertyName": "petType"}
+
+
+def test_examples_and_property_names_are_left_alone():
+    definitions = {"Doc": {
+        "type": "object",
+        "properties": {
+            # A property literally called 'discriminator', and one called 'type'
+            "discriminator": {"type": "string"},
+            "type": {"type": "string", "example": "file"},
+            "link": {"type": "object", "example": {"$ref": "#/definitions/Doc", "exclusiveMaximum": True}},
+        },
+        "example": {"discriminator": "kind", "type": "file"},
+    }}
+    converted, _ = convert_swagger2(_swagger(definitions))
+    doc = converted["components"]["schemas"]["Doc"]
+
+    assert doc["example"] == {"discriminator": "kind", "type": "file"}
+    assert doc["properties"]["discriminator"] == {"type": "string"}
+    assert doc["properties"]["type"] == {"type": "string", "example": "file"}
+    assert doc["properties"]["link"]["example"] == {"$ref": "#/definitions/Doc", "exclusiveMaximum": True}
+
+
+def test_iter_schemas_skips_data():
+    schema = {"type": "object", "properties": {"items": {"type": "string"}},
+              "items": [{"type": "integer"}], "default": {"type": "not a schema"}}
+
+    pointers = sorted(pointer for pointer, _ in iter_schemas(schema))
+    assert pointers == ["", "/items/0", "/properties/items"]
+
+
+def test_upgrade_exclusive_bounds_without_bound_drops_flag():
+    schema = {"type": "number", "exclusiveMinimum": True}
+    assert upgrade_exclusive_bounds(schema)
+    assert schema == {"type": "number"}
+    assert not upgrade_exclusive_bounds({"exclusiveMinimum": 3})
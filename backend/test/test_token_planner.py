@@ -0,0 +1,30 @@
+import json
+from types import SimpleNamespace
+
+from api.services import token_planner
+from api.services.token_planner import TokenPlan, UsageRecorder, count_tokens, token_count_method
+
+PLAN = TokenPlan("claude-3-5-sonnet-20241022", 1024, 100, 200, True)
+USAGE = SimpleNamespace(input_tokens=90, output_tokens=180)
+
+
+def test_count_falls_back_to_characters_without_tokenizer(monkeypatch):
+    monkeypatch.setattr(token_planner, "_tokenizer", lambda: None)
+
+    assert count_tokens("x" * 400) == 100
+    assert token_count_method() == "characters / 4 (approximate)"
+
+
+def test_usage_log_is_written_off_thread_and_rotated(tmp_path):
+    log_path = tmp_path / "usage.jsonl"
+    recorder = UsageRecorder(str(log_path), max_bytes=2000, backup_count=2)
+    for _ in range(40):
+        recorder.record("corrections", PLAN, USAGE, "end_turn")
+    recorder.close()
+
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert files == ["usage.jsonl", "usage.jsonl.1", "usage.jsonl.2"]
+    assert all(path.stat().st_size <= 2000 for path in tmp_path.iterdir())
+    record = json.loads(log_path.read_text(encoding="utf-8").splitlines()[-1])
+    assert record["output_tokens"] == 180
+    assert recorder.get_stats()["requests"] == 40
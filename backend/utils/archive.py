@@ -0,0 +1,91 @@
+"""
+Helpers for batch uploads: expand zip/tar archives into (name, bytes) spec
+entries and build a zip of corrected specs.
+"""
+import io
+import logging
+import posixpath
+import tarfile
+import zipfile
+from typing import List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SPEC_EXTENSIONS = ('.yaml', '.yml', '.json')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+# A tar stream has no index: every member is read (and inflated) on the way to the specs.
+# Stop once the members passed over exceed this multiple of the byte limit.
+TAR_SCAN_FACTOR = 4
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _is_spec_member(name: str) -> bool:
+    base = posixpath.basename(name)
+    return name.lower().endswith(SPEC_EXTENSIONS) and not base.startswith('.') and '__MACOSX' not in name
+
+
+def extract_specs(filename: str, content: bytes, max_total_bytes: int, max_files: int) -> List[Tuple[str, bytes]]:
+    """
+    Return (member name, bytes) for every YAML/JSON file in a zip or tar archive.
+    Declared sizes are checked before reading so archive bombs are rejected cheaply;
+    tar archives are read as a single forward stream. Raises ValueError when the
+    archive is invalid or exceeds the limits.
+    """
+    entries: List[Tuple[str, bytes]] = []
+    total = 0
+
+    def _admit(name: str, size: int):
+        nonlocal total
+        total += size
+        if total > max_total_bytes:
+            raise ValueError(f"Archive contents exceed {max_total_bytes} bytes")
+        if len(entries) >= max_files:
+            raise ValueError(f"Archive contains more than {max_files} spec files")
+
+    try:
+        if filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not _is_spec_member(info.filename):
+                        continue
+                    _admit(info.filename, info.file_size)
+                    entries.append((info.filename, archive.read(info)))
+        else:
+            # Streaming mode reads each member once instead of listing them all and seeking back
+            scan_limit = max_total_bytes * TAR_SCAN_FACTOR
+            with tarfile.open(fileobj=io.BytesIO(content), mode='r|*') as archive:
+                for member in archive:
+                    if member.offset_data + member.size > scan_limit:
+                        raise ValueError(f"Archive is larger than {scan_limit} bytes uncompressed")
+                    if not member.isfile() or not _is_spec_member(member.name):
+                        continue
+                    _admit(member.name, member.size)
+                    entries.append((member.name, archive.extractfile(member).read()))
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ValueError(f"Could not read archive {filename}: {e}")
+
+    logger.info(f"Extracted {len(entries)} spec file(s) from {filename}")
+    return entries
+
+
+def unique_name(name: str, used: Set[str]) -> str:
+    """name, or 'stem (2).ext', 'stem (3).ext', ... when it is already in used; the result is added to used"""
+    candidate, counter = name, 2
+    stem, extension = posixpath.splitext(name)
+    while candidate in used:
+        candidate = f"{stem} ({counter}){extension}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def build_zip(files: List[Tuple[str, str]]) -> bytes:
+    """Zip (name, text) pairs in memory"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, text in files:
+            archive.writestr(name, text)
+    return buffer.getvalue()
@@ -0,0 +1,350 @@
+"""
+Deterministic rule-based fixer for the structural OpenAPI 3.1 checklist.
+Each rule patches the parsed document in place and reports what it did, so
+specs that only miss boilerplate can be corrected without an LLM call.
+"""
+import copy
+import logging
+from typing import Any, Callable, Iterator, List, Tuple
+from utils.swagger_converter import HTTP_METHODS, iter_schemas, upgrade_exclusive_bounds
+
+logger = logging.getLogger(__name__)
+
+# Values that are user data (payloads, defaults, extensions), never spec objects to patch or check
+DATA_KEYS = ('example', 'default', 'enum', 'const')
+
+# A rule receives the document and a FixReport and patches the document in place
+Rule = Callable[[dict, "FixReport"], None]
+
+RULES: List[Tuple[str, Rule]] = []
+
+
+def register_rule(name: str):
+    """Decorator adding a rule to the default rule chain (rules run in registration order)"""
+    def decorator(func: Rule) -> Rule:
+        RULES.append((name, func))
+        return func
+    return decorator
+
+
+class FixReport:
+    """Collects applied fixes and issues that need more than a local fix"""
+
+    def __init__(self):
+        self.fixes: List[dict] = []
+        self.unresolved: List[dict] = []
+        self.rule = ""
+
+    def fixed(self, path: str, message: str):
+        self.fixes.append({"rule": self.rule, "path": path, "message": message})
+
+    def unresolvable(self, path: str, message: str):
+        self.unresolved.append({"rule": self.rule, "path": path, "message": message})
+
+    def as_suggestions(self) -> List[str]:
+        """Bullet lines in the same format as the LLM suggestions"""
+        lines = [f"- {fix['message']} ({fix['path']})" for fix in self.fixes]
+        lines += [f"- NEEDS REVIEW: {issue['message']} ({issue['path']})" for issue in self.unresolved]
+        return lines
+
+
+def iter_operations(document: dict) -> Iterator[Tuple[str, str, dict]]:
+    """Yield (path, method, operation) for every operation in the document"""
+    paths = document.get('paths')
+    if not isinstance(paths, dict):
+        return
+    for path, path_item in paths.items():
+        if not isinstance(path_item, dict):
+            continue
+        for method, operation in path_item.items():
+            if method in HTTP_METHODS and isinstance(operation, dict):
+                yield path, method, operation
+
+
+def _escape(token: Any) -> str:
+    """Escape a JSON pointer token"""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _walk(document: Any) -> Iterator[Tuple[str, dict]]:
+    """
+    Iteratively yield (json pointer, dict) for every mapping in the document,
+    without entering example payloads, defaults, enums or x- extensions
+    """
+    stack = [("", document, False)]
+    while stack:
+        pointer, node, is_example = stack.pop()
+        if isinstance(node, dict):
+            yield pointer, node
+            for key, value in node.items():
+                if key in DATA_KEYS or str(key).startswith('x-') or (is_example and key == 'value'):
+                    continue
+                if key == 'examples' and isinstance(value, dict):
+                    # Example Objects by name: only their $ref is spec, their value is a payload
+                    stack.extend((f"{pointer}/examples/{_escape(name)}", example, True)
+                                 for name, example in value.items())
+                elif key != 'examples':  # A 3.1 schema's examples list is payloads too
+                    stack.append((f"{pointer}/{_escape(key)}", value, False))
+        elif isinstance(node, list):
+            stack.extend((f"{pointer}/{i}", v, False) for i, v in enumerate(node))
+
+
+def _content_schemas(pointer: str, holder: Any) -> Iterator[Tuple[str, Any]]:
+    """Schemas of a parameter, header, request body or response: its schema and its media types' schemas"""
+    if not isinstance(holder, dict):
+        return
+    if 'schema' in holder:
+        yield f"{pointer}/schema", holder['schema']
+    content = holder.get('content')
+    if isinstance(content, dict):
+        for media_type, media in content.items():
+            if isinstance(media, dict) and 'schema' in media:
+                yield f"{pointer}/content/{_escape(media_type)}/schema", media['schema']
+    headers = holder.get('headers')
+    if isinstance(headers, dict):
+        for name, header in headers.items():
+            yield from _content_schemas(f"{pointer}/headers/{_escape(name)}", header)
+
+
+def _named(pointer: str, container: Any) -> Iterator[Tuple[str, Any]]:
+    if isinstance(container, dict):
+        for name, item in container.items():
+            yield f"{pointer}/{_escape(name)}", item
+
+
+def _listed(pointer: str, container: Any) -> Iterator[Tuple[str, Any]]:
+    if isinstance(container, list):
+        for i, item in enumerate(container):
+            yield f"{pointer}/{i}", item
+
+
+def iter_schema_roots(document: dict) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (json pointer, schema) for every top-level Schema Object in the document:
+    components/schemas plus the schema positions of parameters, headers,
+    request bodies and responses (in components and in operations)
+    """
+    components = document.get('components')
+    if isinstance(components, dict):
+        yield from _named("/components/schemas", components.get('schemas'))
+        for section in ('parameters', 'headers', 'requestBodies', 'responses'):
+            for pointer, holder in _named(f"/components/{section}", components.get(section)):
+                yield from _content_schemas(pointer, holder)
+    for section in ('paths', 'webhooks'):
+        path_items = document.get(section)
+        if not isinstance(path_items, dict):
+            continue
+        for path, path_item in path_items.items():
+            if not isinstance(path_item, dict):
+                continue
+            item_pointer = f"/{section}/{_escape(path)}"
+            for pointer, parameter in _listed(f"{item_pointer}/parameters", path_item.get('parameters')):
+                yield from _content_schemas(pointer, parameter)
+            for method, operation in path_item.items():
+                if method not in HTTP_METHODS or not isinstance(operation, dict):
+                    continue
+                operation_pointer = f"{item_pointer}/{method}"
+                for pointer, parameter in _listed(f"{operation_pointer}/parameters", operation.get('parameters')):
+                    yield from _content_schemas(pointer, parameter)
+                yield from _content_schemas(f"{operation_pointer}/requestBody", operation.get('requestBody'))
+                for pointer, response in _named(f"{operation_pointer}/responses", operation.get('responses')):
+                    yield from _content_schemas(pointer, response)
+
+
+def iter_document_schemas(document: dict) -> Iterator[Tuple[str, dict]]:
+    """Yield (json pointer, schema) for every Schema Object in the document and its subschemas"""
+    for pointer, schema in iter_schema_roots(document):
+        yield from iter_schemas(schema, pointer)
+
+
+# Annotations kept on the outer schema when a typeless nullable schema is wrapped in anyOf
+NULLABLE_WRAPPER_KEYWORDS = ('title', 'description', 'default', 'example', 'deprecated', 'readOnly', 'writeOnly')
+
+
+def _allow_null(schema: dict) -> str:
+    """
+    Make a 3.0 'nullable: true' schema accept null the 3.1 way, in place.
+    Returns how, for the fix report.
+    """
+    schema_type = schema.get('type')
+    if isinstance(schema_type, str):
+        if schema_type != 'null':
+            schema['type'] = [schema_type, 'null']
+        return "a 3.1 type array"
+    if isinstance(schema_type, list):
+        if 'null' not in schema_type:
+            schema_type.append('null')
+        return "a 3.1 type array"
+    # $ref, allOf/oneOf/anyOf or no type at all: null becomes an alternative to the whole schema
+    outer = {key: schema.pop(key) for key in NULLABLE_WRAPPER_KEYWORDS if key in schema}
+    inner = dict(schema)
+    schema.clear()
+    schema.update(outer)
+    schema['anyOf'] = [inner, {'type': 'null'}]
+    return "anyOf [schema, {type: 'null'}]"
+
+
+@register_rule("openapi_version")
+def fix_openapi_version(document: dict, report: FixReport):
+    version = str(document.get('openapi', ''))
+    if version.startswith('3.1.'):
+        return
+    document['openapi'] = '3.1.0'
+    report.fixed("/openapi", f"Set openapi version to 3.1.0 (was '{version or 'missing'}')")
+
+    # Schema keywords that changed meaning in 3.1 (JSON Schema 2020-12) - only in schema objects,
+    # never in property names or example payloads
+    for pointer, schema in iter_document_schemas(document):
+        if version.startswith('3.0') and 'nullable' in schema:
+            # 'nullable' was removed in 3.1 in favour of type arrays
+            if schema.pop('nullable') is True:
+                report.fixed(f"{pointer}/nullable", f"Replaced 3.0 'nullable' with {_allow_null(schema)}")
+            else:
+                report.fixed(f"{pointer}/nullable", "Removed 3.0 'nullable: false' (the default)")
+        if upgrade_exclusive_bounds(schema):
+            report.fixed(pointer, "Replaced boolean exclusiveMinimum/exclusiveMaximum with 3.1 numeric bounds")
+
+
+@register_rule("info")
+def fix_info(document: dict, report: FixReport):
+    info = document.get('info')
+    if not isinstance(info, dict):
+        info = {}
+        document['info'] = info
+        report.fixed("/info", "Added missing info section")
+
+    if not info.get('title'):
+        info['title'] = 'API'
+        report.fixed("/info/title", "Added placeholder info.title")
+    if info.get('version') is None or info.get('version') == '':
+        info['version'] = '1.0.0'
+        report.fixed("/info/version", "Added info.version 1.0.0")
+    elif not isinstance(info['version'], str):
+        info['version'] = str(info['version'])
+        report.fixed("/info/version", "Quoted info.version as a string")
+    if not info.get('description'):
+        info['description'] = f"{info['title']} specification"
+        report.fixed("/info/description", "Added info.description")
+
+
+@register_rule("servers")
+def fix_servers(document: dict, report: FixReport):
+    servers = document.get('servers')
+    if not isinstance(servers, list) or not servers:
+        document['servers'] = [{'url': '/'}]
+        report.fixed("/servers", "Added a default server (relative to the API host)")
+
+
+@register_rule("paths")
+def fix_paths(document: dict, report: FixReport):
+    if not isinstance(document.get('paths'), dict):
+        document['paths'] = {}
+        report.fixed("/paths", "Added empty paths object")
+
+
+@register_rule("responses")
+def fix_responses(document: dict, report: FixReport):
+    for path, method, operation in iter_operations(document):
+        pointer = f"/paths/{_escape(path)}/{method}"
+        responses = operation.get('responses')
+        if not isinstance(responses, dict) or not responses:
+            operation['responses'] = {'default': {'description': 'Default response'}}
+            report.fixed(f"{pointer}/responses", "Added a default response")
+            continue
+        for code in list(responses):
+            response = responses.pop(code)
+            key = str(code)
+            if key != code:
+                report.fixed(f"{pointer}/responses/{key}", f"Quoted response code {key} as a string")
+            if isinstance(response, dict) and '$ref' not in response and not response.get('description'):
+                response['description'] = f"{key} response"
+                report.fixed(f"{pointer}/responses/{key}/description", f"Added description for response {key}")
+            responses[key] = response
+
+
+@register_rule("empty_schemas")
+def fix_empty_schemas(document: dict, report: FixReport):
+    for pointer, node in list(iter_document_schemas(document)):
+        properties = node.get('properties')
+        if not isinstance(properties, dict):
+            continue
+        for name, schema in properties.items():
+            if schema is None:
+                properties[name] = {}
+                report.fixed(f"{pointer}/properties/{_escape(name)}",
+                             f"Property '{name}' had no schema; set it to an unconstrained schema")
+
+
+@register_rule("components")
+def fix_components(document: dict, report: FixReport):
+    components = document.get('components')
+    if not isinstance(components, dict):
+        components = {}
+        document['components'] = components
+        report.fixed("/components", "Added components section")
+    for section in ('schemas', 'securitySchemes'):
+        if not isinstance(components.get(section), dict):
+            components[section] = {}
+            report.fixed(f"/components/{section}", f"Added empty components.{section}")
+
+
+@register_rule("security")
+def fix_security(document: dict, report: FixReport):
+    if not isinstance(document.get('security'), list):
+        # An empty list declares "no global auth" explicitly without inventing a scheme
+        document['security'] = []
+        report.fixed("/security", "Added explicit global security (none)")
+
+
+@register_rule("tags")
+def fix_tags(document: dict, report: FixReport):
+    tags = document.get('tags')
+    if not isinstance(tags, list):
+        tags = []
+        document['tags'] = tags
+        report.fixed("/tags", "Added tags list")
+    declared = {tag.get('name') for tag in tags if isinstance(tag, dict)}
+    for _, _, operation in iter_operations(document):
+        for name in operation.get('tags') or []:
+            if name not in declared:
+                tags.append({'name': name})
+                declared.add(name)
+                report.fixed("/tags", f"Declared tag '{name}' used by operations")
+
+
+@register_rule("dangling_refs")
+def check_dangling_refs(document: dict, report: FixReport):
+    for pointer, node in _walk(document):
+        ref = node.get('$ref')
+        if not isinstance(ref, str) or not ref.startswith('#/'):
+            continue
+        target: Any = document
+        for token in ref[2:].split('/'):
+            token = token.replace('~1', '/').replace('~0', '~')
+            if not isinstance(target, dict) or token not in target:
+                report.unresolvable(pointer, f"$ref '{ref}' does not resolve")
+                break
+            target = target[token]
+
+
+def looks_like_openapi(document: Any) -> bool:
+    """Only documents that are recognisably API specs are safe to patch blindly"""
+    return isinstance(document, dict) and any(k in document for k in ('openapi', 'swagger', 'paths'))
+
+
+def autofix(document: dict, rules: List[Tuple[str, Rule]] = None) -> Tuple[dict, FixReport]:
+    """
+    Run the rule chain on a copy of the document.
+    Returns (fixed document, report of fixes and unresolved issues).
+    """
+    fixed = copy.deepcopy(document)
+    report = FixReport()
+    for name, rule in (rules if rules is not None else RULES):
+        report.rule = name
+        try:
+            rule(fixed, report)
+        except Exception as e:
+            logger.error(f"Autofix rule '{name}' failed: {e}")
+            report.unresolvable("/", f"Rule '{name}' could not be applied: {e}")
+    logger.info(f"Autofix applied {len(report.fixes)} fix(es), {len(report.unresolved)} unresolved")
+    return fixed, report
@@ -0,0 +1,174 @@
+"""
+RFC 6902 JSON Patch for parsed specs.
+
+Operations are applied one at a time to a copy of the document; an operation
+that fails (bad pointer, failed test) is rejected and reported instead of
+aborting the whole patch, so one bad suggestion from the model does not
+discard the rest. A rejected operation leaves the document unchanged.
+Dict keys parsed from YAML may be integers (status codes), so numeric
+pointer tokens also match integer keys.
+"""
+import copy
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PATCH_OPS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class PatchError(ValueError):
+    """An operation that cannot be applied"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _key(container: dict, token: str):
+    """Dict key for a pointer token, matching integer keys such as response codes"""
+    if token not in container and token.lstrip('-').isdigit() and int(token) in container:
+        return int(token)
+    return token
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(document: Any, tokens: List[str]) -> Any:
+    node = document
+    for token in tokens:
+        if isinstance(node, dict):
+            key = _key(node, token)
+            if key not in node:
+                raise PatchError(f"Path not found at '{token}'")
+            node = node[key]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise PatchError(f"Cannot descend into a scalar at '{token}'")
+    return node
+
+
+def resolve_pointer(document: Any, pointer: str) -> Any:
+    """Value at a JSON pointer ('' is the whole document). Raises PatchError when it does not exist."""
+    return _resolve(document, parse_pointer(pointer))
+
+
+def _add(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, dict):
+        parent[_key(parent, last)] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, last, allow_end=True), value)
+    else:
+        raise PatchError("Parent of the target is not an object or array")
+    return document
+
+
+def _remove(document: Any, tokens: List[str]) -> Tuple[Any, Any]:
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    parent = _resolve(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, dict):
+        key = _key(parent, last)
+        if key not in parent:
+            raise PatchError(f"Path not found at '{last}'")
+        return document, parent.pop(key)
+    if isinstance(parent, list):
+        return document, parent.pop(_index(parent, last))
+    raise PatchError("Parent of the target is not an object or array")
+
+
+def apply_operation(document: Any, operation: Dict[str, Any]) -> Any:
+    """Apply one operation in place (the root may be replaced, so use the return value)"""
+    op = operation.get('op')
+    if op not in PATCH_OPS:
+        raise PatchError(f"Unknown op: {op!r}")
+    tokens = parse_pointer(operation.get('path'))
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise PatchError(f"'{op}' requires a value")
+
+    if op == 'add':
+        return _add(document, tokens, copy.deepcopy(operation['value']))
+    if op == 'remove':
+        return _remove(document, tokens)[0]
+    if op == 'replace':
+        _resolve(document, tokens)  # Target must exist
+        if not tokens:
+            return copy.deepcopy(operation['value'])
+        parent = _resolve(document, tokens[:-1])
+        if isinstance(parent, dict):
+            parent[_key(parent, tokens[-1])] = copy.deepcopy(operation['value'])
+        else:
+            parent[_index(parent, tokens[-1])] = copy.deepcopy(operation['value'])
+        return document
+    if op == 'test':
+        if _resolve(document, tokens) != operation['value']:
+            raise PatchError("Test failed")
+        return document
+
+    source = parse_pointer(operation.get('from'))
+    if op == 'move':
+        if tokens[:len(source)] == source and tokens != source:
+            raise PatchError("Cannot move a value into one of its children")
+        _resolve(document, source)
+        _resolve(document, tokens[:-1])  # Check both ends before changing anything
+        # The target can still turn out invalid once the source is gone (e.g. an index past the
+        # end of the same array), so remember where the value was and put it back on failure
+        parent = _resolve(document, source[:-1]) if source else None
+        order = list(parent) if isinstance(parent, dict) else None
+        document, value = _remove(document, source)
+        try:
+            return _add(document, tokens, value)
+        except Exception:
+            _restore(parent, source[-1], value, order)
+            raise
+    return _add(document, tokens, copy.deepcopy(_resolve(document, source)))  # copy
+
+
+def _restore(parent: Any, token: str, value: Any, order: Optional[List[Any]]):
+    """Undo _remove: reinsert value at its array index, or under its key in the original key order"""
+    if isinstance(parent, list):
+        parent.insert(int(token), value)
+        return
+    parent[next(key for key in order if key not in parent)] = value
+    for key in order:
+        parent[key] = parent.pop(key)
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Tuple[Any, List[dict], List[dict]]:
+    """
+    Apply operations to a deep copy of document.
+    Returns (patched document, applied operations, rejected operations with 'error').
+    """
+    patched = copy.deepcopy(document)
+    applied, rejected = [], []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            rejected.append({"operation": operation, "error": "Operation is not an object"})
+            continue
+        try:
+            patched = apply_operation(patched, operation)
+            applied.append(operation)
+        except (PatchError, IndexError, KeyError, TypeError) as e:
+            rejected.append({**operation, "error": str(e)})
+    if rejected:
+        logger.warning(f"Rejected {len(rejected)} of {len(operations)} patch operation(s)")
+    return patched, applied, rejected
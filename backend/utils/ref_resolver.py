@@ -0,0 +1,376 @@
+"""
+$ref resolution for specs split across several files.
+
+A RefResolver works on a set of files (from an archive or several uploads)
+keyed by their relative path. Each file is parsed at most once, and every
+(file, JSON pointer) target is resolved once and memoized. The root file can
+then be:
+
+- bundled: external targets used as schemas, parameters, responses etc.
+  become components (definitions/parameters/responses for Swagger 2.0) and
+  every use a local $ref; anything else, such as a path item, is inlined
+  where it is first used. The result is one flat document that still uses
+  $refs (the form validators and Claude handle best);
+- dereferenced: every $ref is replaced by its target. Targets are shared
+  rather than copied, so repeated references cost no extra memory.
+
+A reference that leads back into a target that is still being expanded is
+circular; it is kept as a local $ref instead of being unrolled forever.
+Remote (http) refs and refs that cannot be resolved are left as they are and
+reported.
+"""
+import logging
+import posixpath
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from utils.json_patch import parse_pointer, resolve_pointer
+from utils.schema_validation import validate_document
+from utils.validators import ParsedSpec, parse_spec, validate_file
+from utils.yaml_loader import dump_yaml
+
+logger = logging.getLogger(__name__)
+
+REMOTE_REF = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://')
+MAX_REF_HOPS = 50  # $refs followed while walking a single pointer
+
+# Where a bundled target goes, by the kind of position it is referenced from
+SCHEMA_KEYWORDS = ('schema', 'items', 'additionalProperties', 'not', 'contains', 'propertyNames', 'if', 'then', 'else')
+SCHEMA_CONTAINERS = ('properties', 'patternProperties', '$defs', 'definitions', 'allOf', 'anyOf', 'oneOf', 'prefixItems')
+COMPONENT_CONTAINERS = {
+    'parameters': 'parameters', 'responses': 'responses', 'headers': 'headers', 'examples': 'examples',
+    'links': 'links', 'callbacks': 'callbacks', 'securitySchemes': 'securitySchemes'
+}
+SWAGGER2_SECTIONS = {'schemas': 'definitions', 'parameters': 'parameters', 'responses': 'responses'}
+
+Target = Tuple[str, str]  # (file path, JSON pointer)
+
+
+def normalize_path(path: str) -> str:
+    """Relative POSIX path for a file in a bundle"""
+    path = posixpath.normpath(path.replace('\\', '/')).lstrip('/')
+    return '' if path == '.' else path
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _component_kind(tokens: List[str]) -> Optional[str]:
+    """Component section for the value at a location (given as pointer tokens), if it has one"""
+    if len(tokens) < 2:
+        return None
+    last, parent = tokens[-1], tokens[-2]
+    if parent in SCHEMA_CONTAINERS or last in SCHEMA_KEYWORDS:
+        return 'schemas'
+    if last == 'requestBody':
+        return 'requestBodies'
+    return COMPONENT_CONTAINERS.get(parent)
+
+
+class RefResolver:
+    def __init__(self, files: Dict[str, bytes]):
+        self.files = {normalize_path(name): content for name, content in files.items()}
+        self.unresolved: List[dict] = []
+        self.circular: List[str] = []
+        self._parsed: Dict[str, ParsedSpec] = {}
+        self._targets: Dict[Target, Tuple[str, Any]] = {}
+
+    def parse(self, path: str) -> ParsedSpec:
+        """Parse a file of the bundle, once"""
+        if path not in self._parsed:
+            if path not in self.files:
+                raise KeyError(path)
+            self._parsed[path] = parse_spec(self.files[path])
+        return self._parsed[path]
+
+    def find_root(self) -> str:
+        """
+        The file to start from: the only OpenAPI/Swagger document, or the only
+        one of several that no other file references. Raises ValueError otherwise.
+        """
+        candidates = [path for path in sorted(self.files)
+                      if isinstance(self.parse(path).document, dict)
+                      and ('openapi' in self.parse(path).document or 'swagger' in self.parse(path).document)]
+        if len(candidates) > 1:
+            referenced = {target[0] for path in self.files for target in self._external_targets(path)}
+            candidates = [path for path in candidates if path not in referenced]
+        if len(candidates) != 1:
+            found = ", ".join(candidates) or "none"
+            raise ValueError(f"Could not pick the root spec (candidates: {found}); pass 'root' explicitly")
+        return candidates[0]
+
+    def _external_targets(self, path: str) -> List[Target]:
+        targets, stack = [], [self.parse(path).document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                ref = node.get('$ref')
+                if isinstance(ref, str) and not ref.startswith('#'):
+                    target = self._split_ref(ref, path)
+                    if target and target[0] != path:
+                        targets.append(target)
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+        return targets
+
+    def _split_ref(self, ref: str, base: str) -> Optional[Target]:
+        """(file, pointer) a $ref points at, relative to the file it appears in; None for remote refs"""
+        location, _, fragment = ref.partition('#')
+        if REMOTE_REF.match(location):
+            return None
+        path = normalize_path(posixpath.join(posixpath.dirname(base), unquote(location))) if location else base
+        return path, unquote(fragment)
+
+    def _resolve(self, target: Target) -> Tuple[str, Any]:
+        """
+        (file, raw value) at a target, memoized. A pointer may pass through
+        $refs (e.g. into a path item kept in another file); the file returned
+        is the one the value was found in, which its own relative refs use.
+        Raises KeyError/ValueError when the target does not exist.
+        """
+        if target in self._targets:
+            return self._targets[target]
+        path, pointer = target
+        parsed = self.parse(path)
+        if parsed.error:
+            raise ValueError(parsed.error)
+
+        node, hops = parsed.document, 0
+        for token in parse_pointer(pointer):
+            while isinstance(node, dict) and isinstance(node.get('$ref'), str) and token not in node:
+                through = self._split_ref(node['$ref'], path)
+                hops += 1
+                if through is None or hops > MAX_REF_HOPS:
+                    raise ValueError(f"Cannot follow {node['$ref']} while resolving {pointer}")
+                path, node = self._resolve(through)
+            node = resolve_pointer(node, '/' + _escape(token))
+
+        self._targets[target] = (path, node)
+        return path, node
+
+    def resolve(self, root: str, dereference: bool = False) -> Any:
+        """Bundle (or fully dereference) the root file into a single document"""
+        root = normalize_path(root)
+        parsed = self.parse(root)
+        if parsed.error:
+            raise ValueError(f"{root}: {parsed.error}")
+        self.unresolved, self.circular = [], []
+        return _Expansion(self, root, dereference).build()
+
+    def report(self, root: str, dereference: bool) -> dict:
+        """Summary of the last resolve: files parsed, unresolved and circular refs"""
+        return {
+            "root": normalize_path(root),
+            "refs": "dereference" if dereference else "bundle",
+            "files": sorted(self.files),
+            "files_parsed": sorted(self._parsed),
+            "unresolved_refs": self.unresolved,
+            "circular_refs": sorted(set(self.circular))
+        }
+
+    def duplicate_keys(self) -> List[dict]:
+        """Duplicate keys found while parsing, tagged with their file"""
+        return [{**duplicate, "file": path} for path, parsed in self._parsed.items() for duplicate in parsed.duplicate_keys]
+
+
+class _Expansion:
+    """
+    One bundle/dereference pass over the graph of targets (nodes) and $refs
+    (edges). The graph is walked iteratively, so long chains of references
+    cannot exhaust the stack; recursion only follows nesting inside one file.
+    """
+
+    def __init__(self, resolver: RefResolver, root: str, dereference: bool):
+        self.resolver = resolver
+        self.root = root
+        self.dereference = dereference
+        self.edges: Dict[Target, Dict[str, Tuple[str, Optional[Target]]]] = {}  # relative pointer -> (ref, target)
+        self.placed: Dict[Target, str] = {(root, ""): ""}  # Where each target's expansion sits in the output
+        self.tree_edge: Dict[Target, Tuple[Target, str]] = {}  # The edge each target was first reached through
+        self.back_edges: set = set()
+        self.built: Dict[Target, Any] = {}
+        self.components: Dict[Target, Tuple[Tuple[str, ...], str]] = {}  # Bundled target -> (section path, name)
+        self._names: Dict[Tuple[str, ...], set] = {}
+        self.document = resolver.parse(root).document
+        self.swagger2 = isinstance(self.document, dict) and 'swagger' in self.document
+
+    def _scan(self, target: Target) -> Dict[str, Tuple[str, Optional[Target]]]:
+        """The $refs inside a target's value, keyed by their pointer relative to it, in document order"""
+        path, value = self.resolver._resolve(target)
+        edges, stack = {}, [("", value)]
+        while stack:
+            pointer, node = stack.pop()
+            if isinstance(node, list):
+                stack.extend((f"{pointer}/{index}", item) for index, item in reversed(list(enumerate(node))))
+                continue
+            if not isinstance(node, dict):
+                continue
+            ref = node.get('$ref')
+            if isinstance(ref, str):
+                edges[pointer] = (ref, self._check(ref, path))
+            stack.extend((f"{pointer}/{_escape(key)}", item) for key, item in reversed(list(node.items())) if key != '$ref')
+        return edges
+
+    def _check(self, ref: str, path: str) -> Optional[Target]:
+        """Target of a ref if it resolves, else None (and the ref is reported)"""
+        target = self.resolver._split_ref(ref, path)
+        if target is None:
+            self.resolver.unresolved.append({"ref": ref, "file": path, "error": "Remote references are not fetched"})
+            return None
+        try:
+            self.resolver._resolve(target)
+        except KeyError as e:
+            self.resolver.unresolved.append({"ref": ref, "file": path, "error": f"File not found: {e.args[0]}"})
+            return None
+        except ValueError as e:
+            self.resolver.unresolved.append({"ref": ref, "file": path, "error": str(e)})
+            return None
+        return target
+
+    def _expands(self, target: Target) -> bool:
+        # A bundle keeps refs into the root file as they are
+        return self.dereference or target[0] != self.root
+
+    def _traverse(self) -> List[Target]:
+        """Depth-first over the targets; records placements and back (circular) edges. Returns post-order."""
+        root = (self.root, "")
+        state = {root: "active"}
+        order = []
+        self.edges[root] = self._scan(root)
+        stack = [(root, iter(self.edges[root].items()))]
+        while stack:
+            current, pending = stack[-1]
+            for pointer, (ref, target) in pending:
+                if target is None or not self._expands(target):
+                    continue
+                if target not in state:
+                    self.placed[target] = self._place(target, self.placed[current] + pointer)
+                    self.tree_edge[target] = (current, pointer)
+                    state[target] = "active"
+                    self.edges[target] = self._scan(target)
+                    stack.append((target, iter(self.edges[target].items())))
+                    break
+                if state[target] == "active":
+                    self.back_edges.add((current, pointer))
+                    self.resolver.circular.append(ref)
+            else:
+                state[current] = "done"
+                order.append(current)
+                stack.pop()
+        return order
+
+    def _place(self, target: Target, used_at: str) -> str:
+        """
+        Pointer in the output where a target's expansion goes: its own location
+        for root targets, a new component in a bundle, else where first used.
+        """
+        if target[0] == self.root:
+            return target[1]
+        if self.dereference:
+            return used_at
+        tokens = parse_pointer(used_at)
+        section = self._section(_component_kind(tokens))
+        if section is None or tokens[:-1] == list(section):
+            return used_at  # No component section, or already the definition of one
+
+        taken = self._names.get(section)
+        if taken is None:
+            existing = self.document
+            for key in section:
+                existing = existing.get(key, {})
+                if not isinstance(existing, dict):
+                    return used_at  # Malformed section in the root - leave the target inline
+            taken = self._names[section] = set(existing)
+        base = re.sub(r'[^A-Za-z0-9._-]', '_', parse_pointer(target[1])[-1] if target[1]
+                      else posixpath.splitext(posixpath.basename(target[0]))[0]) or "Component"
+        name, index = base, 2
+        while name in taken:
+            name, index = f"{base}{index}", index + 1
+        taken.add(name)
+        self.components[target] = (section, name)
+        return "/" + "/".join(_escape(key) for key in section + (name,))
+
+    def _section(self, kind: Optional[str]) -> Optional[Tuple[str, ...]]:
+        if kind is None or not isinstance(self.document, dict):
+            return None
+        if self.swagger2:
+            return (SWAGGER2_SECTIONS[kind],) if kind in SWAGGER2_SECTIONS else None
+        return ('components', kind)
+
+    def build(self) -> Any:
+        for target in self._traverse():
+            path, value = self.resolver._resolve(target)
+            self.built[target] = self._copy(target, value, "")
+
+        document = self.built[(self.root, "")]
+        for target, (section, name) in self.components.items():
+            container = document
+            for key in section:
+                container = container.setdefault(key, {})
+            container[name] = self.built[target]
+        return document
+
+    def _copy(self, owner: Target, node: Any, pointer: str) -> Any:
+        if isinstance(node, list):
+            return [self._copy(owner, item, f"{pointer}/{index}") for index, item in enumerate(node)]
+        if not isinstance(node, dict):
+            return node
+        siblings = {key: self._copy(owner, value, f"{pointer}/{_escape(key)}") for key, value in node.items() if key != '$ref'}
+        if not isinstance(node.get('$ref'), str):
+            return siblings
+
+        ref, target = self.edges[owner][pointer]
+        if target is None:
+            return {'$ref': ref, **siblings}
+        if not self._expands(target):
+            return {'$ref': f"#{target[1]}", **siblings}
+        inline = (owner, pointer) not in self.back_edges and (
+            self.dereference or (target not in self.components and self.tree_edge[target] == (owner, pointer)))
+        if not inline:
+            return {'$ref': f"#{self.placed[target]}", **siblings}
+        expanded = self.built[target]
+        if isinstance(expanded, dict) and siblings:
+            return {**expanded, **siblings}
+        return expanded
+
+
+def resolve_bundle(files: Dict[str, bytes], root: Optional[str] = None,
+                   dereference: bool = False) -> Tuple[ParsedSpec, dict]:
+    """
+    Resolve a multi-file spec into one ParsedSpec plus a report of the files
+    and refs involved. Raises ValueError when no root can be found or parsed.
+    """
+    resolver = RefResolver(files)
+    if root is not None and normalize_path(root) not in resolver.files:
+        raise ValueError(f"Root file '{root}' is not in the bundle")
+    root = root or resolver.find_root()
+    document = resolver.resolve(root, dereference)
+    report = resolver.report(root, dereference)
+    if report["unresolved_refs"]:
+        logger.warning(f"{len(report['unresolved_refs'])} unresolved $ref(s) in bundle rooted at {root}")
+
+    try:
+        text = dump_yaml(document)
+    except RecursionError:
+        raise ValueError("Resolved spec is nested too deeply to serialize; use refs=bundle instead of dereference")
+    parsed = ParsedSpec(text=text, file_type='yaml', document=document, duplicate_keys=resolver.duplicate_keys())
+    return parsed, report
+
+
+def parse_bundle_and_validate(files: Dict[str, bytes], root: Optional[str] = None,
+                              dereference: bool = False) -> Tuple[ParsedSpec, bool, dict, dict]:
+    """
+    resolve_bundle, then basic and schema validation of the result.
+    Returns (parsed spec, validation passed, schema report, bundle report).
+    Top-level so it can be shipped to a process pool.
+    """
+    parsed, bundle_report = resolve_bundle(files, root, dereference)
+    start = time.perf_counter()
+    report = validate_document(parsed.document)
+    is_valid = validate_file(parsed) and report["valid"]
+    parsed.timings["validate"] = time.perf_counter() - start
+    return parsed, is_valid, report, bundle_report
@@ -0,0 +1,78 @@
+"""
+Incremental parser for streamed Claude responses in the
+'## SUGGESTIONS:' / '## CORRECTED SPEC:' format.
+Turns raw text deltas into suggestion and spec-chunk events as soon as
+each piece is complete.
+"""
+from typing import List, Tuple
+
+SUGGESTIONS_HEADER = "## SUGGESTIONS:"
+CORRECTED_SPEC_HEADER = "## CORRECTED SPEC:"
+BULLET_PREFIXES = ("- ", "* ", "• ")
+
+
+class CorrectionStreamParser:
+    """
+    Feed text deltas in; get back (event, payload) tuples:
+      ('suggestion', str)  - one complete suggestion bullet
+      ('spec_chunk', str)  - lines of the corrected spec
+    """
+
+    def __init__(self):
+        self.state = "preamble"  # preamble -> suggestions -> spec_wait -> spec -> done
+        self._buffer = ""
+        self._bullet: List[str] = []
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        self._buffer += delta
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()  # Last piece is an incomplete line
+        return self._process(lines)
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush whatever is left once the stream ends"""
+        lines = [self._buffer] if self._buffer else []
+        self._buffer = ""
+        events = self._process(lines)
+        events += self._flush_bullet()
+        return events
+
+    def _flush_bullet(self) -> List[Tuple[str, str]]:
+        if not self._bullet:
+            return []
+        text = "\n".join(self._bullet).strip()
+        self._bullet = []
+        return [("suggestion", text)] if text else []
+
+    def _process(self, lines: List[str]) -> List[Tuple[str, str]]:
+        events: List[Tuple[str, str]] = []
+        spec_lines: List[str] = []
+        for line in lines:
+            stripped = line.strip()
+            if self.state == "preamble":
+                if stripped.startswith(SUGGESTIONS_HEADER):
+                    self.state = "suggestions"
+            elif self.state == "suggestions":
+                if stripped.startswith(CORRECTED_SPEC_HEADER):
+                    events += self._flush_bullet()
+                    self.state = "spec_wait"
+                elif stripped.startswith(BULLET_PREFIXES) or (stripped[:1].isdigit() and ". " in stripped[:4]):
+                    events += self._flush_bullet()
+                    self._bullet = [stripped]
+                elif stripped:
+                    self._bullet.append(stripped)
+            elif self.state == "spec_wait":
+                if stripped.startswith("```"):
+                    self.state = "spec"
+                elif stripped:
+                    # Model skipped the code fence - the spec starts here
+                    self.state = "spec"
+                    spec_lines.append(line)
+            elif self.state == "spec":
+                if stripped == "```":
+                    self.state = "done"
+                else:
+                    spec_lines.append(line)
+        if spec_lines:
+            events.append(("spec_chunk", "\n".join(spec_lines) + "\n"))
+        return events
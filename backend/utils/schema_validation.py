@@ -0,0 +1,168 @@
+"""
+OpenAPI 3.0/3.1 and Swagger 2.0 schema validation.
+
+The meta-schema validators are compiled once per process (see
+warm_validators) and reused for every spec. Validation runs in two passes:
+the precompiled JSON Schema check first, then openapi-spec-validator's
+semantic checks (refs, path parameters, operationIds) only when the
+structure is valid - the semantic pass is not robust to malformed input.
+
+The OpenAPI 3.1 meta-schema only checks that a Schema Object is an object or
+a boolean, so 3.1 schema objects are also checked against the JSON Schema
+2020-12 meta-schema. That catches malformed keywords (an unknown type, a
+boolean exclusiveMinimum, a negative minLength) but not keywords 2020-12
+simply ignores, such as a leftover 3.0 'nullable'. Schemas declaring their
+own $schema, and documents with a non-default jsonSchemaDialect, are not
+checked against 2020-12.
+"""
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jsonschema import Draft202012Validator
+from jsonschema.exceptions import best_match
+from openapi_spec_validator import OpenAPIV2SpecValidator, OpenAPIV30SpecValidator, OpenAPIV31SpecValidator
+from utils.autofixer import iter_schema_roots
+
+logger = logging.getLogger(__name__)
+
+MAX_ERRORS = 50
+MAX_MESSAGE_LENGTH = 300
+
+SPEC_VALIDATORS = {
+    "2.0": OpenAPIV2SpecValidator,
+    "3.0": OpenAPIV30SpecValidator,
+    "3.1": OpenAPIV31SpecValidator,
+}
+
+# The default 3.1 dialect: JSON Schema 2020-12 plus a few annotation keywords it already allows
+OAS_31_DIALECT = "https://spec.openapis.org/oas/3.1/dialect/base"
+
+
+def detect_version(document: Any) -> Optional[str]:
+    """'2.0', '3.0' or '3.1', or None when the document declares no supported version"""
+    if not isinstance(document, dict):
+        return None
+    if str(document.get('swagger', '')).startswith('2.'):
+        return "2.0"
+    openapi = str(document.get('openapi', ''))
+    for version in ("3.0", "3.1"):
+        if openapi.startswith(version):
+            return version
+    return None
+
+
+@lru_cache(maxsize=None)
+def _schema_validator(version: str):
+    """Compiled meta-schema validator for a spec version (built once per process)"""
+    return SPEC_VALIDATORS[version].schema_validator
+
+
+@lru_cache(maxsize=None)
+def _dialect_validator() -> Draft202012Validator:
+    """Validator for 3.1 Schema Objects against the JSON Schema 2020-12 meta-schema"""
+    return Draft202012Validator(Draft202012Validator.META_SCHEMA)
+
+
+def warm_validators():
+    """Compile every meta-schema up front; used as the process pool initializer"""
+    for version in SPEC_VALIDATORS:
+        _schema_validator(version).is_valid({})
+    _dialect_validator().is_valid({})
+
+
+def _pointer(path) -> str:
+    """JSON pointer for an error location"""
+    return "/" + "/".join(str(part).replace('~', '~0').replace('/', '~1') for part in path)
+
+
+def _describe(error) -> Dict[str, Any]:
+    # oneOf/anyOf failures carry the real reason in their sub-errors
+    if error.validator in ('oneOf', 'anyOf') and error.context:
+        error = best_match(error.context)
+    message = error.message
+    if len(message) > MAX_MESSAGE_LENGTH:
+        message = message[:MAX_MESSAGE_LENGTH] + "..."
+    # Semantic errors (unresolved refs, path parameters) carry no JSON Schema keyword
+    validator = error.validator if isinstance(error.validator, str) else "semantic"
+    return {"path": _pointer(error.absolute_path), "message": message, "validator": validator}
+
+
+def _dialect_errors(document: dict) -> Iterator[Tuple[str, Any]]:
+    """(schema pointer, JSON Schema 2020-12 error) for the Schema Objects of a 3.1 document"""
+    if document.get('jsonSchemaDialect', OAS_31_DIALECT) != OAS_31_DIALECT:
+        return
+    validator = _dialect_validator()
+    for pointer, schema in iter_schema_roots(document):
+        if isinstance(schema, dict) and '$schema' in schema:
+            continue
+        for error in validator.iter_errors(schema):
+            yield pointer, error
+
+
+def _describe_dialect(pointer: str, error) -> Dict[str, Any]:
+    described = _describe(error)
+    described["path"] = pointer + (described["path"] if error.absolute_path else "")
+    return described
+
+
+def validate_document(document: Any) -> Dict[str, Any]:
+    """
+    Validate a parsed spec against its declared version (and, for 3.1, its
+    Schema Objects against JSON Schema 2020-12 - see the module docstring for
+    what a pass does not prove).
+    Returns {valid, version, errors: [{path, message, validator}], error_count,
+    truncated}: errors holds the first MAX_ERRORS, error_count counts them all.
+    Top-level so it can be shipped to a process pool.
+    """
+    version = detect_version(document)
+    if version is None:
+        return {
+            "valid": False, "version": None, "error_count": 1, "truncated": False,
+            "errors": [{"path": "/", "message": "Missing or unsupported 'openapi'/'swagger' version", "validator": "version"}]
+        }
+
+    # YAML allows integer keys (status codes) and dates; validators expect JSON data
+    document = json.loads(json.dumps(document, default=str))
+
+    # Only the first MAX_ERRORS are described, but every error is counted
+    errors: List[Dict[str, Any]] = []
+    error_count = 0
+    for error in _schema_validator(version).iter_errors(document):
+        error_count += 1
+        if len(errors) < MAX_ERRORS:
+            errors.append(_describe(error))
+
+    if not error_count and version == "3.1":
+        for pointer, error in _dialect_errors(document):
+            error_count += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append(_describe_dialect(pointer, error))
+
+    if not error_count:
+        try:
+            for error in SPEC_VALIDATORS[version](document).iter_errors():
+                error_count += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append(_describe(error))
+        except Exception as e:
+            # Some of these errors embed the whole document in their message
+            message = str(e)[:MAX_MESSAGE_LENGTH]
+            logger.warning(f"Semantic validation aborted: {message}")
+            error_count += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({"path": "/", "message": f"Semantic validation aborted: {message}", "validator": "semantic"})
+
+    return {"valid": not errors, "version": version, "errors": errors, "error_count": error_count,
+            "truncated": error_count > len(errors)}
+
+
+def format_validation_errors(report: Dict[str, Any], limit: int = 10) -> List[str]:
+    """Suggestion lines for the errors in a validation report"""
+    lines = [f"- NEEDS REVIEW: schema {e['path']}: {e['message']}" for e in report["errors"][:limit]]
+    remaining = len(report["errors"]) - limit
+    if remaining > 0:
+        more = f"{remaining}+" if report.get("truncated") else str(remaining)
+        lines.append(f"- NEEDS REVIEW: {more} more schema error(s) not shown")
+    return lines
@@ -0,0 +1,218 @@
+"""
+Split large OpenAPI documents into independent shards and merge corrected
+shards back together.
+
+A shard is a self-contained OpenAPI document: a group of path items (by tag
+or path prefix) plus the transitive closure of the components they $ref.
+Components no path uses are clustered by their own $ref links.
+"""
+import copy
+import logging
+from typing import Any, Dict, List, Set, Tuple
+from utils.swagger_converter import HTTP_METHODS
+
+logger = logging.getLogger(__name__)
+
+COMPONENT_REF_PREFIX = '#/components/'
+
+# Top-level keys every shard carries so the model sees a valid document
+SHARED_TOP_LEVEL = ('openapi', 'info', 'servers', 'security', 'externalDocs')
+
+
+def _collect_refs(node: Any) -> Set[Tuple[str, str]]:
+    """(section, name) for every '#/components/<section>/<name>' $ref below node"""
+    refs = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            ref = current.get('$ref')
+            if isinstance(ref, str) and ref.startswith(COMPONENT_REF_PREFIX):
+                parts = ref[len(COMPONENT_REF_PREFIX):].split('/')
+                if len(parts) >= 2:
+                    refs.add((parts[0], parts[1].replace('~1', '/').replace('~0', '~')))
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+    return refs
+
+
+def _component_graph(components: dict) -> Dict[Tuple[str, str], Set[Tuple[str, str]]]:
+    graph = {}
+    for section, entries in components.items():
+        if isinstance(entries, dict):
+            for name, value in entries.items():
+                graph[(section, name)] = _collect_refs(value)
+    return graph
+
+
+def _closure(start: Set[Tuple[str, str]], graph: Dict[Tuple[str, str], Set[Tuple[str, str]]]) -> Set[Tuple[str, str]]:
+    """All components reachable from start (cycle-safe)"""
+    seen, stack = set(), list(start)
+    while stack:
+        node = stack.pop()
+        if node in seen or node not in graph:
+            continue
+        seen.add(node)
+        stack.extend(graph[node] - seen)
+    return seen
+
+
+def _group_key(path: str, path_item: Any) -> str:
+    """First operation tag, else the first path segment"""
+    if isinstance(path_item, dict):
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if isinstance(operation, dict) and operation.get('tags'):
+                return f"tag:{operation['tags'][0]}"
+    segments = [s for s in path.split('/') if s]
+    return f"prefix:/{segments[0]}" if segments else "prefix:/"
+
+
+def _build_shard(document: dict, paths: Dict[str, Any], component_keys: Set[Tuple[str, str]]) -> dict:
+    shard = {key: copy.deepcopy(document[key]) for key in SHARED_TOP_LEVEL if key in document}
+    shard['paths'] = copy.deepcopy(paths)
+
+    components: Dict[str, dict] = {}
+    source = document.get('components') or {}
+    for section, name in sorted(component_keys):
+        components.setdefault(section, {})[name] = copy.deepcopy(source[section][name])
+    # Security schemes are small and referenced by name, not $ref - every shard gets them
+    if isinstance(source.get('securitySchemes'), dict):
+        components['securitySchemes'] = copy.deepcopy(source['securitySchemes'])
+    if components:
+        shard['components'] = components
+
+    used_tags = {tag for item in paths.values() if isinstance(item, dict)
+                 for op in item.values() if isinstance(op, dict) for tag in op.get('tags') or []}
+    tags = [t for t in document.get('tags') or [] if isinstance(t, dict) and t.get('name') in used_tags]
+    if tags:
+        shard['tags'] = tags
+    return shard
+
+
+def split_spec(document: dict, max_paths_per_shard: int = 25) -> List[dict]:
+    """
+    Split a parsed OpenAPI document into independent shard documents.
+    Returns a list with the original document when there is nothing to split.
+    """
+    paths = document.get('paths') or {}
+    components = document.get('components') or {}
+    graph = _component_graph(components)
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for path, path_item in paths.items():
+        groups.setdefault(_group_key(path, path_item), {})[path] = path_item
+
+    # Large groups are split; small groups are packed together up to the shard size
+    chunks: List[Dict[str, Any]] = []
+    current: Dict[str, Any] = {}
+    for group_paths in groups.values():
+        items = list(group_paths.items())
+        if len(current) + len(items) > max_paths_per_shard and current:
+            chunks.append(current)
+            current = {}
+        for start in range(0, len(items), max_paths_per_shard):
+            part = items[start:start + max_paths_per_shard]
+            if len(part) == max_paths_per_shard:
+                chunks.append(dict(part))
+            else:
+                current.update(part)
+    if current:
+        chunks.append(current)
+
+    shards = []
+    used: Set[Tuple[str, str]] = set()
+    for chunk in chunks:
+        needed = _closure(_collect_refs(chunk), graph)
+        used |= needed
+        shards.append(_build_shard(document, chunk, needed))
+
+    # Cluster components no path uses by their own $ref links
+    remaining = {key for key in graph if key not in used and key[0] != 'securitySchemes'}
+    while remaining:
+        seed = remaining.pop()
+        cluster = _closure({seed}, graph) & (remaining | {seed})
+        remaining -= cluster
+        shards.append(_build_shard(document, {}, cluster))
+
+    if len(shards) <= 1:
+        return [document]
+    logger.info(f"Split spec with {len(paths)} paths into {len(shards)} shards")
+    return shards
+
+
+def merge_shards(original: dict, shards: List[dict]) -> Tuple[dict, List[str]]:
+    """
+    Merge corrected shard documents into one document.
+    Shared top-level sections (info, servers, ...), components and tags that
+    came back different from different shards are conflicts: the first
+    version wins and the conflict is reported.
+    """
+    merged: Dict[str, Any] = {}
+    conflicts: List[str] = []
+    for key in SHARED_TOP_LEVEL:
+        versions = [shard[key] for shard in shards if key in shard]
+        if versions:
+            merged[key] = copy.deepcopy(versions[0])
+            if any(version != versions[0] for version in versions[1:]):
+                conflicts.append(f"Top-level '{key}' differs between shards (kept first version)")
+        elif key in original:
+            merged[key] = copy.deepcopy(original[key])
+    paths: Dict[str, Any] = {}
+    path_origin: Dict[str, int] = {}
+    components: Dict[str, dict] = {}
+    shard_tags: Dict[str, dict] = {}
+
+    for index, shard in enumerate(shards):
+        for path, item in (shard.get('paths') or {}).items():
+            if path in paths and paths[path] != item:
+                conflicts.append(f"Path '{path}' returned by shards {path_origin[path]} and {index} (kept first)")
+                continue
+            paths.setdefault(path, item)
+            path_origin.setdefault(path, index)
+
+        for section, entries in (shard.get('components') or {}).items():
+            if not isinstance(entries, dict):
+                continue
+            target = components.setdefault(section, {})
+            for name, value in entries.items():
+                if name in target and target[name] != value:
+                    conflicts.append(f"Component '{section}/{name}' differs between shards (kept first version)")
+                    continue
+                target.setdefault(name, value)
+
+        for tag in shard.get('tags') or []:
+            if not isinstance(tag, dict) or not tag.get('name'):
+                continue
+            if tag['name'] in shard_tags and shard_tags[tag['name']] != tag:
+                conflicts.append(f"Tag '{tag['name']}' differs between shards (kept first version)")
+                continue
+            shard_tags.setdefault(tag['name'], tag)
+
+    # Preserve the original ordering; entries the model added go last
+    merged['paths'] = _in_original_order(paths, original.get('paths') or {})
+    original_components = original.get('components') or {}
+    if components:
+        merged['components'] = {
+            section: _in_original_order(entries, original_components.get(section) or {})
+            for section, entries in components.items()
+        }
+    # Shards only carry the tags their operations use: start from every original tag definition,
+    # take the corrected version where a shard returned one, and append tags the model added
+    tags = {tag['name']: copy.deepcopy(tag) for tag in original.get('tags') or []
+            if isinstance(tag, dict) and tag.get('name')}
+    tags.update(shard_tags)
+    if tags:
+        merged['tags'] = list(tags.values())
+
+    # Top-level keys no shard carries (webhooks, x-* extensions) come from the original
+    for key, value in original.items():
+        if key not in merged and key not in ('paths', 'components', 'tags'):
+            merged[key] = copy.deepcopy(value)
+    return merged, conflicts
+
+
+def _in_original_order(entries: Dict[str, Any], original: Dict[str, Any]) -> Dict[str, Any]:
+    position = {key: i for i, key in enumerate(original)}
+    return dict(sorted(entries.items(), key=lambda kv: position.get(kv[0], len(position))))
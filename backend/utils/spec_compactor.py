@@ -0,0 +1,341 @@
+"""
+Pre-LLM compaction of specs.
+
+The prompt only needs the document's data, not its formatting: comments,
+blank lines and indentation are dropped by serializing the parsed document
+as compact JSON (the cheapest form in tokens, and still valid YAML).
+Optionally, structurally identical inline schemas that occur more than once
+are hoisted into temporary components.schemas entries and replaced with
+$refs; expand_hoisted puts them back inline in the corrected document
+(expand_hoisted_text does so in YAML text, keeping its comments).
+"""
+import json
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import yaml
+
+from utils.yaml_loader import compose_yaml, dump_yaml, last_line, load_yaml
+
+logger = logging.getLogger(__name__)
+
+HOIST_PREFIX = "CompactShared"
+HOIST_MIN_CHARS = 80  # Smaller schemas cost about as much as the $ref that replaces them
+SCHEMA_REF_PREFIX = "#/components/schemas/"
+
+# Keywords whose values are subschemas
+SCHEMA_CHILD_KEYS = ('items', 'additionalProperties', 'not', 'contains', 'propertyNames', 'if', 'then', 'else')
+SCHEMA_LIST_KEYS = ('allOf', 'anyOf', 'oneOf', 'prefixItems')
+SCHEMA_MAP_KEYS = ('properties', 'patternProperties', '$defs')
+
+# Data that may contain a 'schema' key without being part of the spec structure
+NON_SPEC_KEYS = ('example', 'examples', 'default', 'enum', 'const')
+
+
+@dataclass
+class CompactSpec:
+    text: str
+    language: str  # Code fence language for the prompt: 'json', or 'yaml' for unparsed text
+    hoisted: Dict[str, Any] = field(default_factory=dict)  # Temporary component name -> schema
+    original_bytes: int = 0
+    compact_bytes: int = 0
+    original_tokens: Optional[int] = None  # Filled in by the token planner
+    compact_tokens: Optional[int] = None
+
+    def stats(self) -> dict:
+        return {
+            "original_bytes": self.original_bytes,
+            "compact_bytes": self.compact_bytes,
+            "original_tokens": self.original_tokens,
+            "compact_tokens": self.compact_tokens,
+            "hoisted_schemas": len(self.hoisted)
+        }
+
+
+def _canonical(node: Any) -> str:
+    return json.dumps(node, sort_keys=True, separators=(',', ':'))
+
+
+def _children(schema: dict) -> Iterator[Tuple[Any, Any]]:
+    """(container, key) slots for the direct subschemas of a schema"""
+    for key in SCHEMA_CHILD_KEYS:
+        if isinstance(schema.get(key), dict):
+            yield schema, key
+    for key in SCHEMA_LIST_KEYS:
+        if isinstance(schema.get(key), list):
+            for index, item in enumerate(schema[key]):
+                if isinstance(item, dict):
+                    yield schema[key], index
+    for key in SCHEMA_MAP_KEYS:
+        if isinstance(schema.get(key), dict):
+            for name, item in schema[key].items():
+                if isinstance(item, dict):
+                    yield schema[key], name
+
+
+def _schema_roots(document: dict) -> Iterator[Tuple[Any, Any]]:
+    """(container, key) slots of the inline schemas in paths and components"""
+    components = document.get('components') if isinstance(document.get('components'), dict) else {}
+    schemas = components.get('schemas') if isinstance(components.get('schemas'), dict) else {}
+    # Named component schemas stay where they are; their inline children are candidates
+    for schema in schemas.values():
+        if isinstance(schema, dict):
+            yield from _children(schema)
+
+    stack = [document.get('paths'), {k: v for k, v in components.items() if k != 'schemas'}]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'schema' and isinstance(value, dict):
+                    yield node, key
+                elif key not in NON_SPEC_KEYS and not str(key).startswith('x-'):
+                    stack.append(value)
+
+
+def _walk_schemas(document: dict) -> Iterator[Tuple[Any, Any]]:
+    """Every schema slot, parents before children"""
+    stack = list(_schema_roots(document))
+    while stack:
+        container, key = stack.pop()
+        yield container, key
+        node = container[key]
+        if isinstance(node, dict):
+            stack.extend(_children(node))
+
+
+def _hoist(document: dict) -> Dict[str, Any]:
+    """Replace repeated inline schemas with $refs to new component schemas, in place"""
+    # Nodes stay alive while hoisting, so their ids key the canonical forms for the second pass
+    canonical = {id(container[key]): _canonical(container[key]) for container, key in _walk_schemas(document)}
+    counts = Counter(canonical.values())
+    repeated = {canon for canon, count in counts.items() if count > 1 and len(canon) >= HOIST_MIN_CHARS}
+    if not repeated:
+        return {}
+
+    had_components, had_schemas = 'components' in document, 'schemas' in (document.get('components') or {})
+    components = document.setdefault('components', {})
+    if not isinstance(components, dict):
+        return {}
+    schemas = components.setdefault('schemas', {})
+    if not isinstance(schemas, dict):
+        return {}
+
+    names: Dict[str, str] = {}
+    slots: Dict[str, List[Tuple[Any, Any, Any]]] = {}
+    stack = list(_schema_roots(document))
+    while stack:
+        container, key = stack.pop()
+        node = container[key]
+        canon = canonical[id(node)]
+        if canon in repeated and '$ref' not in node:
+            if canon not in names:
+                index = len(names) + 1
+                while f"{HOIST_PREFIX}{index}" in schemas:
+                    index += 1
+                names[canon] = f"{HOIST_PREFIX}{index}"
+                schemas[names[canon]] = node
+            container[key] = {'$ref': SCHEMA_REF_PREFIX + names[canon]}
+            slots.setdefault(names[canon], []).append((container, key, node))
+        else:
+            stack.extend(_children(node))
+
+    # Repeats nested inside a hoisted schema may end up referenced once - put those back
+    hoisted = {}
+    for name, uses in slots.items():
+        if len(uses) < 2:
+            container, key, node = uses[0]
+            container[key] = node
+            del schemas[name]
+        else:
+            hoisted[name] = schemas[name]
+    if not had_schemas and not schemas:
+        components.pop('schemas')
+        if not had_components:
+            document.pop('components')
+    return hoisted
+
+
+def compact_document(document: Any, text: str, hoist: bool = False) -> CompactSpec:
+    """
+    Compact prompt form of a parsed document. text is the original text,
+    used as-is when the document could not be parsed into a mapping or list.
+    """
+    original_bytes = len(text.encode('utf-8'))
+    if not isinstance(document, (dict, list)):
+        return CompactSpec(text=text, language='yaml', original_bytes=original_bytes, compact_bytes=original_bytes)
+
+    # Round-trip through JSON: a private copy, with YAML-only values (integer keys, dates) normalised
+    document = json.loads(json.dumps(document, default=str))
+    hoisted = _hoist(document) if hoist and isinstance(document, dict) and 'openapi' in document else {}
+    compact = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+    return CompactSpec(text=compact, language='json', hoisted=hoisted, original_bytes=original_bytes,
+                       compact_bytes=len(compact.encode('utf-8')))
+
+
+def _definitions(document: dict, hoisted: Dict[str, Any], remove: bool) -> Dict[str, Any]:
+    """$ref -> definition of each hoisted schema: the corrected one when the model kept it, else the original"""
+    components = document.get('components') if isinstance(document.get('components'), dict) else {}
+    schemas = components.get('schemas') if isinstance(components.get('schemas'), dict) else {}
+    definitions = {}
+    for name, original in hoisted.items():
+        corrected = schemas.pop(name, None) if remove else schemas.get(name)
+        definitions[SCHEMA_REF_PREFIX + name] = corrected if isinstance(corrected, dict) else original
+    if remove and 'schemas' in components and not schemas:
+        components.pop('schemas')
+        if not components:
+            document.pop('components')
+    return definitions
+
+
+def _inline(root: Any, definitions: Dict[str, Any]) -> Any:
+    """
+    Copy of root with $refs to definitions replaced by the definitions (siblings
+    of the $ref win). Iterative, since the input is model output of any depth.
+    """
+    holder = [None]
+    stack = [(holder, 0, root, frozenset())]
+    while stack:
+        container, key, node, seen = stack.pop()
+        if isinstance(node, list):
+            container[key] = copied = [None] * len(node)
+            stack.extend((copied, index, item, seen) for index, item in enumerate(node))
+        elif isinstance(node, dict):
+            # Layers from the innermost definition out to the node itself; later layers override
+            layers = []
+            while isinstance(node.get('$ref'), str) and node['$ref'] in definitions and node['$ref'] not in seen:
+                layers.append(({k: v for k, v in node.items() if k != '$ref'}, seen))
+                seen = seen | {node['$ref']}
+                node = definitions[node['$ref']]
+                if not isinstance(node, dict):
+                    break
+            layers.append((node if isinstance(node, dict) else {}, seen))
+            merged = {}
+            for mapping, layer_seen in reversed(layers):
+                for child_key, value in mapping.items():
+                    merged[child_key] = (value, layer_seen)
+            container[key] = copied = dict.fromkeys(merged)
+            stack.extend((copied, child_key, value, layer_seen) for child_key, (value, layer_seen) in merged.items())
+        else:
+            container[key] = node
+    return holder[0]
+
+
+def expand_hoisted(document: Any, hoisted: Dict[str, Any]) -> Any:
+    """
+    Inline the temporary schemas created by compact_document again (in place).
+    Uses the corrected definition when the model kept it, else the original.
+    """
+    if not isinstance(document, dict) or not hoisted:
+        return document
+    expanded = _inline(document, _definitions(document, hoisted, remove=True))
+    document.clear()
+    document.update(expanded)
+    return document
+
+
+def expand_hoisted_text(text: str, hoisted: Dict[str, Any]) -> str:
+    """
+    expand_hoisted on YAML text. Only the $ref nodes and the temporary
+    component entries are rewritten, so the model's comments and layout
+    survive; falls back to re-dumping the expanded document when the text
+    cannot be spliced (anchors, merge keys, flow-style components).
+    Raises yaml.YAMLError on invalid input.
+    """
+    if not hoisted or not any(name in text for name in hoisted):
+        return text
+    document = load_yaml(text)[0]
+    if not isinstance(document, dict):
+        return text
+    definitions = _definitions(document, hoisted, remove=False)
+    expected = _inline(document, definitions)
+    _definitions(expected, hoisted, remove=True)  # Drops the temporary entries from the copy
+    spliced = _splice_hoisted(text, document, definitions)
+    if spliced is not None and load_yaml(spliced)[0] == expected:
+        return spliced
+    logger.info("Could not expand hoisted schemas in place - re-serializing the corrected spec")
+    return dump_yaml(expected)
+
+
+def _splice_hoisted(text: str, document: dict, definitions: Dict[str, Any]) -> Optional[str]:
+    """Text with hoisted $refs inlined and their component entries removed, or None when it cannot be spliced"""
+    root = compose_yaml(text)
+    temporary = {ref[len(SCHEMA_REF_PREFIX):] for ref in definitions}
+    # (line, column, end line, end column, replacement); an end column of -1 is the end of the line
+    edits: List[Tuple[int, int, int, int, str]] = []
+    visited = set()
+    stack = [(root, document, ())]
+    while stack:
+        node, value, tokens = stack.pop()
+        if id(node) in visited:
+            return None  # An alias - editing its anchor would change every use
+        visited.add(id(node))
+        if isinstance(node, yaml.SequenceNode) and isinstance(value, list) and len(node.value) == len(value):
+            stack.extend((child, item, tokens + (index,)) for index, (child, item) in enumerate(zip(node.value, value)))
+        elif isinstance(node, yaml.MappingNode) and isinstance(value, dict):
+            if len(node.value) != len(value):
+                return None  # Merge keys or duplicates - the nodes do not line up with the data
+            if value.get('$ref') in definitions:
+                edits.append(_inline_edit(node, _inline(value, definitions)))
+                continue
+            for (_, child), (key, item) in zip(node.value, value.items()):
+                if tokens == ('components', 'schemas') and key in temporary:
+                    continue  # Removed below
+                stack.append((child, item, tokens + (key,)))
+        elif isinstance(node, (yaml.SequenceNode, yaml.MappingNode)):
+            return None
+
+    removals = _temporary_entries(root, temporary)
+    if removals is None:
+        return None
+    edits.extend(removals)
+
+    lines = text.split('\n')
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+    for line, column, end_line, end_column, replacement in sorted(edits, reverse=True):
+        start = offsets[line] + column
+        end = min(offsets[end_line + 1] - 1 if end_column < 0 else offsets[end_line] + end_column, len(text))
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def _inline_edit(node: yaml.MappingNode, value: dict) -> Tuple[int, int, int, int, str]:
+    """Edit replacing a $ref mapping node with value, in the node's own style"""
+    line, column = node.start_mark.line, node.start_mark.column
+    if node.flow_style:
+        return line, column, node.end_mark.line, node.end_mark.column, json.dumps(value, ensure_ascii=False)
+    dumped = dump_yaml(value).rstrip('\n').split('\n')
+    replacement = '\n'.join([dumped[0]] + [' ' * column + part for part in dumped[1:]])
+    # Through the end of the node's last line (a block node ends at a line break)
+    return line, column, last_line(node) - 1, -1, replacement
+
+
+def _temporary_entries(root: yaml.Node, temporary: set) -> Optional[List[Tuple[int, int, int, int, str]]]:
+    """Edits deleting the temporary components.schemas entries, and the sections they leave empty"""
+    path = [root]
+    for key in ('components', 'schemas'):
+        parent = path[-1]
+        if not isinstance(parent, yaml.MappingNode):
+            return []
+        child = next((value for key_node, value in parent.value if key_node.value == key), None)
+        if child is None:
+            return []
+        path.append(child)
+    entries = path[-1].value if isinstance(path[-1], yaml.MappingNode) else []
+    doomed = [(key_node, value) for key_node, value in entries if key_node.value in temporary]
+    if not doomed:
+        return []
+    if any(node.flow_style for node in path[1:] if isinstance(node, yaml.MappingNode)):
+        return None
+
+    # Remove whole sections that would be left empty, innermost first
+    if len(doomed) == len(entries):
+        doomed = [(key_node, value) for key_node, value in path[1].value if key_node.value == 'schemas']
+        if len(path[1].value) == 1:
+            doomed = [(key_node, value) for key_node, value in root.value if key_node.value == 'components']
+    return [(key_node.start_mark.line, 0, last_line(value), 0, '') for key_node, value in doomed]
@@ -0,0 +1,164 @@
+"""
+Post-generation verification of corrected specs.
+
+The corrected spec is parsed, schema-validated and checked for duplicate
+keys, and every problem is attributed to the smallest independently
+replaceable fragment that contains it: one path item, one component, or
+one top-level section. Failing fragments can then be regenerated on their
+own and spliced back in, instead of regenerating the whole document.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import yaml
+
+from utils.json_patch import PatchError, apply_patch, parse_pointer, resolve_pointer
+from utils.schema_validation import validate_document
+from utils.yaml_loader import compose_yaml, last_line, load_yaml
+
+logger = logging.getLogger(__name__)
+
+# Pointer depth below which a fragment is replaced as a whole
+FRAGMENT_DEPTH = {'paths': 2, 'webhooks': 2, 'components': 3}
+
+
+@dataclass
+class Verification:
+    document: Any = None
+    errors: List[Dict[str, Any]] = field(default_factory=list)  # {path, message, validator}
+    fragments: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)  # Fragment pointer -> its errors
+    sources: Dict[str, str] = field(default_factory=dict)  # Raw YAML of fragments with duplicate keys
+    parse_error: Optional[str] = None
+    error_count: int = 0  # Every error, including those past the MAX_ERRORS listed in errors
+    truncated: bool = False
+
+    @property
+    def valid(self) -> bool:
+        return self.parse_error is None and not self.errors
+
+    @property
+    def unlocated(self) -> List[Dict[str, Any]]:
+        """Errors at the document root, which no fragment can fix"""
+        located = {id(e) for errors in self.fragments.values() for e in errors}
+        return [e for e in self.errors if id(e) not in located]
+
+
+def format_pointer(tokens: List[Any]) -> str:
+    return "".join("/" + str(token).replace('~', '~0').replace('/', '~1') for token in tokens)
+
+
+def fragment_pointer(path: str) -> Optional[str]:
+    """Pointer of the fragment containing an error location, or None for the document root"""
+    try:
+        tokens = parse_pointer(path)
+    except PatchError:
+        return None
+    if not tokens or tokens == [""]:
+        return None
+    return format_pointer(tokens[:FRAGMENT_DEPTH.get(tokens[0], 1)])
+
+
+def _sections(text: str) -> List[Tuple[str, int, int]]:
+    """(pointer, first line, last line), 1-based, of every mapping entry down to fragment depth"""
+    sections = []
+    stack = [(compose_yaml(text), [])]
+    while stack:
+        node, tokens = stack.pop()
+        if not isinstance(node, yaml.MappingNode):
+            continue
+        for key_node, value_node in node.value:
+            child = tokens + [key_node.value]
+            sections.append((format_pointer(child), key_node.start_mark.line + 1, last_line(value_node)))
+            if len(child) < FRAGMENT_DEPTH.get(child[0], 1):
+                stack.append((value_node, child))
+    return sections
+
+
+def _duplicate_section(sections: List[Tuple[str, int, int]], dup: dict) -> Optional[Tuple[str, int, int]]:
+    """Smallest section holding both definitions of a duplicate key, or None when only the root does"""
+    first, last = sorted((dup["first_line"], dup["line"]))
+    holding = [s for s in sections if s[1] <= first and last <= s[2]]
+    return min(holding, key=lambda s: s[2] - s[1]) if holding else None
+
+
+def _merge_nested(fragments: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Fold fragments nested inside another failing fragment into it, so splices never overlap"""
+    merged: Dict[str, List[Dict[str, Any]]] = {}
+    for pointer in sorted(fragments, key=len):
+        outer = next((p for p in merged if pointer.startswith(p + "/")), None)
+        merged.setdefault(outer or pointer, []).extend(fragments[pointer])
+    return merged
+
+
+def verify_document(document: Any) -> Verification:
+    """Schema-validate a parsed spec and group its errors by fragment"""
+    report = validate_document(document)
+    verification = Verification(document=document, errors=report["errors"], error_count=report["error_count"],
+                                truncated=report["truncated"])
+    for error in report["errors"]:
+        pointer = fragment_pointer(error["path"])
+        if pointer is not None:
+            verification.fragments.setdefault(pointer, []).append(error)
+    verification.fragments = _merge_nested(verification.fragments)
+    return verification
+
+
+def verify_spec(text: str) -> Verification:
+    """Parse a corrected spec and verify it: syntax, duplicate keys and schema validation"""
+    try:
+        document, duplicate_keys = load_yaml(text)
+    except yaml.YAMLError as e:
+        return Verification(parse_error=f"Invalid YAML: {e}")
+    if not isinstance(document, dict):
+        return Verification(parse_error="Corrected spec is not a mapping")
+
+    verification = verify_document(document)
+    if duplicate_keys:
+        lines = text.splitlines()
+        sections = _sections(text)
+        for dup in duplicate_keys:
+            section = _duplicate_section(sections, dup) if dup["line"] else None
+            pointer = section[0] if section else ""
+            error = {"path": pointer or "/", "validator": "duplicate_key",
+                     "message": f"Duplicate key '{dup['key']}' at line {dup['line']} (first defined at line {dup['first_line']})"}
+            verification.errors.append(error)
+            verification.error_count += 1
+            if section:
+                verification.fragments.setdefault(pointer, []).append(error)
+                # The parsed document kept only the last definition - send the model what it actually wrote
+                verification.sources[pointer] = "\n".join(lines[section[1] - 1:section[2]])
+        verification.fragments = _merge_nested(verification.fragments)
+    return verification
+
+
+def repair_request(verification: Verification, pointers: List[str]) -> str:
+    """Compact JSON payload for a fragment repair prompt"""
+    document = verification.document
+    components = document.get('components') if isinstance(document.get('components'), dict) else {}
+    fragments = {}
+    for pointer in pointers:
+        entry = {"errors": [f"{e['path']}: {e['message']}" for e in verification.fragments[pointer]]}
+        if pointer in verification.sources:
+            entry["yaml"] = verification.sources[pointer]
+        else:
+            try:
+                entry["value"] = resolve_pointer(document, pointer)
+            except PatchError:
+                entry["value"] = None
+        fragments[pointer] = entry
+    payload = {
+        "openapi": document.get('openapi'),
+        # Names the fragments may $ref
+        "components": {kind: sorted(map(str, defs)) for kind, defs in components.items() if isinstance(defs, dict)},
+        "fragments": fragments
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def splice_fragments(document: Any, replacements: Dict[str, Any], allowed: List[str]) -> Tuple[Any, List[str]]:
+    """Replace fragments in a copy of document. Only pointers in allowed are applied. Returns (document, applied)."""
+    operations = [{"op": "add", "path": pointer, "value": value}
+                  for pointer, value in replacements.items() if pointer in allowed and value is not None]
+    patched, applied, _ = apply_patch(document, operations)
+    return patched, [operation["path"] for operation in applied]
@@ -0,0 +1,361 @@
+"""
+Deterministic Swagger 2.0 -> OpenAPI 3.1 converter.
+Handles the mechanical part of the upgrade in-process so the LLM only has
+to deal with semantic enrichment (or is skipped entirely in fast mode).
+"""
+import copy
+import logging
+from typing import Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace')
+
+REF_PREFIXES = {
+    '#/definitions/': '#/components/schemas/',
+    '#/parameters/': '#/components/parameters/',
+    '#/responses/': '#/components/responses/',
+}
+
+# Swagger 2.0 parameter/header fields that belong in an OpenAPI 3 schema
+SCHEMA_FIELDS = (
+    'type', 'format', 'items', 'default', 'maximum', 'exclusiveMaximum', 'minimum',
+    'exclusiveMinimum', 'maxLength', 'minLength', 'pattern', 'maxItems', 'minItems',
+    'uniqueItems', 'enum', 'multipleOf',
+)
+
+# Schema keywords whose value is a subschema (or a list of them), and those mapping names to subschemas.
+# Everything else in a schema (example, default, enum, x-...) is data and is never rewritten.
+SUBSCHEMA_KEYWORDS = (
+    'items', 'additionalItems', 'additionalProperties', 'not', 'contains', 'propertyNames',
+    'if', 'then', 'else', 'unevaluatedItems', 'unevaluatedProperties', 'allOf', 'anyOf', 'oneOf', 'prefixItems',
+)
+SCHEMA_MAP_KEYWORDS = ('properties', 'patternProperties', 'definitions', '$defs', 'dependentSchemas')
+
+COLLECTION_FORMATS = {
+    'csv': {'style': 'form', 'explode': False},
+    'ssv': {'style': 'spaceDelimited', 'explode': False},
+    'pipes': {'style': 'pipeDelimited', 'explode': False},
+    'multi': {'style': 'form', 'explode': True},
+}
+
+OAUTH2_FLOWS = {
+    'implicit': 'implicit',
+    'password': 'password',
+    'application': 'clientCredentials',
+    'accessCode': 'authorizationCode',
+}
+
+
+def is_swagger2(spec: Any) -> bool:
+    """True when the parsed document declares swagger: 2.0"""
+    return isinstance(spec, dict) and str(spec.get('swagger', '')).startswith('2')
+
+
+def _rewrite_ref(ref: str) -> str:
+    for old, new in REF_PREFIXES.items():
+        if ref.startswith(old):
+            return new + ref[len(old):]
+    return ref
+
+
+def iter_schemas(schema: Any, pointer: str = "") -> Iterator[Tuple[str, dict]]:
+    """
+    Iteratively yield (json pointer, schema) for a schema and every nested subschema.
+    Property names and example/default/enum values are never visited as schemas.
+    """
+    stack = [(pointer, schema)]
+    while stack:
+        pointer, current = stack.pop()
+        if not isinstance(current, dict):
+            continue
+        yield pointer, current
+        for keyword in SUBSCHEMA_KEYWORDS:
+            value = current.get(keyword)
+            if isinstance(value, list):
+                stack.extend((f"{pointer}/{keyword}/{i}", item) for i, item in enumerate(value))
+            elif isinstance(value, dict):
+                stack.append((f"{pointer}/{keyword}", value))
+        for keyword in SCHEMA_MAP_KEYWORDS:
+            value = current.get(keyword)
+            if isinstance(value, dict):
+                stack.extend((f"{pointer}/{keyword}/{_escape(name)}", item) for name, item in value.items())
+
+
+def _escape(token: Any) -> str:
+    """Escape a JSON pointer token"""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def upgrade_exclusive_bounds(schema: dict) -> bool:
+    """
+    Replace boolean exclusiveMaximum/exclusiveMinimum (Swagger 2.0, OpenAPI 3.0) with the
+    numeric 3.1 form in place: {maximum: 10, exclusiveMaximum: true} -> {exclusiveMaximum: 10}.
+    Returns True when the schema changed.
+    """
+    changed = False
+    for bound, exclusive in (('maximum', 'exclusiveMaximum'), ('minimum', 'exclusiveMinimum')):
+        flag = schema.get(exclusive)
+        if not isinstance(flag, bool):
+            continue
+        del schema[exclusive]
+        if flag and bound in schema:
+            schema[exclusive] = schema.pop(bound)
+        changed = True
+    return changed
+
+
+def _convert_schema(node: Any) -> Any:
+    """Rewrite $refs and Swagger-only schema keywords in a copy of the schema"""
+    root = copy.deepcopy(node)
+    for _, current in iter_schemas(root):
+        ref = current.get('$ref')
+        if isinstance(ref, str):
+            current['$ref'] = _rewrite_ref(ref)
+        if current.get('type') == 'file':
+            current['type'] = 'string'
+            current['format'] = 'binary'
+        if current.pop('x-nullable', False) and isinstance(current.get('type'), str):
+            current['type'] = [current['type'], 'null']
+        upgrade_exclusive_bounds(current)
+        if isinstance(current.get('discriminator'), str):
+            # 2.0 names the property; 3.x wants a Discriminator Object
+            current['discriminator'] = {'propertyName': current['discriminator']}
+    return root
+
+
+def _param_schema(param: dict) -> dict:
+    """Build an OpenAPI 3 schema from the inline type fields of a Swagger parameter/header"""
+    schema = {k: copy.deepcopy(param[k]) for k in SCHEMA_FIELDS if k in param}
+    if param.get('allowEmptyValue') is not None and 'type' not in schema:
+        schema['type'] = 'string'
+    return _convert_schema(schema)
+
+
+def _convert_parameter(param: dict) -> dict:
+    """Convert a query/path/header/cookie parameter"""
+    if '$ref' in param:
+        return {'$ref': _rewrite_ref(param['$ref'])}
+
+    converted = {k: v for k, v in param.items()
+                 if k in ('name', 'in', 'description', 'required', 'allowEmptyValue') or k.startswith('x-')}
+    if param.get('in') == 'path':
+        converted['required'] = True
+    converted['schema'] = _param_schema(param)
+    style = COLLECTION_FORMATS.get(param.get('collectionFormat'))
+    if style and param.get('type') == 'array':
+        converted.update(style)
+    return converted
+
+
+def _form_request_body(form_params: List[dict], consumes: List[str]) -> dict:
+    """Collapse formData parameters into a single requestBody"""
+    properties, required = {}, []
+    has_file = False
+    for param in form_params:
+        schema = _param_schema(param)
+        if param.get('description'):
+            schema['description'] = param['description']
+        has_file = has_file or param.get('type') == 'file'
+        properties[param['name']] = schema
+        if param.get('required'):
+            required.append(param['name'])
+
+    schema = {'type': 'object', 'properties': properties}
+    if required:
+        schema['required'] = required
+
+    form_types = [c for c in consumes if c in ('multipart/form-data', 'application/x-www-form-urlencoded')]
+    if not form_types:
+        form_types = ['multipart/form-data' if has_file else 'application/x-www-form-urlencoded']
+    return {'content': {media_type: {'schema': schema} for media_type in form_types}}
+
+
+def _body_request_body(param: dict, consumes: List[str]) -> dict:
+    """Convert an 'in: body' parameter into a requestBody"""
+    body = {'content': {media_type: {'schema': _convert_schema(param.get('schema', {}))}
+                        for media_type in consumes}}
+    if param.get('description'):
+        body['description'] = param['description']
+    if param.get('required'):
+        body['required'] = True
+    return body
+
+
+def _convert_response(response: dict, produces: List[str]) -> dict:
+    if '$ref' in response:
+        return {'$ref': _rewrite_ref(response['$ref'])}
+
+    converted = {'description': response.get('description', '')}
+    if 'schema' in response:
+        schema = _convert_schema(response['schema'])
+        examples = response.get('examples') or {}
+        content = {}
+        for media_type in produces:
+            content[media_type] = {'schema': schema}
+            if media_type in examples:
+                content[media_type]['example'] = examples[media_type]
+        converted['content'] = content
+    if 'headers' in response:
+        converted['headers'] = {
+            name: {**({'description': h['description']} if 'description' in h else {}), 'schema': _param_schema(h)}
+            for name, h in response['headers'].items()
+        }
+    converted.update({k: v for k, v in response.items() if k.startswith('x-')})
+    return converted
+
+
+def _convert_security_scheme(name: str, scheme: dict, notes: List[str]) -> dict:
+    scheme_type = scheme.get('type')
+    converted = {k: v for k, v in scheme.items() if k == 'description' or k.startswith('x-')}
+    if scheme_type == 'basic':
+        converted.update({'type': 'http', 'scheme': 'basic'})
+    elif scheme_type == 'apiKey':
+        converted.update({'type': 'apiKey', 'name': scheme.get('name'), 'in': scheme.get('in')})
+    elif scheme_type == 'oauth2':
+        flow_name = OAUTH2_FLOWS.get(scheme.get('flow'), scheme.get('flow'))
+        flow = {'scopes': scheme.get('scopes', {})}
+        if 'authorizationUrl' in scheme:
+            flow['authorizationUrl'] = scheme['authorizationUrl']
+        if 'tokenUrl' in scheme:
+            flow['tokenUrl'] = scheme['tokenUrl']
+        converted.update({'type': 'oauth2', 'flows': {flow_name: flow}})
+    else:
+        notes.append(f"- Security scheme '{name}' has unknown type '{scheme_type}' and was copied as-is")
+        converted.update(scheme)
+    return converted
+
+
+def _build_servers(spec: dict) -> List[dict]:
+    host = spec.get('host')
+    base_path = spec.get('basePath', '') or ''
+    if not host:
+        return [{'url': base_path or '/'}]
+    schemes = spec.get('schemes') or ['https']
+    return [{'url': f"{scheme}://{host}{base_path}"} for scheme in schemes]
+
+
+def _resolve_local_parameter(ref: str, spec: dict) -> Optional[dict]:
+    if ref.startswith('#/parameters/'):
+        return spec.get('parameters', {}).get(ref[len('#/parameters/'):])
+    return None
+
+
+def _convert_operation(operation: dict, path_params: List[dict], spec: dict,
+                       consumes: List[str], produces: List[str], notes: List[str]) -> dict:
+    op_consumes = operation.get('consumes') or consumes
+    op_produces = operation.get('produces') or produces
+
+    converted = {k: copy.deepcopy(v) for k, v in operation.items()
+                 if k in ('tags', 'summary', 'description', 'externalDocs', 'operationId',
+                          'deprecated', 'security') or k.startswith('x-')}
+
+    # Operation parameters override path-level ones with the same name/location
+    merged = {}
+    for param in list(path_params) + list(operation.get('parameters', [])):
+        key = param.get('$ref') or (param.get('name'), param.get('in'))
+        merged[key] = param
+
+    parameters, form_params = [], []
+    for param in merged.values():
+        target = param
+        if '$ref' in param:
+            resolved = _resolve_local_parameter(param['$ref'], spec)
+            if resolved and resolved.get('in') == 'body':
+                converted['requestBody'] = {'$ref': '#/components/requestBodies/' + param['$ref'].split('/')[-1]}
+                continue
+            if resolved and resolved.get('in') == 'formData':
+                form_params.append(resolved)
+                continue
+        if target.get('in') == 'body':
+            converted['requestBody'] = _body_request_body(target, op_consumes)
+        elif target.get('in') == 'formData':
+            form_params.append(target)
+        else:
+            parameters.append(_convert_parameter(target))
+
+    if form_params:
+        converted['requestBody'] = _form_request_body(form_params, op_consumes)
+    if parameters:
+        converted['parameters'] = parameters
+
+    converted['responses'] = {
+        str(code): _convert_response(response, op_produces)
+        for code, response in (operation.get('responses') or {}).items()
+    }
+    if not converted['responses']:
+        notes.append(f"- Operation '{operation.get('operationId', '?')}' had no responses; added a default")
+        converted['responses'] = {'default': {'description': 'Default response'}}
+    return converted
+
+
+def convert_swagger2(spec: dict) -> Tuple[dict, List[str]]:
+    """
+    Convert a parsed Swagger 2.0 document to OpenAPI 3.1.0.
+    Returns (converted document, list of suggestion bullets describing the changes).
+    """
+    notes = ["- Upgraded Swagger 2.0 to OpenAPI 3.1.0 (local converter)"]
+    consumes = spec.get('consumes') or ['application/json']
+    produces = spec.get('produces') or ['application/json']
+
+    result = {'openapi': '3.1.0', 'info': copy.deepcopy(spec.get('info', {}))}
+
+    result['servers'] = _build_servers(spec)
+    notes.append("- Combined host, basePath and schemes into servers")
+
+    for key in ('tags', 'externalDocs', 'security'):
+        if key in spec:
+            result[key] = copy.deepcopy(spec[key])
+
+    paths = {}
+    for path, path_item in (spec.get('paths') or {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        if '$ref' in path_item:
+            paths[path] = {'$ref': path_item['$ref']}
+            continue
+        path_params = path_item.get('parameters', [])
+        converted_item = {}
+        plain_params = [p for p in path_params if '$ref' in p or p.get('in') not in ('body', 'formData')]
+        for method, operation in path_item.items():
+            if method in HTTP_METHODS and isinstance(operation, dict):
+                converted_item[method] = _convert_operation(
+                    operation, path_params, spec, consumes, produces, notes
+                )
+            elif method.startswith('x-'):
+                converted_item[method] = copy.deepcopy(operation)
+        if plain_params and not converted_item:
+            converted_item['parameters'] = [_convert_parameter(p) for p in plain_params]
+        paths[path] = converted_item
+    result['paths'] = paths
+    notes.append("- Moved body/formData parameters into requestBody and produces/consumes into media types")
+
+    components = {}
+    if spec.get('definitions'):
+        components['schemas'] = {name: _convert_schema(schema) for name, schema in spec['definitions'].items()}
+        notes.append("- Moved definitions to components/schemas and rewrote $ref paths")
+    if spec.get('parameters'):
+        params, bodies = {}, {}
+        for name, param in spec['parameters'].items():
+            if param.get('in') == 'body':
+                bodies[name] = _body_request_body(param, consumes)
+            elif param.get('in') != 'formData':
+                params[name] = _convert_parameter(param)
+        if params:
+            components['parameters'] = params
+        if bodies:
+            components['requestBodies'] = bodies
+    if spec.get('responses'):
+        components['responses'] = {name: _convert_response(resp, produces) for name, resp in spec['responses'].items()}
+    if spec.get('securityDefinitions'):
+        components['securitySchemes'] = {
+            name: _convert_security_scheme(name, scheme, notes)
+            for name, scheme in spec['securityDefinitions'].items()
+        }
+        notes.append("- Moved securityDefinitions to components/securitySchemes")
+    if components:
+        result['components'] = components
+
+    result.update({k: copy.deepcopy(v) for k, v in spec.items() if k.startswith('x-')})
+    logger.info(f"Converted Swagger 2.0 spec with {len(paths)} paths locally")
+    return result, notes
@@ -2,9 +2,17 @@ import sys
 import os
 import json
 import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
 from dotenv import load_dotenv
 from config.logging import setup_logging
 import yaml
+from utils.autofixer import autofix
+from utils.schema_validation import validate_document
+from utils.spec_compactor import CompactSpec, compact_document
+from utils.swagger_converter import convert_swagger2, is_swagger2
+from utils.yaml_loader import dump_yaml, format_duplicate_keys, load_json, load_yaml
 
 # Setup logging
 setup_logging()
@@ -12,6 +20,77 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class ParsedSpec:
+    """
+    Result of the single parsing stage: the decoded text, the detected
+    file type and the parsed document. Downstream stages (validation,
+    prompt building, responses) consume this instead of re-parsing bytes.
+    """
+    text: str
+    file_type: str  # 'json', 'yaml' or 'unknown'
+    document: Any = None
+    error: Optional[str] = None
+    duplicate_keys: List[dict] = field(default_factory=list)
+    # Stage durations in seconds (decode, parse, validate), reported to the metrics endpoint
+    timings: Dict[str, float] = field(default_factory=dict, repr=False, compare=False)
+    _compacted: Dict[bool, CompactSpec] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_document(cls, document: Any, file_type: str = 'json') -> "ParsedSpec":
+        """Wrap an already parsed document (e.g. a JSON request body or a converted spec)"""
+        text = dump_yaml(document) if file_type == 'yaml' else json.dumps(document, indent=2)
+        return cls(text=text, file_type=file_type, document=document)
+
+    @property
+    def is_mapping(self) -> bool:
+        return isinstance(self.document, dict)
+
+    def compacted(self, hoist: bool = False) -> CompactSpec:
+        """Compact form of the document for prompts (see spec_compactor), built once per hoist setting"""
+        if hoist not in self._compacted:
+            document = None if self.error else self.document
+            self._compacted[hoist] = compact_document(document, self.text, hoist)
+        return self._compacted[hoist]
+
+def parse_spec(file_content: bytes) -> ParsedSpec:
+    """
+    Decode and parse file content exactly once.
+    JSON is tried first only when the content looks like JSON, since every
+    JSON document is also YAML and the JSON parser is much faster.
+    Duplicate mapping keys are recorded during the same pass.
+    """
+    start = time.perf_counter()
+    try:
+        content_str = file_content.decode('utf-8')
+    except UnicodeDecodeError as e:
+        return ParsedSpec(text="", file_type='unknown', error=f"File encoding error: {e}")
+    timings = {"decode": time.perf_counter() - start}
+
+    start = time.perf_counter()
+    parsed = _parse_text(content_str)
+    parsed.timings = {**timings, "parse": time.perf_counter() - start}
+    return parsed
+
+def _parse_text(content_str: str) -> ParsedSpec:
+    """Parse decoded text as JSON or YAML"""
+    stripped = content_str.strip()
+    if not stripped:
+        return ParsedSpec(text=content_str, file_type='unknown', error="File content is empty")
+
+    if stripped[0] in '{[':
+        try:
+            document, duplicate_keys = load_json(stripped)
+            return ParsedSpec(text=content_str, file_type='json', document=document, duplicate_keys=duplicate_keys)
+        except json.JSONDecodeError:
+            pass
+
+    try:
+        document, duplicate_keys = load_yaml(content_str)
+        return ParsedSpec(text=content_str, file_type='yaml', document=document, duplicate_keys=duplicate_keys)
+    except yaml.YAMLError as e:
+        return ParsedSpec(text=content_str, file_type='unknown', error=f"Invalid YAML syntax: {e}")
+
 def _convert_json_to_yaml(file_content: bytes) -> str:
     """
     Convert JSON bytes to YAML string
@@ -48,95 +127,85 @@ def _detect_file_type(file_content: bytes) -> str:
     Returns: 'json', 'yaml', or 'unknown'
     """
     try:
-        content_str = file_content.decode('utf-8').strip()
-        
-        # Try JSON first
-        try:
-            json.loads(content_str)
-            return 'json'
-        except json.JSONDecodeError:
-            pass
-        
-        # Try YAML
-        try:
-            yaml.safe_load(content_str)
-            return 'yaml'
-        except yaml.YAMLError:
-            pass
-            
-        return 'unknown'
-        
+        return parse_spec(file_content).file_type
     except Exception as e:
         logger.error(f"Could not detect file type: {e}")
         return 'unknown'
 
-def validate_file(file_content: bytes) -> bool:
+def validate_file(file_content: Union[bytes, ParsedSpec]) -> bool:
     """
     Validate that file content contains basic OpenAPI structure.
     Supports both JSON and YAML input files.
     
     Process:
-    1. Detect file type (JSON or YAML)
-    2. If JSON: convert to YAML, then validate
-    3. If YAML: validate directly
+    1. Parse the content once (see parse_spec), unless already parsed
+    2. Reject duplicate mapping keys found while parsing
+    3. Check the parsed document is an object
     4. Check for basic OpenAPI structure
     """
     try:
-        # Convert bytes to string
-        content_str = file_content.decode('utf-8')
+        parsed = file_content if isinstance(file_content, ParsedSpec) else parse_spec(file_content)
+        logger.info(f"Detected file type: {parsed.file_type}")
         
-        if not content_str.strip():
-            logger.error("File content is empty")
+        if parsed.error:
+            logger.error(parsed.error)
             return False
         
-        # Detect file type
-        file_type = _detect_file_type(file_content)
-        logger.info(f"Detected file type: {file_type}")
-        
-        if file_type == 'json':
-            # Validate JSON structure first
-            if not _validate_json_file(file_content):
-                logger.error("Invalid JSON file")
-                return False
-            
-            # Convert JSON to YAML for processing
-            yaml_content = _convert_json_to_yaml(file_content)
-            if not yaml_content:
-                logger.error("Failed to convert JSON to YAML")
-                return False
-            
-            # Parse the converted YAML
-            try:
-                spec = yaml.safe_load(yaml_content)
-            except yaml.YAMLError as e:
-                logger.error(f"Invalid YAML after conversion: {e}")
-                return False
-                
-        elif file_type == 'yaml':
-            # Parse YAML directly
-            try:
-                spec = yaml.safe_load(content_str)
-            except yaml.YAMLError as e:
-                logger.error(f"Invalid YAML syntax: {e}")
-                return False
-        else:
-            logger.error("File is neither valid JSON nor YAML")
+        if parsed.duplicate_keys:
+            for message in format_duplicate_keys(parsed.duplicate_keys):
+                logger.error(message)
             return False
         
         # Validate the parsed specification
-        if not spec or not isinstance(spec, dict):
+        if not parsed.document or not parsed.is_mapping:
             logger.error("File does not contain valid object structure")
             return False
             
-        return validate_basic_info(spec)
+        return validate_basic_info(parsed.document)
         
-    except UnicodeDecodeError as e:
-        logger.error(f"File encoding error: {e}")
-        return False
     except Exception as e:
         logger.error(f"Could not validate file: {e}")
         return False
 
+def parse_and_validate(file_content: bytes) -> Tuple[ParsedSpec, bool, dict]:
+    """
+    Parse once, then run basic and schema validation.
+    Returns (parsed spec, validation passed, schema validation report).
+    Top-level so it can be shipped to a process pool.
+    """
+    parsed = parse_spec(file_content)
+    start = time.perf_counter()
+    report = validate_document(parsed.document)
+    is_valid = validate_file(parsed) and report["valid"]
+    parsed.timings["validate"] = time.perf_counter() - start
+    return parsed, is_valid, report
+
+def apply_local_fixes(parsed: ParsedSpec, local_notes: List[str] = None) -> Tuple[ParsedSpec, dict, bool]:
+    """
+    Run the local deterministic stages (Swagger 2.0 conversion, rule-based
+    autofix). Returns (spec to send on, local result, whether issues remain).
+    Top-level so it can be shipped to a process pool.
+    """
+    local_notes = list(local_notes or [])
+    document = parsed.document
+    converted = is_swagger2(document)
+    if converted:
+        document, notes = convert_swagger2(document)
+        local_notes += notes
+
+    document, report = autofix(document)
+    local_notes += report.as_suggestions()
+    if converted or report.fixes:
+        parsed = ParsedSpec.from_document(document, file_type='yaml')
+
+    local_result = {
+        "suggestions": "\n".join(local_notes) or "- No issues found by local checks",
+        "corrected_spec": parsed.text,
+        "fixes": report.fixes,
+        "source": "local"
+    }
+    return parsed, local_result, bool(report.unresolved)
+
 def validate_basic_info(spec: dict) -> bool:
     """
     Check for basic OpenAPI/Swagger structure
@@ -214,12 +283,18 @@ def validate_postman_collection(spec: dict) -> bool:
             logger.error("'item' section must be an array")
             return False
             
-        # Validate at least one item has request structure
+        # Validate at least one item has request structure, walking folders iteratively
         valid_items = 0
-        for item in items:
-            if isinstance(item, dict) and 'request' in item:
+        stack = list(items)
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, dict):
+                continue
+            if isinstance(item.get('item'), list):
+                stack.extend(item['item'])
+            elif 'request' in item:
                 request = item['request']
-                if isinstance(request, dict) and 'method' in request and 'url' in request:
+                if isinstance(request, str) or (isinstance(request, dict) and 'url' in request):
                     valid_items += 1
                     
         if valid_items == 0:
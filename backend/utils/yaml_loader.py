@@ -0,0 +1,119 @@
+"""
+YAML loading layer.
+Uses the libyaml C loader when PyYAML was built with it, and records
+duplicate mapping keys (with line/column) during construction so the
+document never has to be walked a second time.
+"""
+import json
+from typing import Any, List, Tuple
+import yaml
+
+try:
+    _BaseLoader = yaml.CSafeLoader
+    _BaseDumper = yaml.CSafeDumper
+    LIBYAML_AVAILABLE = True
+except AttributeError:
+    _BaseLoader = yaml.SafeLoader
+    _BaseDumper = yaml.SafeDumper
+    LIBYAML_AVAILABLE = False
+
+
+class DuplicateKeyLoader(_BaseLoader):
+    """Safe loader that records duplicate mapping keys instead of silently keeping the last one"""
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.duplicate_keys: List[dict] = []
+
+    def construct_mapping(self, node, deep=False):
+        if isinstance(node, yaml.MappingNode):
+            seen = {}
+            for key_node, _ in node.value:
+                # Merge keys ('<<') are allowed to repeat
+                if key_node.tag == 'tag:yaml.org,2002:merge':
+                    continue
+                try:
+                    key = self.construct_object(key_node, deep=deep)
+                    first = seen.setdefault(key, key_node)
+                except TypeError:
+                    continue  # Unhashable key - the base constructor reports it
+                if first is not key_node:
+                    self.duplicate_keys.append({
+                        "key": str(key),
+                        "line": key_node.start_mark.line + 1,
+                        "column": key_node.start_mark.column + 1,
+                        "first_line": first.start_mark.line + 1,
+                    })
+        return super().construct_mapping(node, deep=deep)
+
+
+def load_yaml(text: str) -> Tuple[Any, List[dict]]:
+    """
+    Parse a single YAML document.
+    Returns (document, duplicate_keys). Raises yaml.YAMLError on invalid input.
+    """
+    loader = DuplicateKeyLoader(text)
+    try:
+        return loader.get_single_data(), loader.duplicate_keys
+    finally:
+        loader.dispose()
+
+
+def compose_yaml(text: str) -> yaml.Node:
+    """Node tree (with line marks) of a single YAML document. Raises yaml.YAMLError on invalid input."""
+    return yaml.compose(text, Loader=_BaseLoader)
+
+
+def load_json(text: str) -> Tuple[Any, List[dict]]:
+    """
+    Parse a JSON document, recording duplicate object keys.
+    JSON gives no positions for pairs, so line/column are None.
+    Raises json.JSONDecodeError on invalid input.
+    """
+    duplicate_keys: List[dict] = []
+
+    def _pairs_hook(pairs):
+        obj = dict(pairs)
+        if len(obj) != len(pairs):
+            seen = set()
+            for key, _ in pairs:
+                if key in seen:
+                    duplicate_keys.append({"key": key, "line": None, "column": None, "first_line": None})
+                seen.add(key)
+        return obj
+
+    return json.loads(text, object_pairs_hook=_pairs_hook), duplicate_keys
+
+
+class _NoAliasDumper(_BaseDumper):
+    """Writes shared objects (e.g. from a dereferenced spec) out in full instead of as &anchors/*aliases"""
+
+    def ignore_aliases(self, data):
+        return True
+
+
+def last_line(node: yaml.Node) -> int:
+    """1-based last line of a node; block collections end where their last descendant does"""
+    while isinstance(node, (yaml.MappingNode, yaml.SequenceNode)) and node.value and not node.flow_style:
+        node = node.value[-1][1] if isinstance(node, yaml.MappingNode) else node.value[-1]
+    # end_mark is just past the node - at column 0 of the following line after block scalars
+    return node.end_mark.line + (1 if node.end_mark.column else 0)
+
+
+def dump_yaml(document: Any) -> str:
+    """Serialize a document to block-style YAML, preserving key order"""
+    return yaml.dump(document, Dumper=_NoAliasDumper, sort_keys=False, allow_unicode=True, default_flow_style=False)
+
+
+def format_duplicate_keys(duplicate_keys: List[dict]) -> List[str]:
+    """Human readable messages for duplicate key records"""
+    messages = []
+    for dup in duplicate_keys:
+        if dup["line"] is None:
+            messages.append(f"Duplicate key '{dup['key']}'")
+        else:
+            messages.append(
+                f"Duplicate key '{dup['key']}' at line {dup['line']}, column {dup['column']} "
+                f"(first defined at line {dup['first_line']})"
+            )
+    return messages